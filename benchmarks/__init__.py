@@ -0,0 +1 @@
+"""Offline benchmarks for the energy data extraction pipeline."""
@@ -0,0 +1,124 @@
+"""In-Process S3 Stand-In Module."""
+
+import hashlib
+import io
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+
+class FakeS3Client:
+    def __init__(self, latency=0.0):
+        """
+        Initializes an in-memory stand-in for the boto3 S3 client.
+
+        Only the calls made by S3Buckets are implemented: put_object, get_object,
+        delete_objects, the list_objects_v2 paginator and the multipart upload calls. It is
+        safe to call from the S3 thread pool, and every call can be delayed to approximate
+        the round trip to S3.
+
+        :param latency: Seconds each call is delayed by (default is 0.0)
+        """
+        self.latency = latency
+        self.objects = {}
+        self.etags = {}
+        self.calls = {}
+        self.bytes_received = 0
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def _call(self, name, size=0):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            self.bytes_received += size
+
+    @staticmethod
+    def _etag(body):
+        return f'"{hashlib.md5(body).hexdigest()}"'  # noqa: S324
+
+    def put_object(self, Bucket, Key, Body, **kwargs):  # noqa: N803
+        body = Body.encode() if isinstance(Body, str) else bytes(Body)
+        self._call("put_object", len(body))
+        etag = self._etag(body)
+        with self._lock:
+            self.objects[(Bucket, Key)] = body
+            self.etags[(Bucket, Key)] = etag
+        return {"ETag": etag}
+
+    def get_object(self, Bucket, Key, **kwargs):  # noqa: N803
+        self._call("get_object")
+        with self._lock:
+            body = self.objects.get((Bucket, Key))
+        if body is None:
+            raise ClientError(
+                {"Error": {"Code": "NoSuchKey", "Message": "The specified key does not exist."}},
+                "GetObject",
+            )
+        return {"Body": io.BytesIO(body), "ETag": self.etags[(Bucket, Key)]}
+
+    def delete_objects(self, Bucket, Delete, **kwargs):  # noqa: N803
+        self._call("delete_objects")
+        with self._lock:
+            for obj in Delete["Objects"]:
+                self.objects.pop((Bucket, obj["Key"]), None)
+                self.etags.pop((Bucket, obj["Key"]), None)
+        return {}
+
+    def get_paginator(self, operation_name):
+        return _ListObjectsPaginator(self)
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):  # noqa: N803
+        self._call("create_multipart_upload")
+        with self._lock:
+            upload_id = f"upload-{len(self._uploads) + 1}"
+            self._uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, **kwargs):  # noqa: N803
+        body = bytes(Body)
+        self._call("upload_part", len(body))
+        with self._lock:
+            self._uploads[UploadId][PartNumber] = body
+        return {"ETag": self._etag(body)}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):  # noqa: N803
+        self._call("complete_multipart_upload")
+        with self._lock:
+            uploaded = self._uploads.pop(UploadId)
+            parts = [uploaded[part["PartNumber"]] for part in MultipartUpload["Parts"]]
+            # Like S3, the ETag of a multipart object is the MD5 digest of its parts' digests.
+            digests = b"".join(hashlib.md5(part).digest() for part in parts)  # noqa: S324
+            etag = f'"{hashlib.md5(digests).hexdigest()}-{len(parts)}"'  # noqa: S324
+            self.objects[(Bucket, Key)] = b"".join(parts)
+            self.etags[(Bucket, Key)] = etag
+        return {"ETag": etag}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):  # noqa: N803
+        self._call("abort_multipart_upload")
+        with self._lock:
+            self._uploads.pop(UploadId, None)
+        return {}
+
+
+class _ListObjectsPaginator:
+    def __init__(self, client):
+        self.client = client
+
+    def paginate(self, Bucket, Prefix="", **kwargs):  # noqa: N803
+        self.client._call("list_objects_v2")
+        with self.client._lock:
+            keys = sorted(
+                key
+                for bucket, key in self.client.objects
+                if bucket == Bucket and key.startswith(Prefix)
+            )
+        for start in range(0, len(keys), 1000):
+            yield {
+                "Contents": [
+                    {"Key": key, "ETag": self.client.etags[(Bucket, key)]}
+                    for key in keys[start : start + 1000]
+                ]
+            }
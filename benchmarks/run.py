@@ -0,0 +1,376 @@
+"""Extraction Benchmark Runner Module."""
+
+import argparse
+import asyncio
+import functools
+import inspect
+import json
+import resource
+import subprocess  # noqa: S404
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.fake_s3 import FakeS3Client
+from benchmarks.server import SyntheticAEMO
+from src.utils.metrics import metrics
+
+ENGINES = ("async", "sync")
+BUCKET_NAME = "benchmark-bucket"
+FOLDER = "Energy_Price_Demand/"
+PERCENTILES = (50, 95, 99)
+
+
+class StageTimings:
+    def __init__(self):
+        """
+        Initializes a collection of per-stage latency samples, in seconds.
+        """
+        self.samples = {}
+
+    def record(self, stage, seconds):
+        """
+        Adds one latency sample to a stage.
+
+        :param stage: Name of the pipeline stage
+        :param seconds: Time the stage took for one file
+        """
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def summary(self):
+        """
+        Summarises the samples of every stage.
+
+        :return: A dict of stage name to its sample count and p50, p95 and p99 in milliseconds
+        """
+        return {
+            stage: {
+                "count": len(samples),
+                **{f"p{q}_ms": percentile(samples, q) * 1000 for q in PERCENTILES},
+            }
+            for stage, samples in self.samples.items()
+        }
+
+
+def percentile(samples: list[float], q: float) -> float:
+    """
+    Computes a nearest-rank percentile.
+    Args:
+        samples (list[float]): The samples, in any order.
+        q (float): The percentile, between 0 and 100.
+    Returns:
+        float: The smallest sample at or above the q-th percentile of the samples.
+    """
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, -(-len(ordered) * q // 100) - 1))
+    return ordered[int(rank)]
+
+
+def timed(func, stage: str, timings: StageTimings):
+    """
+    Wraps a function or coroutine function so that every call is recorded as a sample of
+    a pipeline stage. The wrapped function stays reachable through `__wrapped__`.
+    Args:
+        func (Callable): The function to time.
+        stage (str): The name of the stage the function implements.
+        timings (StageTimings): The collection to record samples in.
+    Returns:
+        Callable: The timed function.
+    """
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def timed_coroutine(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                timings.record(stage, time.perf_counter() - started)
+
+        return timed_coroutine
+
+    @functools.wraps(func)
+    def timed_function(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings.record(stage, time.perf_counter() - started)
+
+    return timed_function
+
+
+class TimedProcessPoolExecutor(ProcessPoolExecutor):
+    def __init__(self, *args, timings=None, **kwargs):
+        """
+        Initializes a process pool that records how long each submitted call takes to come
+        back, queueing included, as a sample of the transform stage. Timed wrappers are
+        unwrapped before submission, since they cannot be sent to a worker process.
+
+        :param timings: The StageTimings to record samples in
+        """
+        super().__init__(*args, **kwargs)
+        self.timings = timings
+
+    def submit(self, fn, /, *args, **kwargs):
+        fn = getattr(fn, "__wrapped__", fn)
+        started = time.perf_counter()
+        future = super().submit(fn, *args, **kwargs)
+        future.add_done_callback(
+            lambda _: self.timings.record("transform", time.perf_counter() - started)
+        )
+        return future
+
+
+def instrument_async(timings: StageTimings):
+    """
+    Times the stages of the asynchronous extractor.
+    Args:
+        timings (StageTimings): The collection to record samples in.
+    Returns:
+        module: The instrumented extractor module.
+    """
+    from src.etl import extract
+
+    extract.get_data = timed(extract.get_data, "fetch", timings)
+    extract.land_streamed = timed(extract.land_streamed, "stream", timings)
+    extract.prepare_file = timed(extract.prepare_file, "transform", timings)
+    extract.write_to_s3 = timed(extract.write_to_s3, "upload", timings)
+    extract.ProcessPoolExecutor = functools.partial(TimedProcessPoolExecutor, timings=timings)
+    return extract
+
+
+def instrument_sync(timings: StageTimings):
+    """
+    Times the stages of the synchronous extractor.
+    Args:
+        timings (StageTimings): The collection to record samples in.
+    Returns:
+        module: The instrumented extractor module.
+    """
+    from src.etl import sync_extract
+
+    sync_extract.get_data = timed(sync_extract.get_data, "fetch", timings)
+    sync_extract.parse_data = timed(sync_extract.parse_data, "transform", timings)
+    sync_extract.write_to_s3 = timed(sync_extract.write_to_s3, "upload", timings)
+    return sync_extract
+
+
+def extract_with(
+    engine: str, module, base_url: str, workdir: str, args: argparse.Namespace
+) -> None:
+    """
+    Runs one extractor against the synthetic server.
+    Args:
+        engine (str): The extractor to run, "async" or "sync".
+        module (module): The instrumented extractor module.
+        base_url (str): The base URL of the synthetic server.
+        workdir (str): A scratch directory for the local caches of the run.
+        args (argparse.Namespace): The benchmark arguments.
+    """
+    common = {
+        "base_url": base_url,
+        "bucket_name": BUCKET_NAME,
+        "current_year": args.last_year,
+        "months": range(1, 13),
+        "provinces": args.provinces,
+        "folder": FOLDER,
+        "max_retries": args.max_retries,
+        "negative_cache_path": f"{workdir}/negative_cache.json",
+    }
+    if engine == "sync":
+        module.run_data_extraction(**common, workers=args.workers)
+        return
+    settings = module.ExtractionSettings(
+        **common,
+        concurrency=args.concurrency,
+        raw=args.raw,
+        stream=args.stream,
+        output_format=args.format,
+        transform_workers=args.transform_workers,
+    )
+    asyncio.run(module.run_data_extraction(settings))
+
+
+def run_engine(engine: str, args: argparse.Namespace) -> dict:
+    """
+    Benchmarks one extractor in the current process.
+    Args:
+        engine (str): The extractor to run, "async" or "sync".
+        args (argparse.Namespace): The benchmark arguments.
+    Returns:
+        dict: The throughput, per-stage latency and peak memory of the run.
+    """
+    server = SyntheticAEMO(
+        interval_minutes=args.interval_minutes,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        last_year=args.last_year,
+    )
+    base_url = server.start_in_thread()
+    timings = StageTimings()
+    module = instrument_async(timings) if engine == "async" else instrument_sync(timings)
+    client = FakeS3Client(latency=args.s3_latency)
+    module.s3_conn.client = client
+    started = time.perf_counter()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            extract_with(engine, module, base_url, workdir, args)
+    finally:
+        elapsed = time.perf_counter() - started
+        server.stop_thread()
+    files = client.calls.get("put_object", 0) + client.calls.get("complete_multipart_upload", 0)
+    return {
+        "engine": engine,
+        "files": files,
+        "requests": server.requests,
+        "seconds": elapsed,
+        "files_per_s": files / elapsed,
+        "mb_per_s": server.bytes_sent / 1e6 / elapsed,
+        # ru_maxrss is reported in KiB on Linux. For children it is the largest single child.
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "children_peak_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+        "stages": timings.summary(),
+        "counters": metrics.counters,
+    }
+
+
+def run_isolated(engine: str, argv: list[str], verbose: bool = False) -> dict:
+    """
+    Benchmarks one extractor in a fresh interpreter, so that peak memory and warm caches
+    of one engine never leak into the results of another.
+    Args:
+        engine (str): The extractor to run, "async" or "sync".
+        argv (list[str]): The benchmark arguments to pass on.
+        verbose (bool): Whether to show the extractor's log output.
+    Returns:
+        dict: The results reported by the child process.
+    """
+    completed = subprocess.run(  # noqa: S603
+        [sys.executable, "-m", "benchmarks.run", *argv, "--child", engine],
+        stdout=subprocess.PIPE,
+        stderr=None if verbose else subprocess.DEVNULL,
+        check=True,
+        text=True,
+    )
+    return json.loads(completed.stdout.splitlines()[-1])
+
+
+def format_report(results: list[dict]) -> str:
+    """
+    Formats benchmark results as a plain-text report.
+    Args:
+        results (list[dict]): The results of every engine.
+    Returns:
+        str: The report.
+    """
+    lines = []
+    for result in results:
+        lines.append(
+            f"{result['engine']:>5}: {result['files']} files in {result['seconds']:.2f}s, "
+            f"{result['files_per_s']:.1f} files/s, {result['mb_per_s']:.2f} MB/s, "
+            f"peak RSS {result['peak_rss_mb']:.0f} MB "
+            f"(largest child {result['children_peak_rss_mb']:.0f} MB)"
+        )
+        lines.append(f"       counters: {result['counters']}")
+        for stage, summary in result["stages"].items():
+            percentiles = " ".join(f"p{q} {summary[f'p{q}_ms']:.1f}ms" for q in PERCENTILES)
+            lines.append(f"       {stage:<9} n={summary['count']:<5} {percentiles}")
+    return "\n".join(lines)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """
+    Parses the benchmark arguments.
+    Args:
+        argv (list[str] | None): The arguments to parse (default: the command line).
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Extraction Benchmark Arguments.")
+    parser.add_argument(
+        "--engines",
+        type=str,
+        nargs="+",
+        choices=ENGINES,
+        default=list(ENGINES),
+        help="Extractors to benchmark.",
+    )
+    parser.add_argument(
+        "--provinces",
+        type=str,
+        nargs="+",
+        default=["QLD", "NSW", "VIC", "SA", "TAS"],
+        help="Provinces to fetch data for.",
+    )
+    parser.add_argument(
+        "--last_year",
+        type=int,
+        default=2000,
+        help="Last year fetched; files are fetched from 1998 onwards.",
+    )
+    parser.add_argument(
+        "--interval_minutes",
+        type=int,
+        default=30,
+        help="Spacing of the rows in each synthetic file; 5 gives ~6x larger files.",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="Seconds each response is delayed by."
+    )
+    parser.add_argument(
+        "--error_rate", type=float, default=0.0, help="Share of requests answered with a 500."
+    )
+    parser.add_argument(
+        "--throttle_rate", type=float, default=0.0, help="Share of requests answered with a 429."
+    )
+    parser.add_argument(
+        "--s3_latency", type=float, default=0.01, help="Seconds each S3 call is delayed by."
+    )
+    parser.add_argument(
+        "--max_retries", type=int, default=5, help="Number of retries for failed requests."
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=16, help="Maximum number of concurrent requests."
+    )
+    parser.add_argument(
+        "--workers", type=int, default=16, help="Number of threads of the sync extractor."
+    )
+    parser.add_argument(
+        "--transform_workers", type=int, default=None, help="Number of transform processes."
+    )
+    parser.add_argument("--raw", action="store_true", help="Land files without parsing.")
+    parser.add_argument("--stream", action="store_true", help="Stream files into S3.")
+    parser.add_argument(
+        "--format", type=str, default="csv", choices=("csv", "parquet"), help="Landing format."
+    )
+    parser.add_argument(
+        "--output", type=str, default=None, help="Local file to write the results to as JSON."
+    )
+    parser.add_argument("--verbose", action="store_true", help="Show the extractors' logs.")
+    parser.add_argument("--child", type=str, choices=ENGINES, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Benchmarks each selected extractor in its own process and reports the results.
+    Args:
+        argv (list[str] | None): The arguments to parse (default: the command line).
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    args = parse_args(argv)
+    if args.child:
+        print(json.dumps(run_engine(args.child, args)))
+        return
+    results = [run_isolated(engine, argv, args.verbose) for engine in args.engines]
+    print(format_report(results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Synthetic AEMO Server Module."""
+
+import asyncio
+import datetime
+import functools
+import hashlib
+import random
+import threading
+
+from aiohttp import web
+
+from src.etl.parquet import parse_filename
+from src.etl.schema import COLUMNS
+
+LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+@functools.lru_cache(maxsize=1024)
+def synthetic_csv(filename: str, interval_minutes: int = 30) -> bytes:
+    """
+    Builds an AEMO-shaped price and demand CSV file for the region and month in a filename.
+    Values are derived from the filename, so the same file always has the same content.
+    Args:
+        filename (str): The name of the file, e.g. PRICE_AND_DEMAND_202401_NSW1.csv.
+        interval_minutes (int): The spacing of the rows, 30 for historical files and 5 for
+        files published since the move to five-minute settlement.
+    Returns:
+        bytes: The CSV file.
+    """
+    region, year, month = parse_filename(filename)
+    rng = random.Random(filename)  # noqa: S311
+    start = datetime.datetime(year, month, 1)
+    end = datetime.datetime(year + month // 12, month % 12 + 1, 1)
+    step = datetime.timedelta(minutes=interval_minutes)
+    rows = [",".join(COLUMNS)]
+    settlement = start + step
+    while settlement <= end:
+        demand = 5000 + 1500 * rng.random()
+        price = rng.gauss(80, 40)
+        rows.append(f"{region},{settlement:%Y/%m/%d %H:%M:%S},{demand:.2f},{price:.2f},TRADE")
+        settlement += step
+    return ("\n".join(rows) + "\n").encode()
+
+
+class SyntheticAEMO:
+    def __init__(
+        self,
+        interval_minutes=30,
+        latency=0.0,
+        error_rate=0.0,
+        throttle_rate=0.0,
+        last_year=None,
+        seed=0,
+    ):
+        """
+        Initializes a local stand-in for the AEMO price and demand file server.
+
+        Files are served under /data/<name>.csv with ETag and Last-Modified headers, and
+        conditional requests for unchanged files are answered with a 304. Failures are
+        injected at random: server errors answer 500 and throttled requests answer 429 with
+        a Retry-After of zero, so both are retried without slowing the benchmark down.
+
+        :param interval_minutes: Spacing of the rows in each file, which sets its size
+        (default is 30)
+        :param latency: Seconds each response is delayed by (default is 0.0)
+        :param error_rate: Share of requests answered with a 500 (default is 0.0)
+        :param throttle_rate: Share of requests answered with a 429 (default is 0.0)
+        :param last_year: Last year with published files, later ones answer 404
+        (default is None, every year is published)
+        :param seed: Seed of the failure injection (default is 0)
+        """
+        self.interval_minutes = interval_minutes
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.last_year = last_year
+        self.requests = 0
+        self.bytes_sent = 0
+        self._rng = random.Random(seed)  # noqa: S311
+        self._runner = None
+        self._loop = None
+        self._thread = None
+
+    async def handle(self, request):
+        """
+        Serves one file request.
+
+        :param request: The incoming aiohttp request
+        :return: The aiohttp response
+        """
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        draw = self._rng.random()
+        if draw < self.throttle_rate:
+            return web.Response(status=429, headers={"Retry-After": "0"})
+        if draw < self.throttle_rate + self.error_rate:
+            return web.Response(status=500)
+        name = request.match_info["name"]
+        try:
+            _, year, _ = parse_filename(name)
+        except ValueError:
+            return web.Response(status=404)
+        if self.last_year is not None and year > self.last_year:
+            return web.Response(status=404)
+        body = synthetic_csv(name, self.interval_minutes)
+        etag = f'"{hashlib.md5(body).hexdigest()}"'  # noqa: S324
+        headers = {"ETag": etag, "Last-Modified": LAST_MODIFIED, "Content-Type": "text/csv"}
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers=headers)
+        self.bytes_sent += len(body)
+        return web.Response(body=body, headers=headers)
+
+    async def start(self, host="127.0.0.1", port=0):
+        """
+        Starts serving on the running event loop.
+
+        :param host: Interface to listen on (default is 127.0.0.1)
+        :param port: Port to listen on (default is 0, any free port)
+        :return: The base URL the extractors build file URLs from
+        """
+        app = web.Application()
+        app.router.add_get("/data/{name}", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        return f"http://{host}:{port}/data/PRICE_AND_DEMAND"
+
+    async def stop(self):
+        """
+        Stops serving and closes open connections.
+        """
+        await self._runner.cleanup()
+
+    def start_in_thread(self, host="127.0.0.1", port=0):
+        """
+        Starts serving on an event loop of its own in a background thread, so the server
+        also works for synchronous clients and never shares a loop with the client under test.
+
+        :param host: Interface to listen on (default is 127.0.0.1)
+        :param port: Port to listen on (default is 0, any free port)
+        :return: The base URL the extractors build file URLs from
+        """
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        return asyncio.run_coroutine_threadsafe(self.start(host, port), self._loop).result()
+
+    def stop_thread(self):
+        """
+        Stops a server started with `start_in_thread` and its background thread.
+        """
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
@@ -0,0 +1,137 @@
+"""Cold-Start Budget Module."""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess  # noqa: S404
+import sys
+import time
+
+# Modules costing 100ms or more to import, which only the runs needing them should load.
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "boto3", "psycopg2", "aiohttp")
+ENTRY_POINTS = ("src.etl.extract", "src.etl.sync_extract", "src.etl.load", "src.etl.compaction")
+# Room for the interpreter, requests, botocore's exceptions and the pipeline's own modules.
+BUDGET_MS = 500
+
+
+def cold_start(argv: list[str]) -> float:
+    """
+    Times one command in a fresh interpreter, with no AWS credentials in its environment.
+    Args:
+        argv (list[str]): The interpreter arguments, e.g. ["-m", "src.etl.extract", "--help"].
+    Returns:
+        float: The wall time of the command, in seconds.
+    """
+    env = {
+        key: value
+        for key, value in os.environ.items()
+        if key not in ("ACCESS_KEY", "ACCESS_SECRET") and not key.startswith("AWS_")
+    }
+    started = time.perf_counter()
+    subprocess.run(  # noqa: S603
+        [sys.executable, *argv], stdout=subprocess.DEVNULL, env=env, check=True
+    )
+    return time.perf_counter() - started
+
+
+def heavy_imports(module: str) -> list[str]:
+    """
+    Lists the heavy modules loaded by importing a module in a fresh interpreter.
+    Args:
+        module (str): The module to import.
+    Returns:
+        list[str]: The heavy modules found in sys.modules after the import.
+    """
+    completed = subprocess.run(  # noqa: S603
+        [
+            sys.executable,
+            "-c",
+            f"import json, sys, {module}; "
+            f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))",
+        ],
+        stdout=subprocess.PIPE,
+        check=True,
+        text=True,
+    )
+    return json.loads(completed.stdout)
+
+
+def measure(module: str, runs: int) -> dict:
+    """
+    Measures the cold start of an entry point, imported and run with --help.
+    Args:
+        module (str): The entry point.
+        runs (int): The number of cold starts timed for each command; the median is kept.
+    Returns:
+        dict: The median import and --help times in milliseconds, and the heavy modules
+        the import loads.
+    """
+    commands = {"import_ms": ["-c", f"import {module}"], "help_ms": ["-m", module, "--help"]}
+    return {
+        "module": module,
+        **{
+            name: statistics.median(cold_start(argv) for _ in range(runs)) * 1000
+            for name, argv in commands.items()
+        },
+        "heavy_imports": heavy_imports(module),
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """
+    Parses the cold-start budget arguments.
+    Args:
+        argv (list[str] | None): The arguments to parse (default: the command line).
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Cold-Start Budget Arguments.")
+    parser.add_argument(
+        "--modules",
+        type=str,
+        nargs="+",
+        default=list(ENTRY_POINTS),
+        help="Entry points to measure.",
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts timed for each command.")
+    parser.add_argument(
+        "--budget_ms",
+        type=float,
+        default=BUDGET_MS,
+        help="Largest median import or --help time allowed, in milliseconds.",
+    )
+    parser.add_argument(
+        "--output", type=str, default=None, help="Local file to write the results to as JSON."
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Measures the cold start of every entry point and checks it against the budget.
+    Args:
+        argv (list[str] | None): The arguments to parse (default: the command line).
+    Returns:
+        int: 0 if every entry point starts within the budget without loading a heavy
+        module, 1 otherwise.
+    """
+    args = parse_args(argv)
+    results = [measure(module, args.runs) for module in args.modules]
+    over = False
+    for result in results:
+        slow = max(result["import_ms"], result["help_ms"]) > args.budget_ms
+        over = over or slow or bool(result["heavy_imports"])
+        print(
+            f"{result['module']:<22} import {result['import_ms']:6.0f}ms  "
+            f"--help {result['help_ms']:6.0f}ms  heavy: {result['heavy_imports'] or 'none'}"
+            f"{'  OVER BUDGET' if slow else ''}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return int(over)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,631 @@
+"""Monthly File Compaction Module."""
+
+import argparse
+import asyncio
+import json
+import re
+from collections import deque
+from collections.abc import AsyncIterator
+
+from src.etl.schema import COLUMNS, read_header
+from src.etl.streaming import PART_SIZE, StreamingUpload
+from src.utils.logs import get_logger
+from src.utils.metrics import metrics
+from src.utils.s3 import AsyncS3Buckets, S3Buckets
+
+logger = get_logger(__name__)
+S3_WORKERS = 16
+s3_conn = S3Buckets.credentials("us-east-2", max_pool_connections=S3_WORKERS)
+
+PARTITIONS = ("region", "year")
+MONTHLY_PATTERN = re.compile(r"PRICE_AND_DEMAND_(\d{4})(\d{2})_(\w+)\.csv$")
+SETTLEMENT_PATTERN = re.compile(rb"\d\d\d\d/\d\d/\d\d \d\d:\d\d:\d\d")
+# The settlement times of a whole file, one per line, checked in a single match.
+SETTLEMENTS_PATTERN = re.compile(rb"(?:%b\n)*" % SETTLEMENT_PATTERN.pattern)
+HEADER = (",".join(COLUMNS) + "\n").encode()
+# Monthly files fetched ahead of the merge, for each dataset being compacted.
+READ_AHEAD = 4
+
+
+def compacted_folder(folder: str, partition_by: str = "region") -> str:
+    """
+    Returns the folder the datasets compacted from a landing folder are written to. It sits
+    next to the landing folder, so listings of the landed files never see it, and each
+    partitioning has its own folder.
+    Args:
+        folder (str): The folder in the S3 bucket where files are landed.
+        partition_by (str): The partitioning of the datasets, "region" or "year".
+    Returns:
+        str: The compacted folder, e.g. Energy_Price_Demand_by_region/.
+    """
+    return f"{folder.rstrip('/')}_by_{partition_by}/"
+
+
+def manifest_key(output_folder: str) -> str:
+    """
+    Returns the key of the compaction manifest of a compacted folder. It sits next to the
+    folder rather than inside it, so readers listing the datasets never see it.
+    Args:
+        output_folder (str): The folder in the S3 bucket holding the datasets.
+    Returns:
+        str: The key of the manifest, e.g. Energy_Price_Demand_by_region_manifest.json.
+    """
+    return f"{output_folder.rstrip('/')}_manifest.json"
+
+
+def dataset_name(region: str, year: int, partition_by: str) -> str:
+    """
+    Names the dataset a monthly file is compacted into.
+    Args:
+        region (str): The region of the file, e.g. NSW1.
+        year (int): The year of the file.
+        partition_by (str): The partitioning of the datasets, "region" or "year".
+    Returns:
+        str: The name of the dataset, e.g. PRICE_AND_DEMAND_NSW1.csv by region, or
+        PRICE_AND_DEMAND_2024_NSW1.csv by year.
+    """
+    if partition_by == "year":
+        return f"PRICE_AND_DEMAND_{year}_{region}.csv"
+    return f"PRICE_AND_DEMAND_{region}.csv"
+
+
+def file_month(key: str) -> tuple[int, int]:
+    """
+    Reads the year and month from the key of a landed monthly file.
+    Args:
+        key (str): The key of the file, e.g. Energy_Price_Demand/PRICE_AND_DEMAND_202401_NSW1.csv.
+    Returns:
+        tuple: The year and the month of the file.
+    """
+    year, month, _ = MONTHLY_PATTERN.search(key).groups()
+    return int(year), int(month)
+
+
+def group_sources(
+    objects: dict[str, str], folder: str, partition_by: str
+) -> dict[str, dict[str, str]]:
+    """
+    Groups the monthly CSV files landed directly under a folder by the dataset they are
+    compacted into. Partitioned Parquet files and anything else under the folder are left out.
+    Args:
+        objects (dict): The ETag of every object under the folder, keyed by its key.
+        folder (str): The folder in the S3 bucket where files are landed.
+        partition_by (str): The partitioning of the datasets, "region" or "year".
+    Returns:
+        dict: The ETag of every monthly file of each dataset, keyed by the dataset name.
+    """
+    groups = {}
+    for key, etag in objects.items():
+        match = MONTHLY_PATTERN.fullmatch(key[len(folder) :])
+        if match is None:
+            continue
+        name = dataset_name(match.group(3), int(match.group(1)), partition_by)
+        groups.setdefault(name, {})[key] = etag
+    return groups
+
+
+def settlement(line: bytes) -> bytes:
+    """
+    Reads the settlement time of a row. Times are zero-padded, so they sort as bytes.
+    Args:
+        line (bytes): A row of a price and demand file.
+    Returns:
+        bytes: The SETTLEMENTDATE of the row, e.g. b"2024/01/01 00:05:00".
+    Raises:
+        ValueError: If the row has no SETTLEMENTDATE column.
+    """
+    try:
+        return line.split(b",", 2)[1].strip(b'" ')
+    except IndexError:
+        raise ValueError(f"Row without a settlement time: {line[:80]!r}") from None
+
+
+def interval_month(settled: bytes) -> tuple[int, int]:
+    """
+    Returns the month an interval belongs to. SETTLEMENTDATE marks the end of each
+    interval, so the interval settled at midnight on the first of a month belongs to, and
+    is published in the file of, the month before.
+    Args:
+        settled (bytes): The settlement time of the interval, e.g. b"2024/02/01 00:00:00".
+    Returns:
+        tuple: The year and the month of the interval.
+    """
+    year, month = int(settled[:4]), int(settled[5:7])
+    if settled[8:] == b"01 00:00:00":
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return year, month
+
+
+def row_month(line: bytes) -> tuple[int, int] | None:
+    """
+    Returns the month the interval of a row belongs to.
+    Args:
+        line (bytes): A row of a price and demand file.
+    Returns:
+        tuple | None: The year and the month of the interval, or None if the row has no
+        readable settlement time.
+    """
+    try:
+        settled = settlement(line)
+    except ValueError:
+        return None
+    return interval_month(settled) if SETTLEMENT_PATTERN.fullmatch(settled) else None
+
+
+def month_rows(body: bytes) -> list[bytes]:
+    """
+    Reads the rows of a monthly file in settlement order.
+    Args:
+        body (bytes): The CSV file.
+    Returns:
+        list: The rows of the file, each with a line break, sorted by settlement time.
+    Raises:
+        ValueError: If the file does not carry the price and demand columns in order, or
+        has a row without a readable settlement time.
+    """
+    if read_header(body) != list(COLUMNS):
+        raise ValueError(f"Unexpected columns: {read_header(body)}")
+    lines = body.replace(b"\r\n", b"\n").split(b"\n")[1:]
+    rows = [line + b"\n" for line in lines if line]
+    settled = list(map(settlement, rows))
+    if settled and not SETTLEMENTS_PATTERN.fullmatch(b"\n".join(settled) + b"\n"):
+        position, value = next(
+            (position, value)
+            for position, value in enumerate(settled, 1)
+            if not SETTLEMENT_PATTERN.fullmatch(value)
+        )
+        raise ValueError(f"Unreadable settlement time in row {position}: {value!r}")
+    return [rows[i] for i in sorted(range(len(rows)), key=settled.__getitem__)]
+
+
+class DatasetWriter:
+    def __init__(self, upload):
+        """
+        Writes rows to a compacted dataset in settlement order, one row per interval.
+
+        Rows must arrive in settlement order. A row settled at or before the last written
+        row is a duplicate, such as an interval published in two monthly files, and is
+        dropped, so the first copy of every interval is kept. A row without a settlement
+        time is dropped too.
+
+        :param upload: The StreamingUpload the dataset is written through
+        """
+        self.upload = upload
+        self.last = b""
+        self.rows = 0
+        self.duplicates = 0
+        self.malformed = 0
+
+    async def write(self, lines):
+        """
+        Appends a block of rows to the dataset.
+
+        :param lines: Rows in settlement order, each with a line break
+        """
+        kept = []
+        for line in lines:
+            try:
+                settled = settlement(line)
+            except ValueError:
+                self.malformed += 1
+                continue
+            if settled <= self.last:
+                self.duplicates += 1
+                continue
+            kept.append(line)
+            self.last = settled
+        self.rows += len(kept)
+        await self.upload.write(b"".join(kept))
+
+
+async def read_months(
+    s3: AsyncS3Buckets,
+    bucket_name: str,
+    keys: list[str],
+    read_ahead: int = READ_AHEAD,
+) -> AsyncIterator[tuple[tuple[int, int], list[bytes]]]:
+    """
+    Asynchronously reads monthly files in order, fetching up to `read_ahead` files ahead
+    of the one being merged, so at most that many files are held in memory. A file that
+    cannot be parsed, down to a single malformed row, is logged and left out whole.
+    Args:
+        s3 (AsyncS3Buckets): The S3 connection to read with.
+        bucket_name (str): The name of the S3 bucket.
+        keys (list): The keys of the monthly files, in month order.
+        read_ahead (int): The number of files fetched ahead.
+    Returns:
+        AsyncIterator: The month and the sorted rows of every file.
+    """
+    queue = iter(keys)
+    pending = deque()
+
+    def schedule():
+        key = next(queue, None)
+        if key is not None:
+            pending.append((key, asyncio.ensure_future(s3.read_object(bucket_name, key))))
+
+    for _ in range(max(read_ahead, 1)):
+        schedule()
+    try:
+        while pending:
+            key, task = pending.popleft()
+            body = await task
+            schedule()
+            try:
+                lines = month_rows(body)
+            except ValueError as e:
+                metrics.increment("unreadable_files")
+                logger.error("Leaving '%s' out of its dataset: %s", key, e)
+                continue
+            metrics.increment("files_merged")
+            yield file_month(key), lines
+    finally:
+        for _, task in pending:
+            task.cancel()
+
+
+async def dataset_lines(s3: AsyncS3Buckets, bucket_name: str, key: str) -> AsyncIterator[list]:
+    """
+    Asynchronously streams the rows of a compacted dataset from S3, without its header.
+    Args:
+        s3 (AsyncS3Buckets): The S3 connection to read with.
+        bucket_name (str): The name of the S3 bucket.
+        key (str): The key of the dataset.
+    Returns:
+        AsyncIterator: The whole rows of every chunk read, without their line breaks.
+    """
+    carry, header = b"", True
+    async for chunk in s3.iter_object(bucket_name, key):
+        lines = (carry + chunk).split(b"\n")
+        carry = lines.pop()
+        if header and lines:
+            lines, header = lines[1:], False
+        yield lines
+    if carry and not header:
+        yield [carry]
+
+
+async def dataset_months(
+    s3: AsyncS3Buckets, bucket_name: str, key: str
+) -> AsyncIterator[tuple[tuple[int, int], list[bytes]]]:
+    """
+    Asynchronously reads a compacted dataset back month by month, streaming it from S3
+    so only one month of it is held in memory. A row without a readable settlement time
+    is logged and left out.
+    Args:
+        s3 (AsyncS3Buckets): The S3 connection to read with.
+        bucket_name (str): The name of the S3 bucket.
+        key (str): The key of the dataset.
+    Returns:
+        AsyncIterator: The month and the rows of every month in the dataset, in order.
+    """
+    month, block = None, []
+    async for lines in dataset_lines(s3, bucket_name, key):
+        for line in lines:
+            line_month = row_month(line)
+            if line_month is None:
+                metrics.increment("malformed_rows")
+                logger.warning("Leaving a malformed row of '%s' out: %r", key, line[:80])
+                continue
+            if line_month != month and block:
+                yield month, block
+                block = []
+            month = line_month
+            block.append(line + b"\n")
+    if block:
+        yield month, block
+
+
+async def merge_months(
+    kept: AsyncIterator | None,
+    fresh: AsyncIterator,
+    replaced: set[tuple[int, int]],
+) -> AsyncIterator[tuple[tuple[int, int], list[bytes]]]:
+    """
+    Asynchronously merges the months kept from a compacted dataset with freshly read
+    monthly files, in month order. Months of the dataset whose monthly file changed or
+    was removed are left out.
+    Args:
+        kept (AsyncIterator | None): The months of the existing dataset, or None to build
+        the dataset from scratch.
+        fresh (AsyncIterator): The months read from the changed monthly files, in order.
+        replaced (set): The months of the dataset to leave out.
+    Returns:
+        AsyncIterator: The month and the rows of every month of the new dataset.
+    """
+    upcoming = await anext(fresh, None)
+    if kept is not None:
+        async for month, lines in kept:
+            if month in replaced:
+                continue
+            while upcoming is not None and upcoming[0] < month:
+                yield upcoming
+                upcoming = await anext(fresh, None)
+            yield month, lines
+    while upcoming is not None:
+        yield upcoming
+        upcoming = await anext(fresh, None)
+
+
+async def compact_dataset(
+    s3: AsyncS3Buckets,
+    bucket_name: str,
+    key: str,
+    sources: dict[str, str],
+    recorded: dict[str, str],
+    read_ahead: int = READ_AHEAD,
+    part_size: int = PART_SIZE,
+) -> int:
+    """
+    Asynchronously merges monthly files into a dataset sorted by settlement time, with one
+    row per interval, streaming it to S3 in multipart parts as it is merged. When the
+    dataset already holds some of the files, it is streamed back and only the files that
+    are new or changed since are read, spliced in at their month. If anything fails, the
+    upload is aborted and the existing dataset is left as it was.
+    Args:
+        s3 (AsyncS3Buckets): The S3 connection to read and write with.
+        bucket_name (str): The name of the S3 bucket.
+        key (str): The key of the dataset.
+        sources (dict): The ETag of every monthly file of the dataset, keyed by its key.
+        recorded (dict): The ETag of every monthly file the existing dataset was compacted
+        from, or an empty dict to build the dataset from scratch.
+        read_ahead (int): The number of monthly files fetched ahead of the merge.
+        part_size (int): The multipart part size, at least 5 MiB.
+    Returns:
+        int: The number of rows in the dataset.
+    """
+    changed = sorted(
+        (source for source, etag in sources.items() if recorded.get(source) != etag),
+        key=file_month,
+    )
+    removed = [source for source in recorded if source not in sources]
+    replaced = {file_month(source) for source in changed + removed}
+    kept = dataset_months(s3, bucket_name, key) if recorded else None
+    fresh = read_months(s3, bucket_name, changed, read_ahead)
+    upload = StreamingUpload(s3, bucket_name, key, part_size)
+    writer = DatasetWriter(upload)
+    try:
+        await upload.write(HEADER)
+        async for _, lines in merge_months(kept, fresh, replaced):
+            await writer.write(lines)
+        await upload.close()
+    except BaseException:
+        await upload.abort()
+        raise
+    metrics.increment("rows_written", writer.rows)
+    metrics.increment("duplicate_rows", writer.duplicates)
+    metrics.increment("malformed_rows", writer.malformed)
+    logger.info(
+        "Compacted '%s': %d rows, %d changed monthly files merged into %d kept.",
+        key,
+        writer.rows,
+        len(changed),
+        len(sources) - len(changed),
+    )
+    return writer.rows
+
+
+async def load_manifest(s3: AsyncS3Buckets, bucket_name: str, key: str) -> dict:
+    """
+    Asynchronously reads the compaction manifest, which records the monthly files and the
+    ETag every dataset was last compacted from. A missing manifest yields an empty one.
+    Args:
+        s3 (AsyncS3Buckets): The S3 connection to read with.
+        bucket_name (str): The name of the S3 bucket.
+        key (str): The key of the manifest.
+    Returns:
+        dict: The entry of every dataset, keyed by the dataset name.
+    """
+    if key not in await s3.list_objects(bucket_name, key):
+        return {}
+    return json.loads(await s3.read_object(bucket_name, key))
+
+
+def needs_compaction(entry: dict | None, sources: dict[str, str], etag: str | None) -> bool:
+    """
+    Checks whether a dataset is missing or was compacted from other monthly files.
+    Args:
+        entry (dict | None): The manifest entry of the dataset.
+        sources (dict): The ETag of every monthly file of the dataset, keyed by its key.
+        etag (str | None): The ETag the dataset is listed with, or None if it is missing.
+    Returns:
+        bool: True if the dataset has to be compacted.
+    """
+    return entry is None or entry["etag"] != etag or entry["sources"] != sources
+
+
+async def compact_folder(
+    s3: AsyncS3Buckets,
+    bucket_name: str,
+    folder: str,
+    output_folder: str,
+    partition_by: str = "region",
+    concurrency: int = 4,
+    read_ahead: int = READ_AHEAD,
+    part_size: int = PART_SIZE,
+) -> int:
+    """
+    Asynchronously compacts the monthly files of a landing folder into one dataset per
+    partition, touching only the datasets whose monthly files changed since the manifest
+    was written. A dataset whose existing object still matches its manifest entry is
+    updated incrementally; any other is built from scratch. Datasets left without any
+    monthly file are deleted.
+    Args:
+        s3 (AsyncS3Buckets): The S3 connection to read and write with.
+        bucket_name (str): The name of the S3 bucket.
+        folder (str): The folder in the S3 bucket where files are landed.
+        output_folder (str): The folder in the S3 bucket the datasets are written to.
+        partition_by (str): The partitioning of the datasets, "region" or "year".
+        concurrency (int): The number of datasets compacted at once.
+        read_ahead (int): The number of monthly files fetched ahead of each merge.
+        part_size (int): The multipart part size, at least 5 MiB.
+    Returns:
+        int: The number of datasets compacted.
+    """
+    groups = group_sources(await s3.list_objects(bucket_name, folder), folder, partition_by)
+    existing = await s3.list_objects(bucket_name, output_folder)
+    manifest = await load_manifest(s3, bucket_name, manifest_key(output_folder))
+    due = [
+        name
+        for name, sources in groups.items()
+        if needs_compaction(manifest.get(name), sources, existing.get(f"{output_folder}{name}"))
+    ]
+    logger.info(
+        "%d of %d datasets need compacting from %d monthly files.",
+        len(due),
+        len(groups),
+        sum(map(len, groups.values())),
+    )
+    metrics.increment("datasets_unchanged", len(groups) - len(due))
+    semaphore = asyncio.Semaphore(concurrency)
+    compacted = {}
+
+    async def compact(name):
+        key = f"{output_folder}{name}"
+        entry = manifest.get(name)
+        recorded = entry["sources"] if entry and entry["etag"] == existing.get(key) else {}
+        async with semaphore:
+            try:
+                with metrics.timer("compact"):
+                    rows = await compact_dataset(
+                        s3, bucket_name, key, groups[name], recorded, read_ahead, part_size
+                    )
+            except (s3.S3ConnectionError, s3.S3UploadError) as e:
+                metrics.increment("failed_datasets")
+                logger.error("Failed to compact '%s': %s", key, e)
+                return
+        compacted[name] = {"sources": groups[name], "rows": rows}
+        metrics.increment("datasets_compacted")
+
+    await asyncio.gather(*(compact(name) for name in due))
+    stale = [name for name in manifest if name not in groups]
+    if stale:
+        await s3.delete_objects(bucket_name, [f"{output_folder}{name}" for name in stale])
+        metrics.increment("datasets_deleted", len(stale))
+    if compacted or stale:
+        listed = await s3.list_objects(bucket_name, output_folder)
+        for name, entry in compacted.items():
+            manifest[name] = {**entry, "etag": listed.get(f"{output_folder}{name}")}
+        for name in stale:
+            manifest.pop(name, None)
+        key = manifest_key(output_folder)
+        if not await s3.upload_file(
+            bucket_name, key, json.dumps(manifest, sort_keys=True).encode()
+        ):
+            logger.error("Failed to write the compaction manifest '%s'.", key)
+    return len(compacted)
+
+
+async def run_compaction(
+    bucket_name: str,
+    folder: str,
+    output_folder: str | None = None,
+    partition_by: str = "region",
+    concurrency: int = 4,
+    read_ahead: int = READ_AHEAD,
+    part_size: int = PART_SIZE,
+    metrics_path: str | None = None,
+) -> int:
+    """
+    Consolidates the monthly files landed under a folder into sorted, de-duplicated
+    datasets, one per region or one per region and year, so reading the full history takes
+    a handful of requests rather than one per month. Only datasets whose monthly files
+    changed since the last compaction are rewritten. Each is streamed: the existing dataset
+    and the changed monthly files are read a month at a time and merged straight into a
+    multipart upload, so the full history is never held in memory.
+    Args:
+        bucket_name (str): The name of the S3 bucket.
+        folder (str): The folder in the S3 bucket holding the landed files.
+        output_folder (str | None): The folder in the S3 bucket the datasets are written to
+        (default: next to the landing folder).
+        partition_by (str): The partitioning of the datasets, "region" or "year".
+        concurrency (int): The number of datasets compacted at once.
+        read_ahead (int): The number of monthly files fetched ahead of each merge.
+        part_size (int): The multipart part size, at least 5 MiB.
+        metrics_path (str | None): A local file the JSON run summary is written to.
+    Returns:
+        int: The number of datasets compacted.
+    Raises:
+        ValueError: If the partitioning is unknown.
+    """
+    if partition_by not in PARTITIONS:
+        raise ValueError(f"Unknown partitioning '{partition_by}'. Choose from {PARTITIONS}.")
+    metrics.reset()
+    output_folder = output_folder or compacted_folder(folder, partition_by)
+    s3 = AsyncS3Buckets(s3_conn, max_workers=S3_WORKERS)
+    try:
+        compacted = await compact_folder(
+            s3, bucket_name, folder, output_folder, partition_by, concurrency, read_ahead, part_size
+        )
+    finally:
+        s3.close()
+    metrics.save(metrics_path)
+    logger.info("Compacted %d datasets. Counters: %s", compacted, metrics.counters)
+    return compacted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compaction Arguments.")
+    parser.add_argument(
+        "--bucket_name",
+        type=str,
+        default="energy-data-bucket",
+        help="S3 bucket name.",
+    )
+    parser.add_argument(
+        "--folder",
+        type=str,
+        default="Energy_Price_Demand/",
+        help="Folder in AWS S3 holding the landed files.",
+    )
+    parser.add_argument(
+        "--output_folder",
+        type=str,
+        default=None,
+        help="Folder in AWS S3 to write the datasets to. Defaults to one next to --folder.",
+    )
+    parser.add_argument(
+        "--partition_by",
+        type=str,
+        choices=PARTITIONS,
+        default="region",
+        help="Write one dataset per region, or one per region and year.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Number of datasets compacted at once.",
+    )
+    parser.add_argument(
+        "--read_ahead",
+        type=int,
+        default=READ_AHEAD,
+        help="Number of monthly files fetched ahead of each merge.",
+    )
+    parser.add_argument(
+        "--part_size_mb",
+        type=int,
+        default=8,
+        help="Multipart upload part size of the datasets, in MiB (at least 5).",
+    )
+    parser.add_argument(
+        "--metrics_path",
+        type=str,
+        default=None,
+        help="Local file to write the JSON run summary to.",
+    )
+    args = parser.parse_args()
+    logger.info(f"Arguments: {args}")
+    asyncio.run(
+        run_compaction(
+            bucket_name=args.bucket_name,
+            folder=args.folder,
+            output_folder=args.output_folder,
+            partition_by=args.partition_by,
+            concurrency=args.concurrency,
+            read_ahead=args.read_ahead,
+            part_size=args.part_size_mb * 1024 * 1024,
+            metrics_path=args.metrics_path,
+        )
+    )
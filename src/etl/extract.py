@@ -2,151 +2,1150 @@
 
 import argparse
 import asyncio
+import dataclasses
 import datetime
-from collections.abc import AsyncGenerator
-from io import StringIO
-
-import aiohttp
-import pandas as pd
+import functools
+import json
+import multiprocessing
+import os
+from collections.abc import AsyncGenerator, Awaitable, Callable, Coroutine
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any
 
+from src.etl.http_cache import NEGATIVE_CACHE_TTL, NegativeCache, ValidatorCache
+from src.etl.manifest import Manifest
+from src.etl.parquet import COMPRESSIONS, partition_path
+from src.etl.planner import Plan, plan_urls
+from src.etl.quality import quarantine_folder, save_reports
+from src.etl.retry import RETRYABLE_STATUSES, AdaptiveLimiter, RetryPolicy, parse_retry_after
+from src.etl.rollups import rollup_folder
+from src.etl.schema import UnexpectedColumnsError, has_expected_columns, read_header
+from src.etl.sharding import batches, shard_plan
+from src.etl.streaming import PART_SIZE, stream_to_s3
+from src.etl.tail import COMPACT_SECONDS, POLL_SECONDS, REVALIDATE_SECONDS, follow
+from src.etl.transform import prepare_file
+from src.utils.dynamo import (
+    FAILED,
+    FETCHED,
+    LEASE_SECONDS,
+    JobLedger,
+    LeaseTable,
+    checksum,
+    open_leases,
+    open_ledger,
+)
 from src.utils.logs import get_logger
-from src.utils.s3 import S3Buckets
+from src.utils.metrics import metrics
+from src.utils.s3 import AsyncS3Buckets, S3Buckets, object_etag
+
+if TYPE_CHECKING:
+    import aiohttp
 
 logger = get_logger(__name__)
-s3_conn = S3Buckets.credentials("us-east-2")
+S3_WORKERS = 16
+s3_conn = S3Buckets.credentials("us-east-2", max_pool_connections=S3_WORKERS)
 
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+    )
+}
+REQUEST_TIMEOUT = 60
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 30
+CHUNK_SIZE = 64 * 1024
+OUTPUT_FORMATS = ("csv", "parquet")
+# Command-line arguments named differently from the ExtractionSettings they set.
+CLI_NAMES = {"format": "output_format", "follow": "following"}
 
-async def get_url(
-    base_url: str,
-    current_year: int,
-    months: range,
-    provinces: list[str],
-) -> AsyncGenerator[str, None]:
+
+def create_session(concurrency: int, per_host_limit: int) -> "aiohttp.ClientSession":
     """
-    Asynchronously generates URLs for the specified base URL, year, months, and provinces.
+    Creates the pooled client session shared by every request of a run.
+    The connector keeps connections alive between requests and caches DNS lookups,
+    so TCP and TLS setup is paid once per pooled connection rather than once per file.
     Args:
-        base_url (str): The base URL for the data.
-        current_year (int): The current year.
-        months (range): The range of months to generate URLs for.
-        provinces (list): The list of provinces to generate URLs for.
-    Yields:
-        str: The generated URL.
+        concurrency (int): The maximum number of connections open at once.
+        per_host_limit (int): The maximum number of connections open to a single host.
+    Returns:
+        aiohttp.ClientSession: The shared client session.
+    """
+    import aiohttp
+
+    connector = aiohttp.TCPConnector(
+        limit=concurrency,
+        limit_per_host=per_host_limit,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        headers=HEADERS,
+        timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+    )
+
+
+def landing_name(filename: str, output_format: str = "csv") -> str:
+    """
+    Builds the name a source file lands under, relative to the landing folder.
+    CSV files keep their source name. Parquet files are placed in Hive-style
+    region=/year=/month= partitions so that readers can prune by path.
+    Args:
+        filename (str): The name of the source file.
+        output_format (str): The format the file lands in, "csv" or "parquet".
+    Returns:
+        str: The name of the landed file.
+    """
+    if output_format == "parquet":
+        return partition_path(filename)
+    return filename
+
+
+def get_filename(url: str) -> str:
+    """
+    Extracts the name of the file a URL points to.
+    Args:
+        url (str): The URL of the file.
+    Returns:
+        str: The name of the file.
+    """
+    return url.split("/")[-1]
+
+
+class ExtractionContext:
+    def __init__(
+        self,
+        session,
+        retry_policy,
+        limiter,
+        s3,
+        manifest,
+        bucket_name,
+        folder,
+        validators=None,
+        negative_cache=None,
+        ledger=None,
+        raw=False,
+        part_size=None,
+        output_format="csv",
+        compression="zstd",
+        rollups=False,
+        quarantine=None,
+        refresh=False,
+        stored_part_size=PART_SIZE,
+    ):
+        """
+        Holds the settings and shared resources used by every stage of one extraction run.
+        Args:
+            session (aiohttp.ClientSession): The pooled session shared by every request.
+            retry_policy (RetryPolicy): Decides how often and how long to retry.
+            limiter (AdaptiveLimiter): Bounds the number of requests in flight.
+            s3 (AsyncS3Buckets): The S3 connection to upload with.
+            manifest (Manifest): The index of objects already stored under the folder.
+            bucket_name (str): The name of the S3 bucket.
+            folder (str): The folder in the S3 bucket where files are landed.
+            validators (ValidatorCache | None): The validator cache of an incremental run.
+            negative_cache (NegativeCache | None): The cache missing URLs are recorded in.
+            ledger (JobLedger | None): The job ledger tracking the state of every URL.
+            raw (bool): Whether to land files exactly as received.
+            part_size (int | None): The multipart part size to stream files with, in bytes,
+            or None to buffer files.
+            output_format (str): The format to land files in, "csv" or "parquet".
+            compression (str): The Parquet compression codec, "zstd" or "snappy".
+            rollups (bool): Whether to land the daily and monthly rollups of every file.
+            quarantine (str | None): The folder in the S3 bucket files failing their quality
+            checks are landed in, or None to land files unchecked.
+            refresh (bool): Whether to fetch stored files again and replace those whose
+            content changed.
+            stored_part_size (int): The part size of the objects streamed by earlier runs,
+            to recompute their multipart ETags.
+        """
+        self.session = session
+        self.retry_policy = retry_policy
+        self.limiter = limiter
+        self.s3 = s3
+        self.manifest = manifest
+        self.bucket_name = bucket_name
+        self.folder = folder
+        self.validators = validators
+        self.negative_cache = negative_cache
+        self.ledger = ledger
+        self.raw = raw
+        self.part_size = part_size
+        self.output_format = output_format
+        self.compression = compression
+        self.rollups = rollups
+        self.quarantine = quarantine
+        self.refresh = refresh
+        self.stored_part_size = stored_part_size
+        self.quality_reports = []
+
+    @classmethod
+    def from_settings(
+        cls,
+        settings: "ExtractionSettings",
+        session: "aiohttp.ClientSession",
+        s3: AsyncS3Buckets,
+        manifest: Manifest,
+        validators: ValidatorCache | None = None,
+        negative_cache: NegativeCache | None = None,
+        ledger: JobLedger | None = None,
+    ) -> "ExtractionContext":
+        """
+        Builds the context of a run from its settings and the resources opened for it.
+        Args:
+            settings (ExtractionSettings): The settings of the run.
+            session (aiohttp.ClientSession): The pooled session shared by every request.
+            s3 (AsyncS3Buckets): The S3 connection to upload with.
+            manifest (Manifest): The index of objects already stored under the folder.
+            validators (ValidatorCache | None): The validator cache of an incremental run.
+            negative_cache (NegativeCache | None): The cache missing URLs are recorded in.
+            ledger (JobLedger | None): The job ledger tracking the state of every URL.
+        Returns:
+            ExtractionContext: The context shared by every stage of the run.
+        """
+        quarantine = None
+        if settings.validate:
+            quarantine = settings.quarantine or quarantine_folder(settings.folder)
+        return cls(
+            session=session,
+            retry_policy=RetryPolicy(max_retries=settings.max_retries),
+            limiter=AdaptiveLimiter(
+                max_limit=settings.concurrency, min_limit=settings.min_concurrency
+            ),
+            s3=s3,
+            manifest=manifest,
+            bucket_name=settings.bucket_name,
+            folder=settings.folder,
+            validators=validators,
+            negative_cache=negative_cache,
+            ledger=ledger,
+            raw=settings.raw or settings.stream,
+            part_size=settings.part_size if settings.stream else None,
+            output_format=settings.output_format,
+            compression=settings.compression,
+            rollups=settings.rollups,
+            quarantine=quarantine,
+            refresh=settings.refresh,
+            stored_part_size=settings.part_size,
+        )
+
+    @property
+    def overwrite(self) -> bool:
+        return self.validators is not None or self.refresh
+
+    def landing_name(self, url: str) -> str:
+        """
+        Returns the name the file at a URL lands under, relative to the landing folder.
+        Args:
+            url (str): The URL of the source file.
+        Returns:
+            str: The name of the landed file.
+        """
+        return landing_name(get_filename(url), self.output_format)
+
+    async def record(
+        self, url: str, state: str, checksum: str | None = None, error: str | None = None
+    ) -> None:
+        """
+        Asynchronously records a state change of a URL in the ledger, if the run keeps one.
+        The ledger may write to DynamoDB or SQLite, so it is called on a worker thread.
+        Args:
+            url (str): The URL of the source file.
+            state (str): The new state.
+            checksum (str | None): The checksum of the file, if known.
+            error (str | None): The reason the URL failed.
+        """
+        if self.ledger is not None:
+            await asyncio.to_thread(self.ledger.record, url, state, checksum, error)
+
+    async def commit(self, url: str, key: str, checksum: str | None = None) -> None:
+        """
+        Asynchronously records that the file at a URL has been landed under a key. The
+        landing is written to the ledger on a worker thread.
+        Args:
+            url (str): The URL of the source file.
+            key (str): The key of the landed object.
+            checksum (str | None): The checksum of the landed file, if known.
+        """
+        if self.validators is not None:
+            self.validators.commit(url)
+        if self.ledger is None:
+            return
+        if not await asyncio.to_thread(self.ledger.land, url, checksum):
+            logger.info("File '%s' had already been landed by another run.", key)
+
+
+async def fetch(
+    url: str,
+    ctx: ExtractionContext,
+    consume: Callable[["aiohttp.ClientResponse"], Awaitable[Any]],
+) -> tuple[Any, int]:
+    """
+    Asynchronously requests a URL and hands a successful response to `consume`.
+    Throttling responses, server errors, timeouts and connection resets (including those
+    raised while `consume` reads the body) are retried with jittered exponential backoff,
+    and each of them tells the limiter to back off.
+    In incremental runs, the request is made conditional on the cached ETag and
+    Last-Modified values, so an unchanged file is answered with a 304 and no body.
+    Args:
+        url (str): The URL to fetch data from.
+        ctx (ExtractionContext): The settings and shared resources of the run.
+        consume (Callable): The coroutine function that reads a 200 response.
+    Returns:
+        tuple: A tuple containing the result of `consume` (None unless the response was a
+        200 for changed content) and the HTTP status code of the last response (304 for
+        unchanged content, 0 if no response was received).
     """
-    for province in provinces:
-        for year in range(1998, current_year + 1):
-            for month in months:
-                url = f"{base_url}_{year}{month:02}_{province}1.csv"
-                yield url
+    import aiohttp
+
+    validators = ctx.validators
+    headers = validators.conditional_headers(url) if validators is not None else {}
+    status = 0
+    for attempt in range(ctx.retry_policy.max_retries + 1):
+        retry_after = None
+        try:
+            async with ctx.limiter, ctx.session.get(url, headers=headers) as response:
+                status = response.status
+                if status == 304 or (
+                    status == 200
+                    and validators is not None
+                    and validators.unchanged(url, response.headers)
+                ):
+                    ctx.limiter.on_success()
+                    return None, 304
+                if status == 200:
+                    result = await consume(response)
+                    ctx.limiter.on_success()
+                    if validators is not None:
+                        validators.stage(url, response.headers)
+                    if ctx.negative_cache is not None:
+                        ctx.negative_cache.discard(url)
+                    return result, status
+                if status == 404 and ctx.negative_cache is not None:
+                    ctx.negative_cache.add(url)
+                if status not in RETRYABLE_STATUSES:
+                    metrics.increment("not_found" if status == 404 else "failed_fetches")
+                    logger.error("Failed to fetch data from %s. Status code: %s", url, status)
+                    return None, status
+                reason = f"status code {response.status}"
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        except (aiohttp.ClientError, TimeoutError) as e:
+            reason = f"AIOHTTP error {e!r}"
+        ctx.limiter.on_throttle()
+        if attempt == ctx.retry_policy.max_retries:
+            metrics.increment("failed_fetches")
+            logger.error("Giving up on %s after %d attempts: %s", url, attempt + 1, reason)
+            return None, status
+        metrics.increment("retries")
+        delay = ctx.retry_policy.delay(attempt, retry_after)
+        logger.warning("Retrying %s in %.2fs after %s", url, delay, reason)
+        await asyncio.sleep(delay)
+    return None, status
 
 
-async def get_data(url: str) -> tuple[StringIO, str]:
+async def get_data(url: str, ctx: ExtractionContext) -> tuple[bytes, str, int]:
     """
-    Asynchronously fetches data from the given URL and returns it as a StringIO object.
-    The data is read as a CSV file and then converted to a StringIO object.
-    If the request fails, it returns an empty StringIO object and the name of the file.
-    If the request is successful, it returns the StringIO object with the data and the name
-    of the file.
+    Asynchronously fetches the file at the given URL and returns its body as received.
+    Failed requests are retried as described in `fetch`.
+    If the request fails or the file is unchanged, it returns empty bytes.
     The name of the file is extracted from the URL.
     Args:
         url (str): The URL to fetch data from.
+        ctx (ExtractionContext): The settings and shared resources of the run.
     Returns:
-        tuple: A tuple containing the StringIO object with the data and the name of the file.
+        tuple: A tuple containing the response body, the name of the file and the HTTP
+        status code of the last response (0 if no response was received).
+    """
+    import aiohttp
+
+    body, status = await fetch(url, ctx, aiohttp.ClientResponse.read)
+    return body or b"", get_filename(url), status
+
+
+async def checked_chunks(response: "aiohttp.ClientResponse", url: str) -> AsyncGenerator[bytes]:
+    """
+    Asynchronously yields the body of a response in chunks, checking the header row first.
+    Args:
+        response (aiohttp.ClientResponse): The response to read.
+        url (str): The URL the response was fetched from.
+    Yields:
+        bytes: The chunks of the body, in order.
+    Raises:
+        UnexpectedColumnsError: If the header row does not hold the expected columns.
     """
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-            "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+    head = b""
+    chunks = response.content.iter_chunked(CHUNK_SIZE)
+    async for chunk in chunks:
+        head += chunk
+        if b"\n" in head:
+            break
+    if not has_expected_columns(head):
+        raise UnexpectedColumnsError(f"Unexpected columns in data from {url}: {read_header(head)}")
+    yield head
+    async for chunk in chunks:
+        yield chunk
+
+
+async def stream_data(url: str, ctx: ExtractionContext, key: str) -> int:
+    """
+    Asynchronously streams the file at a URL straight into an S3 object.
+    Response chunks are forwarded as multipart upload parts while the download is still
+    running, so memory per file is bounded by the part size rather than the file size.
+    A transfer that fails part way through is aborted and retried as described in `fetch`.
+    Args:
+        url (str): The URL to fetch data from.
+        ctx (ExtractionContext): The settings and shared resources of the run.
+        key (str): The key of the object to write.
+    Returns:
+        int: The HTTP status code of the last response; 200 means the object was written.
+    Raises:
+        S3UploadError: If S3 rejects the upload.
+        UnexpectedColumnsError: If the header row does not hold the expected columns.
+    """
+
+    async def consume(response: "aiohttp.ClientResponse") -> int:
+        return await stream_to_s3(
+            ctx.s3, checked_chunks(response, url), ctx.bucket_name, key, ctx.part_size
         )
-    }
-    name = url.split("/")[-1]
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    text = await response.text()
-                    data = StringIO(text)
-                    df = pd.read_csv(data)
-                    csv_file = StringIO()
-                    df.to_csv(csv_file, index=False)
-                    return csv_file, name
-                else:
-                    logger.error(f"Failed to fetch data from {url}. Status code: {response.status}")
-                    return StringIO(""), name
-    except aiohttp.ClientError as e:
-        logger.error(f"AIOHTTP error fetching {url}: {e}")
-        return StringIO(""), name
-    except pd.errors.ParserError as e:
-        logger.error(f"An error occurred while parsing data from {url}: {e}")
-        return StringIO(""), name
-
-
-async def write_to_s3(bucket_name, filename, file, folder="") -> None:
-    """
-    Asynchronously uploads a file to an S3 bucket. Checks if the file already exists
-    in the bucket before uploading.
-    If the file already exists, it skips the upload.
-    If the file does not exist, it uploads the file to the specified folder in the S3 bucket.
+
+    _, status = await fetch(url, ctx, consume)
+    return status
+
+
+async def write_to_s3(
+    s3, bucket_name, filename, file, manifest, folder="", overwrite=False
+) -> bool:
+    """
+    Asynchronously uploads a file to an S3 bucket. Checks the run's manifest index to see
+    if the file already exists in the bucket before uploading.
+    If the file already exists, it skips the upload unless `overwrite` is set.
+    Otherwise, it uploads the file to the specified folder in the S3 bucket and records it
+    in the manifest. The upload runs on the S3 thread pool, so it never blocks the event loop.
     Args:
+        s3 (AsyncS3Buckets): The S3 connection to upload with.
         bucket_name (str): The name of the S3 bucket.
         filename (str): The name of the file to be uploaded.
-        file (StringIO): The file object to be uploaded.
+        file (bytes): The contents of the file to be uploaded.
+        manifest (Manifest): The index of objects already stored under the folder.
         folder (str): The folder in the S3 bucket where the file will be uploaded.
+        overwrite (bool): Whether to replace a file that already exists.
+    Returns:
+        bool: True if the file was uploaded, False otherwise.
     """
+    key = f"{folder}{filename}"
+    if key in manifest and not overwrite:
+        metrics.increment("skipped_existing")
+        logger.info("File '%s' already exists in '%s'. Skipping upload.", filename, bucket_name)
+        return False
     try:
-        previously_uploaded = s3_conn.list_files(bucket_name=bucket_name, folder=folder)
-        if f"{folder}{filename}" in previously_uploaded:
-            logger.info(f"File '{filename}' already exists in '{bucket_name}'. Skipping upload.")
-            return
-        logger.info(f"Uploading '{filename}' to S3 bucket '{bucket_name}'...")
-        s3_conn.upload_file(bucket_name=bucket_name, filename=filename, file=file, folder=folder)
-    except (s3_conn.S3UploadError, s3_conn.S3ConnectionError) as e:
-        logger.error(f"Failed to upload '{filename}' to '{bucket_name}': {e}")
+        logger.info("Uploading '%s' to S3 bucket '%s'...", filename, bucket_name)
+        with metrics.timer("upload"):
+            uploaded = await s3.upload_file(
+                bucket_name=bucket_name, filename=filename, file=file, folder=folder
+            )
+        if uploaded:
+            manifest.add(key, object_etag(file))
+            metrics.increment("files_uploaded")
+            metrics.increment("bytes_uploaded", len(file))
+            return True
+    except (s3.S3UploadError, s3.S3ConnectionError) as e:
+        logger.error("Failed to upload '%s' to '%s': %s", filename, bucket_name, e)
+    metrics.increment("failed_uploads")
+    return False
 
 
-async def process_url(url: str, bucket_name: str, folder: str) -> None:
+async def land_streamed(url: str, ctx: ExtractionContext) -> None:
     """
-    Asynchronously fetches data from a URL and uploads it to S3.
+    Asynchronously streams a URL into S3, recording the object once it has been written.
     Args:
         url (str): The URL to fetch data from.
-        bucket_name (str): The name of the S3 bucket.
-        folder (str): The folder in the S3 bucket where the file will be uploaded.
+        ctx (ExtractionContext): The settings and shared resources of the run.
     """
-    file, filename = await get_data(url)
-    if file.getvalue() == "":
-        logger.error(f"Data not available: {filename}. Skipping upload.")
+    key = f"{ctx.folder}{ctx.landing_name(url)}"
+    try:
+        logger.info("Streaming '%s' to '%s/%s'...", url, ctx.bucket_name, key)
+        with metrics.timer("stream"):
+            status = await stream_data(url, ctx, key)
+    except (ctx.s3.S3UploadError, UnexpectedColumnsError) as e:
+        await ctx.record(url, FAILED, error=str(e))
+        metrics.increment("failed_uploads")
+        logger.error("Failed to stream '%s' to '%s': %s", url, ctx.bucket_name, e)
         return
-    await write_to_s3(
-        bucket_name=bucket_name,
-        filename=filename,
-        file=file,
-        folder=folder,
+    if status == 200:
+        metrics.increment("files_uploaded")
+        ctx.manifest.add(key)
+        await ctx.commit(url, key)
+    elif status == 304:
+        metrics.increment("skipped_unchanged")
+        logger.info("File '%s' has not changed at the source. Skipping upload.", key)
+    else:
+        await ctx.record(url, FAILED, error=f"status code {status}")
+        logger.error("Data not available: %s. Skipping upload.", key)
+
+
+async def plan_stage(plan: Plan, fetch_queue) -> None:
+    """
+    Asynchronously queues the planned URLs for the fetch stage, waiting while it is busy.
+    Args:
+        plan (Plan): The URLs the run needs to fetch.
+        fetch_queue (asyncio.Queue): The queue feeding the fetch stage.
+    """
+    for url in plan:
+        await fetch_queue.put(url)
+
+
+async def fetch_stage(ctx: ExtractionContext, fetch_queue, transform_queue) -> None:
+    """
+    Asynchronously fetches queued URLs and passes their bodies on to the transform stage.
+    When streaming, files are written to S3 here as they download and skip the later stages.
+    Args:
+        ctx (ExtractionContext): The settings and shared resources of the run.
+        fetch_queue (asyncio.Queue): The queue of URLs to fetch, ended by None.
+        transform_queue (asyncio.Queue): The queue feeding the transform stage.
+    """
+    while (url := await fetch_queue.get()) is not None:
+        if ctx.part_size is not None:
+            await land_streamed(url, ctx)
+            continue
+        with metrics.timer("fetch"):
+            body, filename, status = await get_data(url, ctx)
+        if status == 304:
+            metrics.increment("skipped_unchanged")
+            logger.info("File '%s' has not changed at the source. Skipping upload.", filename)
+        elif not body:
+            await ctx.record(url, FAILED, error=f"status code {status}")
+            logger.error("Data not available: %s. Skipping upload.", filename)
+        else:
+            await ctx.record(url, FETCHED)
+            metrics.increment("bytes_fetched", len(body))
+            await transform_queue.put((url, body))
+
+
+async def transform_stage(ctx: ExtractionContext, executor, transform_queue, upload_queue) -> None:
+    """
+    Asynchronously turns fetched bodies into the bytes to land and passes them on to the
+    upload stage. The work runs on the process pool when one is given, so parsing never
+    holds up the event loop, and inline otherwise.
+    Args:
+        ctx (ExtractionContext): The settings and shared resources of the run.
+        executor (ProcessPoolExecutor | None): The pool running the transforms.
+        transform_queue (asyncio.Queue): The queue of (url, body) pairs, ended by None.
+        upload_queue (asyncio.Queue): The queue feeding the upload stage.
+    """
+    loop = asyncio.get_running_loop()
+    while (item := await transform_queue.get()) is not None:
+        url, body = item
+        args = (
+            url,
+            body,
+            ctx.raw,
+            ctx.output_format,
+            ctx.compression,
+            ctx.rollups,
+            ctx.quarantine is not None,
+        )
+        with metrics.timer("parse"):
+            if executor is None:
+                payload, rollups, report = prepare_file(*args)
+            else:
+                payload, rollups, report = await loop.run_in_executor(executor, prepare_file, *args)
+        if report is not None:
+            ctx.quality_reports.append(report)
+            metrics.observe("validate", report["seconds"])
+        if payload:
+            await upload_queue.put((url, payload, rollups, report))
+        else:
+            await ctx.record(url, FAILED, error="invalid file")
+            metrics.increment("parse_errors")
+
+
+async def upload_stage(ctx: ExtractionContext, upload_queue) -> None:
+    """
+    Asynchronously uploads transformed files to S3. When stored files are fetched again,
+    a file whose content matches the stored object's ETag is not uploaded again.
+    Args:
+        ctx (ExtractionContext): The settings and shared resources of the run.
+        upload_queue (asyncio.Queue): The queue of (url, payload, rollups, report) items,
+        ended by None.
+    """
+    while (item := await upload_queue.get()) is not None:
+        url, payload, rollups, report = item
+        if report is not None and not report["passed"]:
+            await quarantine_file(ctx, url, payload, report)
+            continue
+        filename = ctx.landing_name(url)
+        key = f"{ctx.folder}{filename}"
+        if ctx.overwrite and ctx.manifest.unchanged(key, payload, ctx.stored_part_size):
+            metrics.increment("skipped_same_content")
+            logger.info("File '%s' holds the same content in S3. Skipping upload.", filename)
+            await ctx.commit(url, key, checksum(payload))
+            continue
+        uploaded = await write_to_s3(
+            s3=ctx.s3,
+            bucket_name=ctx.bucket_name,
+            filename=filename,
+            file=payload,
+            manifest=ctx.manifest,
+            folder=ctx.folder,
+            overwrite=ctx.overwrite,
+        )
+        if uploaded:
+            await ctx.commit(url, key, checksum(payload))
+            await write_rollups(ctx, rollups)
+        elif key not in ctx.manifest:
+            await ctx.record(url, FAILED, error="upload failed")
+
+
+async def quarantine_file(ctx: ExtractionContext, url: str, body: bytes, report: dict) -> None:
+    """
+    Asynchronously lands a file that failed its quality checks in the quarantine folder,
+    exactly as received and together with its quality report, instead of the landing
+    folder.
+    Args:
+        ctx (ExtractionContext): The settings and shared resources of the run.
+        url (str): The URL the file was fetched from.
+        body (bytes): The file, as received.
+        report (dict): The quality report of the file.
+    """
+    filename = get_filename(url)
+    issues = ", ".join(f"{count} {check}" for check, count in report["issues"].items())
+    metrics.increment("quarantined")
+    logger.warning("File '%s' failed its quality checks (%s). Quarantining.", filename, issues)
+    await ctx.record(url, FAILED, error=f"failed quality checks: {issues}")
+    report_name = f"{filename.rsplit('.', 1)[0]}.quality.json"
+    for name, file in ((filename, body), (report_name, json.dumps(report).encode())):
+        if not await ctx.s3.upload_file(ctx.bucket_name, name, file, ctx.quarantine):
+            metrics.increment("failed_uploads")
+
+
+async def write_rollups(ctx: ExtractionContext, rollups: dict[str, bytes]) -> None:
+    """
+    Asynchronously uploads the rollups of a landed file to the rollup folder, replacing
+    any rollups of an earlier version of the file.
+    Args:
+        ctx (ExtractionContext): The settings and shared resources of the run.
+        rollups (dict[str, bytes]): The rollup files, keyed by path within the rollup folder.
+    """
+    for name, body in rollups.items():
+        if await ctx.s3.upload_file(ctx.bucket_name, name, body, rollup_folder(ctx.folder)):
+            metrics.increment("rollups_uploaded")
+        else:
+            metrics.increment("failed_uploads")
+
+
+async def run_stage(workers: list[Coroutine], next_queue=None, next_workers: int = 0) -> None:
+    """
+    Asynchronously runs the workers of one pipeline stage to completion, then tells every
+    worker of the next stage to stop once it has drained its queue.
+    Args:
+        workers (list[Coroutine]): The workers of the stage.
+        next_queue (asyncio.Queue | None): The queue feeding the next stage.
+        next_workers (int): The number of workers in the next stage.
+    """
+    async with asyncio.TaskGroup() as tg:
+        for worker in workers:
+            tg.create_task(worker)
+    for _ in range(next_workers):
+        await next_queue.put(None)
+
+
+def create_executor(transform_workers: int, inline: bool) -> ProcessPoolExecutor | None:
+    """
+    Creates the process pool the transform stage parses and converts files on.
+    Args:
+        transform_workers (int): The number of transform processes.
+        inline (bool): Whether transforms are cheap enough to run inline, as when files are
+        landed as received without rollups, which needs no pool.
+    Returns:
+        ProcessPoolExecutor | None: The pool, or None for inline transforms.
+    """
+    if inline:
+        return None
+    return ProcessPoolExecutor(
+        max_workers=transform_workers, mp_context=multiprocessing.get_context("spawn")
     )
 
 
-async def run_data_extraction(
-    base_url: str,
-    bucket_name: str,
-    current_year: int,
-    months: range,
-    provinces: list[str],
-    folder: str,
+def check_output_format(
+    output_format: str,
+    raw: bool,
+    stream: bool,
+    rollups: bool = False,
+    validate: bool = False,
+    refresh: bool = False,
+    following: bool = False,
 ) -> None:
     """
-    Main asynchronous function to run the data extraction and upload process.
+    Checks that an output format is known and can be combined with the landing mode.
+    Args:
+        output_format (str): The format to land files in.
+        raw (bool): Whether files are landed exactly as received.
+        stream (bool): Whether files are streamed to S3 as they download.
+        rollups (bool): Whether rollups are landed next to every file.
+        validate (bool): Whether every file is checked before it is landed.
+        refresh (bool): Whether stored files are compared with their fetched content.
+        following (bool): Whether the current month is followed after the run.
+    Raises:
+        ValueError: If the format is unknown, is Parquet in raw or streaming mode, or when
+        following, or if rollups, quality checks or a refresh are asked of a streaming run.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}'.")
+    if output_format == "parquet" and (raw or stream):
+        raise ValueError("Parquet output parses every file and cannot be raw or streamed.")
+    if output_format == "parquet" and following:
+        raise ValueError("Following appends CSV rows to the monthly files, which must be CSV.")
+    if (rollups or validate or refresh) and stream:
+        raise ValueError(
+            "Rollups, quality checks and refreshes need whole files, so files cannot be streamed."
+        )
+
+
+async def run_pipeline(
+    ctx: ExtractionContext,
+    plan: Plan,
+    executor: ProcessPoolExecutor | None,
+    concurrency: int,
+    transform_workers: int,
+) -> None:
+    """
+    Asynchronously runs the plan -> fetch -> transform -> upload stages over a plan.
+    The stages are connected by bounded queues, so a slow stage applies backpressure to
+    the ones before it instead of letting work pile up in memory.
+    Args:
+        ctx (ExtractionContext): The settings and shared resources of the run.
+        plan (Plan): The URLs the run needs to fetch.
+        executor (ProcessPoolExecutor | None): The pool running the transforms.
+        concurrency (int): The number of fetch workers.
+        transform_workers (int): The number of transform workers.
+    """
+    fetch_queue = asyncio.Queue(maxsize=concurrency)
+    transform_queue = asyncio.Queue(maxsize=2 * transform_workers)
+    upload_queue = asyncio.Queue(maxsize=2 * S3_WORKERS)
+    async with asyncio.TaskGroup() as tg:
+        tg.create_task(run_stage([plan_stage(plan, fetch_queue)], fetch_queue, concurrency))
+        tg.create_task(
+            run_stage(
+                [fetch_stage(ctx, fetch_queue, transform_queue) for _ in range(concurrency)],
+                transform_queue,
+                transform_workers,
+            )
+        )
+        tg.create_task(
+            run_stage(
+                [
+                    transform_stage(ctx, executor, transform_queue, upload_queue)
+                    for _ in range(transform_workers)
+                ],
+                upload_queue,
+                S3_WORKERS,
+            )
+        )
+        tg.create_task(run_stage([upload_stage(ctx, upload_queue) for _ in range(S3_WORKERS)]))
+
+
+async def hold_lease(leases: LeaseTable, batch: str) -> None:
+    """
+    Asynchronously renews the lease on a batch three times per lease period, until cancelled.
+    Returns once the lease is lost, or can no longer be renewed.
+    Args:
+        leases (LeaseTable): The lease table the batch was claimed through.
+        batch (str): The claimed batch.
+    """
+    while True:
+        await asyncio.sleep(leases.lease_seconds / 3)
+        try:
+            renewed = await asyncio.to_thread(leases.renew, batch)
+        except LeaseTable.LeaseError as e:
+            logger.error("Failed to renew the lease on batch %s: %s", batch, e)
+            return
+        if not renewed:
+            logger.warning("Lost the lease on batch %s to another worker.", batch)
+            return
+
+
+async def run_batch(
+    ctx: ExtractionContext,
+    plan: Plan,
+    leases: LeaseTable,
+    batch: str,
+    executor: ProcessPoolExecutor | None,
+    concurrency: int,
+    transform_workers: int,
+) -> bool:
+    """
+    Asynchronously runs the pipeline over a claimed batch while holding its lease. The
+    pipeline is cancelled as soon as the lease is lost, so the batch is not worked on by
+    the worker that took it over and this one at once.
+    Args:
+        ctx (ExtractionContext): The settings and shared resources of the run.
+        plan (Plan): The URLs of the batch.
+        leases (LeaseTable): The lease table the batch was claimed through.
+        batch (str): The claimed batch.
+        executor (ProcessPoolExecutor | None): The pool running the transforms.
+        concurrency (int): The number of fetch workers.
+        transform_workers (int): The number of transform workers.
+    Returns:
+        bool: True if the pipeline ran to completion, False if the lease was lost first.
+    """
+    pipeline = asyncio.create_task(
+        run_pipeline(ctx, plan, executor, concurrency, transform_workers)
+    )
+    heartbeat = asyncio.create_task(hold_lease(leases, batch))
+    try:
+        await asyncio.wait((pipeline, heartbeat), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        heartbeat.cancel()
+        if not pipeline.done():
+            pipeline.cancel()
+            await asyncio.gather(pipeline, return_exceptions=True)
+    if pipeline.cancelled():
+        return False
+    pipeline.result()
+    return True
+
+
+async def run_leased(
+    ctx: ExtractionContext,
+    plan: Plan,
+    leases: LeaseTable | None,
+    executor: ProcessPoolExecutor | None,
+    concurrency: int,
+    transform_workers: int,
+) -> None:
+    """
+    Asynchronously runs the pipeline over the batches of a plan that this worker claims.
+    Batches of one province and year are claimed one at a time through the lease table, so
+    several workers can share a run and no batch is worked on by two of them at once.
+    Once no batch is left to claim, the worker waits for the batches leased by others and
+    reclaims any whose lease expires, such as the batch of a crashed worker. A batch whose
+    lease is lost to another worker is put back with them, in case that worker dies too.
+    Without a lease table the whole plan is run at once.
+    Args:
+        ctx (ExtractionContext): The settings and shared resources of the run.
+        plan (Plan): The URLs the run needs to fetch.
+        leases (LeaseTable | None): The lease table shared by the workers of the run.
+        executor (ProcessPoolExecutor | None): The pool running the transforms.
+        concurrency (int): The number of fetch workers.
+        transform_workers (int): The number of transform workers.
+    """
+    if leases is None:
+        await run_pipeline(ctx, plan, executor, concurrency, transform_workers)
+        return
+    grouped = batches(plan)
+    pending = list(grouped)
+    while pending:
+        batch, pending = await asyncio.to_thread(leases.claim, pending)
+        if batch is None:
+            await asyncio.sleep(leases.lease_seconds / 10)
+            continue
+        metrics.increment("batches_claimed")
+        logger.info("Claimed batch %s of %d URLs.", batch, len(grouped[batch]))
+        batch_plan = Plan(grouped[batch])
+        if not await run_batch(
+            ctx, batch_plan, leases, batch, executor, concurrency, transform_workers
+        ):
+            metrics.increment("batches_lost")
+            logger.warning("Stopped batch %s after losing its lease.", batch)
+            pending.append(batch)
+        elif not await asyncio.to_thread(leases.finish, batch):
+            metrics.increment("batches_lost")
+            logger.warning(
+                "Batch %s ran to completion, but its lease had already passed to another "
+                "worker, which will run it again.",
+                batch,
+            )
+            pending.append(batch)
+
+
+def log_plan(plan: Plan, ledger: JobLedger | None) -> None:
+    """
+    Logs every planned URL of a dry run, then closes the job ledger.
+    Args:
+        plan (Plan): The planned URLs.
+        ledger (JobLedger | None): The job ledger the plan was read from.
+    """
+    for url in plan:
+        logger.info("Planned: %s", url)
+    if ledger is not None:
+        ledger.close()
+
+
+@dataclasses.dataclass(kw_only=True)
+class ExtractionSettings:
+    """
+    Holds the settings of one extraction run, checked once when it is built.
     Args:
         base_url (str): The base URL for the data.
         bucket_name (str): The name of the S3 bucket.
         current_year (int): The current year.
-        months (range): The range of months to generate URLs for.
-        provinces (list): The list of provinces to generate URLs for.
-        folder (str): The folder in the S3 bucket where the file will be uploaded.
+        months (list[int] | range): The months to generate URLs for.
+        provinces (list[str]): The provinces to generate URLs for.
+        folder (str): The folder in the S3 bucket where files are landed.
+        concurrency (int): The maximum number of URLs fetched at once.
+        per_host_limit (int): The maximum number of connections open to a single host.
+        min_concurrency (int): The lowest number of requests the limiter backs off to.
+        max_retries (int): The number of retries for throttled or failed requests.
+        manifest_path (str | None): A local file the manifest index is persisted to.
+        manifest_max_age (float | None): The number of seconds a persisted manifest is reused.
+        incremental (bool): Whether to refresh stored files with conditional requests.
+        validator_cache_path (str): The local file the validator cache is persisted to.
+        raw (bool): Whether to land files exactly as received instead of re-serialising them.
+        stream (bool): Whether to stream files to S3 as they download, which implies raw.
+        part_size (int): The multipart part size used when streaming, in bytes.
+        output_format (str): The format to land files in, "csv" or "parquet".
+        compression (str): The Parquet compression codec, "zstd" or "snappy".
+        transform_workers (int | None): The number of transform processes (default: cores).
+        metrics_path (str | None): A local file the JSON run summary is written to.
+        prometheus_path (str | None): A local file the metrics are written to for Prometheus.
+        negative_cache_path (str): The local file the known-missing URLs are persisted to.
+        negative_cache_ttl (float): The number of seconds a missing URL is skipped for.
+        dry_run (bool): Whether to only log the plan, without fetching anything.
+        ledger_path (str | None): A local SQLite file to keep the job ledger in.
+        ledger_table (str | None): A DynamoDB table to keep the job ledger in.
+        dynamodb_endpoint (str | None): The endpoint of a DynamoDB-compatible service.
+        shard_index (int): The shard of this worker, between 0 and `shard_count` - 1.
+        shard_count (int): The number of workers statically sharing the run.
+        run_id (str | None): The name of the run shared through the lease table.
+        lease_table (str | None): A DynamoDB table the workers claim batches through.
+        lease_path (str | None): A local SQLite file the workers claim batches through.
+        lease_seconds (int): The number of seconds a claimed batch is leased for.
+        rollups (bool): Whether to land daily and monthly rollups next to every file.
+        validate (bool): Whether to check every file before landing it.
+        quarantine (str | None): The folder in the S3 bucket files failing their checks are
+        landed in (default: next to the landing folder).
+        quality_report_path (str | None): A local file the quality reports are written to.
+        refresh (bool): Whether to fetch stored files again and land those that changed.
+        following (bool): Whether to keep following the current month after the run.
+        poll_seconds (float): The number of seconds between polls when following.
+        compact_seconds (float): The number of seconds between compactions of the deltas.
+        revalidate_seconds (float): The number of seconds between checks of the whole
+        followed files for corrected rows.
+        follow_polls (int | None): The number of polls before following stops (default:
+        follow until cancelled).
+        tail_state_path (str): The local file the positions reached in the followed files
+        are persisted to.
+    Raises:
+        ValueError: If the output format is unknown or cannot be combined with the mode.
     """
-    async for url in get_url(base_url, current_year, months, provinces):
-        await process_url(url, bucket_name, folder)
-    logger.info("All generated links have been processed.")
 
+    base_url: str
+    bucket_name: str
+    current_year: int
+    months: list[int] | range
+    provinces: list[str]
+    folder: str
+    concurrency: int = 16
+    per_host_limit: int = 8
+    min_concurrency: int = 1
+    max_retries: int = 5
+    manifest_path: str | None = None
+    manifest_max_age: float | None = None
+    incremental: bool = False
+    validator_cache_path: str = "validator_cache.json"
+    raw: bool = False
+    stream: bool = False
+    part_size: int = PART_SIZE
+    output_format: str = "csv"
+    compression: str = "zstd"
+    transform_workers: int | None = None
+    metrics_path: str | None = None
+    prometheus_path: str | None = None
+    negative_cache_path: str = "negative_cache.json"
+    negative_cache_ttl: float = NEGATIVE_CACHE_TTL
+    dry_run: bool = False
+    ledger_path: str | None = None
+    ledger_table: str | None = None
+    dynamodb_endpoint: str | None = None
+    shard_index: int = 0
+    shard_count: int = 1
+    run_id: str | None = None
+    lease_table: str | None = None
+    lease_path: str | None = None
+    lease_seconds: int = LEASE_SECONDS
+    rollups: bool = False
+    validate: bool = False
+    quarantine: str | None = None
+    quality_report_path: str | None = None
+    refresh: bool = False
+    following: bool = False
+    poll_seconds: float = POLL_SECONDS
+    compact_seconds: float = COMPACT_SECONDS
+    revalidate_seconds: float = REVALIDATE_SECONDS
+    follow_polls: int | None = None
+    tail_state_path: str = "tail_state.json"
 
-if __name__ == "__main__":
+    def __post_init__(self):
+        check_output_format(
+            self.output_format,
+            self.raw,
+            self.stream,
+            self.rollups,
+            self.validate,
+            self.refresh,
+            self.following,
+        )
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "ExtractionSettings":
+        """
+        Builds the settings of a run from its command-line arguments.
+        Args:
+            args (argparse.Namespace): The parsed arguments of the extraction CLI.
+        Returns:
+            ExtractionSettings: The checked settings.
+        """
+        values = {CLI_NAMES.get(name, name): value for name, value in vars(args).items()}
+        values["part_size"] = values.pop("part_size_mb") * 1024 * 1024
+        return cls(**values)
+
+    def landed_key(self, url: str) -> str:
+        """
+        Returns the key the file at a URL lands under.
+        Args:
+            url (str): The URL of the source file.
+        Returns:
+            str: The key of the landed object.
+        """
+        return f"{self.folder}{landing_name(get_filename(url), self.output_format)}"
+
+
+def plan_run(settings: ExtractionSettings, manifest: Manifest, negative_cache, ledger) -> Plan:
+    """
+    Plans the URLs this worker needs to fetch.
+    Args:
+        settings (ExtractionSettings): The settings of the run.
+        manifest (Manifest): The index of objects already stored under the folder.
+        negative_cache (NegativeCache): The URLs recently answered with a 404.
+        ledger (JobLedger | None): The job ledger of the run.
+    Returns:
+        Plan: The URLs of this worker's shard that are published and still needed.
+    """
+    with metrics.timer("plan"):
+        plan = plan_urls(
+            settings.base_url,
+            settings.current_year,
+            settings.months,
+            settings.provinces,
+            key=settings.landed_key,
+            manifest=manifest,
+            negative_cache=negative_cache,
+            done=ledger.done() if ledger is not None and not settings.refresh else None,
+            include_stored=settings.incremental or settings.refresh,
+        )
+        plan = shard_plan(plan, settings.shard_index, settings.shard_count)
+    logger.info("Plan: %s", plan.describe())
+    return plan
+
+
+def save_run_state(settings: ExtractionSettings, ctx: ExtractionContext) -> None:
+    """
+    Persists the manifest index, the validator and negative caches, the quality reports
+    and the metrics of a run. A run following the current month only ends when it is
+    stopped, so they are also persisted before it starts following and after every poll.
+    Args:
+        settings (ExtractionSettings): The settings of the run.
+        ctx (ExtractionContext): The settings and shared resources of the run.
+    """
+    if settings.manifest_path:
+        ctx.manifest.save(settings.manifest_path)
+    if ctx.validators is not None:
+        ctx.validators.save(settings.validator_cache_path)
+    ctx.negative_cache.save(settings.negative_cache_path)
+    save_reports(settings.quality_report_path, ctx.quality_reports)
+    metrics.save(settings.metrics_path, settings.prometheus_path)
+
+
+async def run_data_extraction(settings: ExtractionSettings) -> None:
+    """
+    Main asynchronous function to run the data extraction and upload process.
+    The planned URLs flow through fetch, transform and upload stages connected by bounded
+    queues, so a slow stage applies backpressure instead of letting work pile up in memory.
+    The caches, quality reports and metrics of the run are saved when it ends, and after
+    every poll while following the current month.
+    Args:
+        settings (ExtractionSettings): The settings of the run.
+    """
+    metrics.reset()
+    validators = (
+        ValidatorCache.load(settings.validator_cache_path) if settings.incremental else None
+    )
+    manifest = Manifest.load(
+        s3_conn,
+        settings.bucket_name,
+        settings.folder,
+        path=settings.manifest_path,
+        max_age=settings.manifest_max_age,
+    )
+    negative_cache = NegativeCache.load(
+        settings.negative_cache_path, ttl=settings.negative_cache_ttl
+    )
+    ledger = open_ledger(
+        settings.ledger_table, settings.ledger_path, "us-east-2", settings.dynamodb_endpoint
+    )
+    plan = plan_run(settings, manifest, negative_cache, ledger)
+    if settings.dry_run:
+        log_plan(plan, ledger)
+        return
+    transform_workers = settings.transform_workers or os.cpu_count() or 1
+    executor = create_executor(
+        transform_workers,
+        (settings.raw or settings.stream) and not (settings.rollups or settings.validate),
+    )
+    s3 = AsyncS3Buckets(s3_conn, max_workers=S3_WORKERS)
+    leases = open_leases(
+        settings.run_id,
+        settings.lease_table,
+        settings.lease_path,
+        "us-east-2",
+        settings.dynamodb_endpoint,
+        lease_seconds=settings.lease_seconds,
+    )
+    ctx = None
+    try:
+        if ledger is not None:
+            await asyncio.to_thread(ledger.plan, plan)
+        async with create_session(settings.concurrency, settings.per_host_limit) as session:
+            ctx = ExtractionContext.from_settings(
+                settings, session, s3, manifest, validators, negative_cache, ledger
+            )
+            await run_leased(ctx, plan, leases, executor, settings.concurrency, transform_workers)
+            if settings.following:
+                save_run_state(settings, ctx)
+                await follow(
+                    ctx,
+                    settings.base_url,
+                    settings.provinces,
+                    settings.tail_state_path,
+                    settings.poll_seconds,
+                    settings.compact_seconds,
+                    settings.follow_polls,
+                    settings.revalidate_seconds,
+                    functools.partial(save_run_state, settings, ctx),
+                )
+    finally:
+        s3.close()
+        if leases is not None:
+            leases.close()
+        if executor is not None:
+            executor.shutdown()
+        if ledger is not None:
+            await asyncio.to_thread(ledger.close)
+        if ctx is not None:
+            save_run_state(settings, ctx)
+    logger.info("All generated links have been processed. Counters: %s", metrics.counters)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """
+    Parses the data extraction arguments.
+    Args:
+        argv (list[str] | None): The arguments to parse (default: the command line).
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
     parser = argparse.ArgumentParser(description="Data Extraction Arguments.")
     parser.add_argument(
         "--base_url",
@@ -186,17 +1185,240 @@ if __name__ == "__main__":
         nargs="+",
         default=["QLD", "NSW", "VIC", "SA", "TAS"],
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=16,
+        help="Maximum number of URLs processed at once.",
+    )
+    parser.add_argument(
+        "--per_host_limit",
+        type=int,
+        default=8,
+        help="Maximum number of open connections to a single host.",
+    )
+    parser.add_argument(
+        "--min_concurrency",
+        type=int,
+        default=1,
+        help="Lowest number of requests in flight when the source throttles.",
+    )
+    parser.add_argument(
+        "--max_retries",
+        type=int,
+        default=5,
+        help="Number of retries for throttled or failed requests.",
+    )
+    parser.add_argument(
+        "--manifest_path",
+        type=str,
+        default=None,
+        help="Local file to persist the S3 manifest index to between runs.",
+    )
+    parser.add_argument(
+        "--manifest_max_age",
+        type=float,
+        default=86400,
+        help="Seconds a persisted manifest index is reused before S3 is listed again.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Refresh stored files with conditional requests instead of skipping them.",
+    )
+    parser.add_argument(
+        "--validator_cache_path",
+        type=str,
+        default="validator_cache.json",
+        help="Local file holding the ETag/Last-Modified cache used by incremental runs.",
+    )
+    parser.add_argument(
+        "--raw",
+        action="store_true",
+        help="Land files exactly as received, checking only their header row.",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream files to S3 as they download, as multipart uploads. Implies --raw.",
+    )
+    parser.add_argument(
+        "--part_size_mb",
+        type=int,
+        default=8,
+        help="Multipart upload part size used with --stream, in MiB (at least 5).",
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        choices=OUTPUT_FORMATS,
+        default="csv",
+        help="Format to land files in. Parquet is partitioned by region, year and month.",
+    )
+    parser.add_argument(
+        "--compression",
+        type=str,
+        choices=COMPRESSIONS,
+        default="zstd",
+        help="Compression codec used for Parquet output.",
+    )
+    parser.add_argument(
+        "--transform_workers",
+        type=int,
+        default=None,
+        help="Number of processes parsing and converting files. Defaults to the core count.",
+    )
+    parser.add_argument(
+        "--metrics_path",
+        type=str,
+        default=None,
+        help="Local file to write the JSON run summary of stage latencies and counters to.",
+    )
+    parser.add_argument(
+        "--prometheus_path",
+        type=str,
+        default=None,
+        help="Local file to write the run metrics to in Prometheus text format.",
+    )
+    parser.add_argument(
+        "--negative_cache_path",
+        type=str,
+        default="negative_cache.json",
+        help="Local file to persist the URLs recently found missing to between runs.",
+    )
+    parser.add_argument(
+        "--negative_cache_ttl",
+        type=float,
+        default=NEGATIVE_CACHE_TTL,
+        help="Seconds a URL found missing is skipped for before it is requested again.",
+    )
+    parser.add_argument(
+        "--dry_run",
+        action="store_true",
+        help="Log the planned URLs without fetching or uploading anything.",
+    )
+    parser.add_argument(
+        "--ledger_path",
+        type=str,
+        default=None,
+        help="Local SQLite file to keep the job ledger in, so a crashed run can resume.",
+    )
+    parser.add_argument(
+        "--ledger_table",
+        type=str,
+        default=None,
+        help="DynamoDB table to keep the job ledger in; takes precedence over --ledger_path.",
+    )
+    parser.add_argument(
+        "--dynamodb_endpoint",
+        type=str,
+        default=None,
+        help="Endpoint of a DynamoDB-compatible service, such as DynamoDB Local.",
+    )
+    parser.add_argument(
+        "--shard_index",
+        type=int,
+        default=0,
+        help="Shard of this worker when the run is statically split, from 0.",
+    )
+    parser.add_argument(
+        "--shard_count",
+        type=int,
+        default=1,
+        help="Number of workers the run is statically split between.",
+    )
+    parser.add_argument(
+        "--run_id",
+        type=str,
+        default=None,
+        help="Name of the run shared by the workers of a lease table.",
+    )
+    parser.add_argument(
+        "--lease_table",
+        type=str,
+        default=None,
+        help="DynamoDB table workers claim batches through; requires --run_id.",
+    )
+    parser.add_argument(
+        "--lease_path",
+        type=str,
+        default=None,
+        help="Local SQLite file workers on one host claim batches through; requires --run_id.",
+    )
+    parser.add_argument(
+        "--lease_seconds",
+        type=int,
+        default=LEASE_SECONDS,
+        help="Seconds a claimed batch is leased for before another worker may reclaim it.",
+    )
+    parser.add_argument(
+        "--rollups",
+        action="store_true",
+        help="Land daily and monthly price and demand rollups next to the landed files.",
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Check every file's schema, values and intervals before landing it.",
+    )
+    parser.add_argument(
+        "--quarantine",
+        type=str,
+        default=None,
+        help="Folder in AWS S3 files failing their checks land in (default <folder>_quarantine/).",
+    )
+    parser.add_argument(
+        "--quality_report_path",
+        type=str,
+        default=None,
+        help="Local file to write the quality report of every checked file to, as JSON lines.",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Fetch stored files again and upload only those whose content changed.",
+    )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Keep polling the current month after the run, landing new intervals as deltas.",
+    )
+    parser.add_argument(
+        "--poll_seconds",
+        type=float,
+        default=POLL_SECONDS,
+        help="Seconds between polls of the current month when following.",
+    )
+    parser.add_argument(
+        "--compact_seconds",
+        type=float,
+        default=COMPACT_SECONDS,
+        help="Seconds between foldings of the deltas back into the monthly files.",
+    )
+    parser.add_argument(
+        "--revalidate_seconds",
+        type=float,
+        default=REVALIDATE_SECONDS,
+        help="Seconds between checks of the whole followed files for corrected rows.",
+    )
+    parser.add_argument(
+        "--follow_polls",
+        type=int,
+        default=None,
+        help="Number of polls before following stops. Defaults to following until stopped.",
+    )
+    parser.add_argument(
+        "--tail_state_path",
+        type=str,
+        default="tail_state.json",
+        help="Local file holding the positions reached in the followed files.",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
     logger.info(f"Arguments: {args}")
     logger.info("Starting data extraction and upload process...")
-    asyncio.run(
-        run_data_extraction(
-            base_url=args.base_url,
-            bucket_name=args.bucket_name,
-            current_year=args.current_year,
-            months=args.months,
-            provinces=args.provinces,
-            folder=args.folder,
-        )
-    )
+    asyncio.run(run_data_extraction(ExtractionSettings.from_args(args)))
     logger.info("data extraction and upload to AWS S3 completed.")
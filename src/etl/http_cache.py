@@ -0,0 +1,184 @@
+"""HTTP Validator Cache Module."""
+
+import json
+import os
+import time
+
+from src.utils.logs import get_logger
+
+logger = get_logger(__name__)
+NEGATIVE_CACHE_TTL = 7 * 24 * 3600
+
+
+class ValidatorCache:
+    def __init__(self, entries=None):
+        """
+        Initializes a cache of the HTTP validators last seen for each URL.
+
+        Each entry holds the ETag, Last-Modified and Content-Length headers of the
+        response that was last landed for a URL. Validators of a new response are staged
+        first and only committed once the file has been uploaded, so a failed upload is
+        retried by the next run instead of being answered with a 304.
+
+        :param entries: Mapping of URL to its validators (default is None, an empty cache)
+        """
+        self.entries = dict(entries or {})
+        self.pending = {}
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a cache previously written with `save`. A missing file yields an empty cache.
+
+        :param path: Local file holding the persisted cache
+        :return: The loaded ValidatorCache
+        """
+        if not os.path.exists(path):
+            return cls()
+        with open(path, encoding="utf-8") as f:
+            cache = cls(json.load(f))
+        logger.info("Loaded validators for %d URLs from '%s'.", len(cache), path)
+        return cache
+
+    def save(self, path):
+        """
+        Persists the committed validators to a local file, replacing it atomically.
+
+        :param path: Local file to write the cache to
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, path)
+
+    def conditional_headers(self, url):
+        """
+        Builds the conditional request headers for a URL from its cached validators.
+
+        :param url: The URL about to be requested
+        :return: A dict holding If-None-Match and/or If-Modified-Since, empty if unknown
+        """
+        entry = self.entries.get(url, {})
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def unchanged(self, url, headers):
+        """
+        Checks whether a full response carries the same validators as the cached entry.
+        This catches servers that ignore conditional headers and answer 200 anyway.
+
+        :param url: The requested URL
+        :param headers: The headers of the response
+        :return: True if the response is known to hold the cached content
+        """
+        entry = self.entries.get(url)
+        if not entry:
+            return False
+        etag = headers.get("ETag")
+        if etag and entry.get("etag"):
+            return etag == entry["etag"]
+        last_modified = headers.get("Last-Modified")
+        return bool(last_modified) and (
+            last_modified == entry.get("last_modified")
+            and headers.get("Content-Length") == entry.get("content_length")
+        )
+
+    def stage(self, url, headers):
+        """
+        Holds the validators of a fresh response until its file has been landed.
+
+        :param url: The requested URL
+        :param headers: The headers of the response
+        """
+        self.pending[url] = {
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "content_length": headers.get("Content-Length"),
+        }
+
+    def commit(self, url):
+        """
+        Promotes the staged validators of a URL once its file has been landed.
+
+        :param url: The URL whose file was landed
+        """
+        if url in self.pending:
+            self.entries[url] = self.pending.pop(url)
+
+    def __contains__(self, url):
+        return url in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class NegativeCache:
+    def __init__(self, entries=None, ttl=NEGATIVE_CACHE_TTL):
+        """
+        Initializes a cache of URLs known to be missing at the source.
+
+        Each entry holds the time a URL was last answered with a 404. Entries older than
+        the TTL no longer count, so a file published late is picked up by a later run.
+
+        :param entries: Mapping of URL to the Unix time it was found missing
+        (default is None, an empty cache)
+        :param ttl: Seconds a missing URL is skipped for (default is 7 days)
+        """
+        self.entries = dict(entries or {})
+        self.ttl = ttl
+
+    @classmethod
+    def load(cls, path, ttl=NEGATIVE_CACHE_TTL):
+        """
+        Reads a cache previously written with `save`. A missing file yields an empty cache.
+
+        :param path: Local file holding the persisted cache
+        :param ttl: Seconds a missing URL is skipped for (default is 7 days)
+        :return: The loaded NegativeCache
+        """
+        if not os.path.exists(path):
+            return cls(ttl=ttl)
+        with open(path, encoding="utf-8") as f:
+            cache = cls(json.load(f), ttl=ttl)
+        logger.info("Loaded %d known-missing URLs from '%s'.", len(cache), path)
+        return cache
+
+    def save(self, path):
+        """
+        Persists the entries that have not expired to a local file, replacing it atomically.
+
+        :param path: Local file to write the cache to
+        """
+        cutoff = time.time() - self.ttl
+        entries = {url: seen for url, seen in self.entries.items() if seen > cutoff}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, path)
+
+    def add(self, url):
+        """
+        Records that a URL was just answered with a 404.
+
+        :param url: The missing URL
+        """
+        self.entries[url] = time.time()
+
+    def discard(self, url):
+        """
+        Forgets a URL, once it has been found at the source.
+
+        :param url: The URL that was found
+        """
+        self.entries.pop(url, None)
+
+    def __contains__(self, url):
+        seen = self.entries.get(url)
+        return seen is not None and time.time() - seen < self.ttl
+
+    def __len__(self):
+        return len(self.entries)
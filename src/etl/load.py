@@ -0,0 +1,104 @@
+"""Warehouse Load Module."""
+
+import argparse
+
+from src.utils.logs import get_logger
+from src.utils.metrics import metrics
+from src.utils.redshift import PostgresLoader, RedshiftLoader
+from src.utils.s3 import S3Buckets
+
+logger = get_logger(__name__)
+s3_conn = S3Buckets.credentials("us-east-2")
+
+
+def run_load(
+    bucket_name: str,
+    folder: str,
+    dsn: str | None = None,
+    postgres: bool = False,
+    batch_size: int = 500,
+    manifest_folder: str = "copy_manifests/",
+    metrics_path: str | None = None,
+) -> int:
+    """
+    Loads the CSV files landed under a folder of the bucket into the warehouse.
+    Only files that are new, or whose ETag changed, since the last load are copied, in
+    batches of `batch_size` files per COPY, and merged into the price_demand table keyed
+    on region and settlement time.
+    Args:
+        bucket_name (str): The name of the S3 bucket.
+        folder (str): The folder in the S3 bucket holding the landed files.
+        dsn (str | None): The warehouse connection string (default: REDSHIFT_DSN).
+        postgres (bool): Whether the warehouse is a local PostgreSQL stand-in for Redshift.
+        batch_size (int): The number of files loaded by each COPY.
+        manifest_folder (str): The folder in the S3 bucket the COPY manifests are written to.
+        metrics_path (str | None): A local file the JSON run summary is written to.
+    Returns:
+        int: The number of files loaded.
+    """
+    metrics.reset()
+    loader_class = PostgresLoader if postgres else RedshiftLoader
+    with loader_class.credentials(
+        s3_conn, bucket_name, dsn, manifest_folder=manifest_folder, batch_size=batch_size
+    ) as loader:
+        loader.create_tables()
+        loaded = loader.load(folder)
+    metrics.save(metrics_path)
+    logger.info("Loaded %d files. Counters: %s", loaded, metrics.counters)
+    return loaded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warehouse Load Arguments.")
+    parser.add_argument(
+        "--bucket_name",
+        type=str,
+        default="energy-data-bucket",
+        help="S3 bucket name.",
+    )
+    parser.add_argument(
+        "--folder",
+        type=str,
+        default="Energy_Price_Demand/",
+        help="Folder in AWS S3 holding the landed files.",
+    )
+    parser.add_argument(
+        "--dsn",
+        type=str,
+        default=None,
+        help="Warehouse connection string. Defaults to REDSHIFT_DSN from the environment.",
+    )
+    parser.add_argument(
+        "--postgres",
+        action="store_true",
+        help="Load into a local PostgreSQL stand-in for Redshift, streaming files from S3.",
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=500,
+        help="Number of files loaded by each COPY.",
+    )
+    parser.add_argument(
+        "--manifest_folder",
+        type=str,
+        default="copy_manifests/",
+        help="Folder in AWS S3 the COPY manifests are written to.",
+    )
+    parser.add_argument(
+        "--metrics_path",
+        type=str,
+        default=None,
+        help="Local file to write the JSON run summary to.",
+    )
+    args = parser.parse_args()
+    logger.info(f"Arguments: {args}")
+    run_load(
+        bucket_name=args.bucket_name,
+        folder=args.folder,
+        dsn=args.dsn,
+        postgres=args.postgres,
+        batch_size=args.batch_size,
+        manifest_folder=args.manifest_folder,
+        metrics_path=args.metrics_path,
+    )
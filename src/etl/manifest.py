@@ -0,0 +1,119 @@
+"""S3 Manifest Index Module."""
+
+import json
+import os
+import time
+
+from src.etl.streaming import MIN_PART_SIZE, PART_SIZE
+from src.utils.logs import get_logger
+from src.utils.s3 import object_etag
+
+logger = get_logger(__name__)
+
+
+class Manifest:
+    def __init__(self, objects=None, listed_at=None):
+        """
+        Initializes an in-memory index of the objects stored under an S3 prefix.
+
+        The index maps each object key to its ETag so that existence checks are O(1)
+        dictionary lookups instead of one LIST request per file.
+
+        :param objects: Mapping of object key to ETag (default is None, an empty index)
+        :param listed_at: Time the prefix was listed, in seconds since the epoch (default
+        is None, unknown)
+        """
+        self.objects = dict(objects or {})
+        self.listed_at = listed_at
+
+    @classmethod
+    def load(cls, s3_conn, bucket_name, folder="", path=None, max_age=None):
+        """
+        Builds the index for a bucket prefix with a single paginated listing.
+
+        If `path` points at an index persisted by a previous run whose listing is younger
+        than `max_age` seconds, it is used as is and S3 is not listed at all. Otherwise the
+        prefix is listed and, when `path` is given, the fresh index is persisted there.
+        The age is that of the listing, which is saved with the index, so saving the
+        index again at the end of a run does not make it any younger.
+
+        :param s3_conn: The S3Buckets connection used to list the prefix
+        :param bucket_name: Name of the S3 bucket
+        :param folder: Folder path within the S3 bucket (default is an empty string)
+        :param path: Local file the index is persisted to between runs (default is None)
+        :param max_age: Seconds a persisted index stays valid (default is None, always valid)
+        :return: The loaded Manifest
+        """
+        if path and os.path.exists(path):
+            manifest = cls.from_file(path)
+            if max_age is None or (
+                manifest.listed_at is not None and time.time() - manifest.listed_at <= max_age
+            ):
+                logger.info("Loaded %d keys from manifest cache '%s'.", len(manifest), path)
+                return manifest
+        listed_at = time.time()
+        manifest = cls(s3_conn.list_objects(bucket_name=bucket_name, folder=folder), listed_at)
+        logger.info("Indexed %d keys under '%s/%s'.", len(manifest), bucket_name, folder)
+        if path:
+            manifest.save(path)
+        return manifest
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Reads an index previously written with `save`. An index saved without the time of
+        its listing, by an earlier version, is read with an unknown listing time.
+
+        :param path: Local file holding the persisted index
+        :return: The loaded Manifest
+        """
+        with open(path, encoding="utf-8") as f:
+            saved = json.load(f)
+        if set(saved) != {"listed_at", "objects"}:
+            return cls(saved)
+        return cls(saved["objects"], saved["listed_at"])
+
+    def save(self, path):
+        """
+        Persists the index to a local file, with the time of its listing. The file is
+        replaced atomically so that a crashed run never leaves a truncated index behind.
+
+        :param path: Local file to write the index to
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"listed_at": self.listed_at, "objects": self.objects}, f)
+        os.replace(tmp_path, path)
+
+    def add(self, key, etag=None):
+        """
+        Records an object that has just been uploaded.
+
+        :param key: Key of the uploaded object
+        :param etag: ETag of the uploaded object (default is None)
+        """
+        self.objects[key] = etag
+
+    def unchanged(self, key, payload, part_size=PART_SIZE):
+        """
+        Tells whether the object stored under a key already holds a payload, by comparing
+        the ETag the object was listed with against the ETag of the payload. No request is
+        made, so a refreshed file whose content has not changed is never uploaded again.
+
+        :param key: Key of the object
+        :param payload: The bytes that would be uploaded
+        :param part_size: Part size objects with a multipart ETag were streamed with
+        (default is 8 MiB)
+        :return: True if the object exists and holds exactly the payload
+        """
+        etag = self.objects.get(key)
+        if not etag:
+            return False
+        multipart = "-" in etag
+        return etag == object_etag(payload, max(part_size, MIN_PART_SIZE) if multipart else None)
+
+    def __contains__(self, key):
+        return key in self.objects
+
+    def __len__(self):
+        return len(self.objects)
@@ -0,0 +1,113 @@
+"""Partitioned Parquet Landing Module."""
+
+import functools
+from io import BytesIO
+from typing import TYPE_CHECKING
+
+from src.etl.schema import COLUMNS
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+# pandas and pyarrow are imported by the functions using them, so planning a run and
+# building landing paths does not load them.
+COMPRESSIONS = ("zstd", "snappy")
+
+
+def parse_filename(filename: str) -> tuple[str, int, int]:
+    """
+    Reads the region, year and month from the name of an AEMO price and demand file,
+    e.g. PRICE_AND_DEMAND_202401_NSW1.csv.
+    Args:
+        filename (str): The name of the file.
+    Returns:
+        tuple: A tuple containing the region, the year and the month of the file.
+    """
+    stem = filename.rsplit(".", 1)[0]
+    period, region = stem.split("_")[-2:]
+    return region, int(period[:4]), int(period[4:6])
+
+
+def partition_path(filename: str) -> str:
+    """
+    Builds the Hive-style partitioned path a source file lands at in Parquet format,
+    e.g. region=NSW1/year=2024/month=01/PRICE_AND_DEMAND_202401_NSW1.parquet.
+    Args:
+        filename (str): The name of the source CSV file.
+    Returns:
+        str: The path of the Parquet file, relative to the landing folder.
+    """
+    region, year, month = parse_filename(filename)
+    stem = filename.rsplit(".", 1)[0]
+    return f"region={region}/year={year}/month={month:02}/{stem}.parquet"
+
+
+@functools.cache
+def parquet_schema() -> "pa.Schema":
+    """
+    Returns the schema of the landed Parquet files. SETTLEMENTDATE is kept in NEM market
+    time (AEST, UTC+10 all year round), as published.
+    Returns:
+        pa.Schema: The Arrow schema, with dictionary-encoded REGION and PERIODTYPE columns.
+    """
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("REGION", pa.dictionary(pa.int8(), pa.string())),
+            ("SETTLEMENTDATE", pa.timestamp("ms")),
+            ("TOTALDEMAND", pa.float32()),
+            ("RRP", pa.float32()),
+            ("PERIODTYPE", pa.dictionary(pa.int8(), pa.string())),
+        ]
+    )
+
+
+def read_typed_csv(body: bytes) -> "pd.DataFrame":
+    """
+    Parses an AEMO price and demand CSV file into typed columns.
+    Args:
+        body (bytes): The CSV file.
+    Returns:
+        pd.DataFrame: The data, with a parsed SETTLEMENTDATE, float32 measures and
+        categorical REGION and PERIODTYPE columns.
+    Raises:
+        ValueError: If the file cannot be parsed or holds values of the wrong type.
+    """
+    import pandas as pd
+
+    df = pd.read_csv(
+        BytesIO(body),
+        usecols=list(COLUMNS),
+        dtype={
+            "REGION": "category",
+            "TOTALDEMAND": "float32",
+            "RRP": "float32",
+            "PERIODTYPE": "category",
+        },
+    )
+    df["SETTLEMENTDATE"] = pd.to_datetime(df["SETTLEMENTDATE"], format="%Y/%m/%d %H:%M:%S")
+    return df[list(COLUMNS)]
+
+
+def to_parquet(body: bytes, compression: str = "zstd") -> bytes:
+    """
+    Converts an AEMO price and demand CSV file into a Parquet file with an explicit schema.
+    Args:
+        body (bytes): The CSV file.
+        compression (str): The Parquet compression codec, "zstd" or "snappy".
+    Returns:
+        bytes: The Parquet file.
+    Raises:
+        ValueError: If the file cannot be parsed or holds values of the wrong type.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(
+        read_typed_csv(body), schema=parquet_schema(), preserve_index=False
+    )
+    sink = BytesIO()
+    pq.write_table(table, sink, compression=compression)
+    return sink.getvalue()
@@ -0,0 +1,143 @@
+"""Extraction Planning Module."""
+
+import datetime
+from collections.abc import Callable, Generator
+
+from src.etl.http_cache import NegativeCache
+from src.etl.manifest import Manifest
+
+# The first month AEMO publishes price and demand files for, when the NEM started.
+FIRST_PUBLISHED = (1998, 12)
+# Regions that joined the NEM later, and the first month published for each.
+REGION_FIRST_PUBLISHED = {"TAS1": (2005, 5)}
+# NEM market time is AEST, UTC+10 all year round.
+MARKET_TIMEZONE = datetime.timezone(datetime.timedelta(hours=10))
+
+
+def last_published_month(now: datetime.datetime | None = None) -> tuple[int, int]:
+    """
+    Returns the latest month with a published file. The file of the current month is
+    published as it progresses, so that is the current month in market time.
+    Args:
+        now (datetime.datetime | None): The time to plan at (default: now).
+    Returns:
+        tuple: A tuple containing the year and the month.
+    """
+    now = (now or datetime.datetime.now(MARKET_TIMEZONE)).astimezone(MARKET_TIMEZONE)
+    return now.year, now.month
+
+
+def first_published_month(region: str) -> tuple[int, int]:
+    """
+    Returns the first month with a published file for a region.
+    Args:
+        region (str): The region, e.g. TAS1.
+    Returns:
+        tuple: A tuple containing the year and the month.
+    """
+    return REGION_FIRST_PUBLISHED.get(region, FIRST_PUBLISHED)
+
+
+def get_url(
+    base_url: str,
+    current_year: int,
+    months: range,
+    provinces: list[str],
+    last_published: tuple[int, int] | None = None,
+) -> Generator[str]:
+    """
+    Generates URLs for the specified base URL, year, months, and provinces.
+    Months before the first published file of each province or after the last published
+    month are skipped, since their files cannot exist.
+    Args:
+        base_url (str): The base URL for the data.
+        current_year (int): The current year.
+        months (range): The range of months to generate URLs for.
+        provinces (list): The list of provinces to generate URLs for.
+        last_published (tuple | None): The latest (year, month) published (default: now).
+    Yields:
+        str: The generated URL.
+    """
+    last_published = last_published or last_published_month()
+    for province in provinces:
+        first_published = first_published_month(f"{province}1")
+        for year in range(first_published[0], current_year + 1):
+            for month in months:
+                if first_published <= (year, month) <= last_published:
+                    yield f"{base_url}_{year}{month:02}_{province}1.csv"
+
+
+class Plan:
+    def __init__(self, urls=None, skipped=None):
+        """
+        Initializes the work of one extraction run.
+
+        :param urls: URLs that need fetching, in order (default is None, no work)
+        :param skipped: Number of URLs left out for each reason (default is None)
+        """
+        self.urls = list(urls or [])
+        self.skipped = dict(skipped or {})
+
+    def describe(self):
+        """
+        Summarises the plan in one line.
+
+        :return: The number of URLs to fetch and the number skipped for each reason
+        """
+        skipped = ", ".join(f"{count} {reason}" for reason, count in self.skipped.items())
+        return f"{len(self.urls)} URLs to fetch; skipped {skipped or 'none'}."
+
+    def __iter__(self):
+        return iter(self.urls)
+
+    def __len__(self):
+        return len(self.urls)
+
+
+def plan_urls(
+    base_url: str,
+    current_year: int,
+    months: range,
+    provinces: list[str],
+    key: Callable[[str], str],
+    manifest: Manifest,
+    negative_cache: NegativeCache | None = None,
+    done: set[str] | None = None,
+    include_stored: bool = False,
+    last_published: tuple[int, int] | None = None,
+) -> Plan:
+    """
+    Plans the URLs an extraction run needs to fetch.
+    Candidates are clipped to the months that have been published, then diffed against
+    the objects already in storage, the URLs recently found missing and the URLs the job
+    ledger records as landed, so a steady-state run only requests the files it does not
+    have yet, and a run restarted after a crash resumes with the unfinished work.
+    Args:
+        base_url (str): The base URL for the data.
+        current_year (int): The current year.
+        months (range): The range of months to generate URLs for.
+        provinces (list): The list of provinces to generate URLs for.
+        key (Callable): Maps a URL to the key its file is stored under.
+        manifest (Manifest): The index of objects already stored.
+        negative_cache (NegativeCache | None): The URLs recently answered with a 404.
+        done (set[str] | None): The URLs whose file the job ledger records as landed.
+        include_stored (bool): Whether to plan URLs whose file is already stored, as
+        incremental runs refresh them with conditional requests.
+        last_published (tuple | None): The latest (year, month) published (default: now).
+    Returns:
+        Plan: The URLs to fetch and the number skipped for each reason.
+    """
+    candidates = len(provinces) * len(months) * max(0, current_year - FIRST_PUBLISHED[0] + 1)
+    done = done or set()
+    plan = Plan(skipped={"unpublished": 0, "stored": 0, "landed": 0, "known missing": 0})
+    for url in get_url(base_url, current_year, months, provinces, last_published):
+        if not include_stored and key(url) in manifest:
+            plan.skipped["stored"] += 1
+        elif not include_stored and url in done:
+            plan.skipped["landed"] += 1
+        elif negative_cache is not None and url in negative_cache:
+            plan.skipped["known missing"] += 1
+        else:
+            plan.urls.append(url)
+    plan.skipped["unpublished"] = candidates - len(plan) - sum(plan.skipped.values())
+    return plan
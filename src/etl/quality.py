@@ -0,0 +1,207 @@
+"""Data Quality Validation Module."""
+
+import datetime
+import json
+import os
+import time
+from io import BytesIO
+from typing import TYPE_CHECKING
+
+from src.etl.parquet import parse_filename
+from src.etl.planner import MARKET_TIMEZONE, first_published_month
+from src.etl.schema import COLUMNS
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# The first month the NEM settled in 5-minute rather than 30-minute intervals.
+FIVE_MINUTE_SETTLEMENT = (2021, 10)
+# The market price floor, and a ceiling above every market price cap set so far, in $/MWh.
+PRICE_RANGE = (-1000.0, 25000.0)
+# Bounds of a region's total demand, in MW.
+DEMAND_RANGE = (0.0, 20000.0)
+
+
+class QualityReport:
+    def __init__(self, filename, rows=0, issues=None, seconds=0.0):
+        """
+        Holds the outcome of the quality checks of one file.
+
+        :param filename: Name of the checked file
+        :param rows: Number of rows in the file (default is 0)
+        :param issues: Number of offending rows or intervals for each failed check
+        (default is None, no issues)
+        :param seconds: Time the checks took, in seconds (default is 0.0)
+        """
+        self.filename = filename
+        self.rows = rows
+        self.issues = {check: count for check, count in (issues or {}).items() if count}
+        self.seconds = seconds
+
+    @property
+    def passed(self):
+        return not self.issues
+
+    def describe(self):
+        """
+        Summarises the failed checks in one line.
+
+        :return: The number of offending rows or intervals for each failed check
+        """
+        return ", ".join(f"{count} {check}" for check, count in self.issues.items()) or "passed"
+
+    def to_dict(self):
+        """
+        Converts the report to plain values, to send it between processes or write it out.
+
+        :return: A JSON-serialisable dict of the report
+        """
+        return {
+            "filename": self.filename,
+            "rows": self.rows,
+            "passed": self.passed,
+            "issues": dict(self.issues),
+            "seconds": self.seconds,
+        }
+
+
+def interval_seconds(year: int, month: int) -> int:
+    """
+    Returns the length of the settlement intervals of a month.
+    Args:
+        year (int): The year.
+        month (int): The month.
+    Returns:
+        int: 300 from the start of 5-minute settlement, 1800 before it.
+    """
+    return 300 if (year, month) >= FIVE_MINUTE_SETTLEMENT else 1800
+
+
+def check_values(df: "pd.DataFrame", region: str) -> dict[str, int]:
+    """
+    Checks the types, ranges and region of every row with whole-column operations.
+    Args:
+        df (pd.DataFrame): The file, read with every column as text.
+        region (str): The region the file is named after, e.g. NSW1.
+    Returns:
+        dict: The number of offending rows for each check.
+    """
+    import numpy as np
+    import pandas as pd
+
+    demand = pd.to_numeric(df["TOTALDEMAND"], errors="coerce").to_numpy(np.float64)
+    price = pd.to_numeric(df["RRP"], errors="coerce").to_numpy(np.float64)
+    return {
+        "non_numeric_demand": int(np.isnan(demand).sum()),
+        "non_numeric_price": int(np.isnan(price).sum()),
+        "wrong_region": int((df["REGION"].to_numpy() != region).sum()),
+        "demand_out_of_range": int(((demand < DEMAND_RANGE[0]) | (demand > DEMAND_RANGE[1])).sum()),
+        "price_out_of_range": int(((price < PRICE_RANGE[0]) | (price > PRICE_RANGE[1])).sum()),
+    }
+
+
+def check_intervals(
+    settled: "pd.Series",
+    year: int,
+    month: int,
+    now: datetime.datetime | None = None,
+    partial_start: bool = False,
+) -> dict[str, int]:
+    """
+    Checks that the settlement times of a file cover its month once each, on the interval
+    grid of the month. Intervals after the latest one are only counted as missing once
+    the month is over, since the file of the current month grows as it progresses.
+    Likewise, the first month a region published starts part way through, when it joined
+    the market, so intervals before its earliest one are not counted as missing.
+    Args:
+        settled (pd.Series): The SETTLEMENTDATE column, as text.
+        year (int): The year of the file.
+        month (int): The month of the file.
+        now (datetime.datetime | None): The time to check at (default: now).
+        partial_start (bool): Whether the month is the first the region published.
+    Returns:
+        dict: The number of offending rows or missing intervals for each check.
+    """
+    import numpy as np
+    import pandas as pd
+
+    stamps = pd.to_datetime(settled, format="%Y/%m/%d %H:%M:%S", errors="coerce")
+    seconds = stamps.dropna().to_numpy("datetime64[s]").astype(np.int64)
+    step = interval_seconds(year, month)
+    start = np.datetime64(f"{year}-{month:02}", "M")
+    start, end = (np.array([start, start + 1]).astype("datetime64[s]").astype(np.int64)).tolist()
+    offsets = seconds - start
+    aligned = (offsets > 0) & (offsets <= end - start) & (offsets % step == 0)
+    unique = np.unique(seconds[aligned])
+    first = unique[0] - step if partial_start and len(unique) else start
+    now = (now or datetime.datetime.now(MARKET_TIMEZONE)).astimezone(MARKET_TIMEZONE)
+    over = np.datetime64(now.replace(tzinfo=None), "s").astype(np.int64) >= end
+    latest = end if over else unique.max(initial=start)
+    return {
+        "unparseable_dates": int(stamps.isna().sum()),
+        "duplicate_intervals": int(aligned.sum() - len(unique)),
+        "misaligned_intervals": int((~aligned).sum()),
+        "missing_intervals": int((latest - first) // step - len(unique)),
+    }
+
+
+def check_file(filename: str, body: bytes, now: datetime.datetime | None = None) -> QualityReport:
+    """
+    Checks a fetched price and demand file before it is landed. The file is read once
+    with every column as text, then checked with vectorised column operations for its
+    schema, unparseable or non-numeric values, rows of another region, duplicate,
+    misaligned and missing settlement intervals, and demand and prices out of range.
+    Every report, including that of an unreadable file, records the time its checks took.
+    Args:
+        filename (str): The name of the file, e.g. PRICE_AND_DEMAND_202401_NSW1.csv.
+        body (bytes): The CSV file.
+        now (datetime.datetime | None): The time to check at (default: now).
+    Returns:
+        QualityReport: The number of offending rows or intervals for each failed check.
+    """
+    import pandas as pd
+
+    started = time.perf_counter()
+    region, year, month = parse_filename(filename)
+    try:
+        df = pd.read_csv(BytesIO(body), dtype=str, keep_default_na=False)
+    except ValueError:
+        return QualityReport(
+            filename, issues={"unreadable": 1}, seconds=time.perf_counter() - started
+        )
+    if set(df.columns) != set(COLUMNS):
+        return QualityReport(filename, len(df), {"wrong_columns": 1}, time.perf_counter() - started)
+    partial_start = (year, month) == first_published_month(region)
+    issues = {
+        **check_values(df, region),
+        **check_intervals(df["SETTLEMENTDATE"], year, month, now, partial_start),
+    }
+    return QualityReport(filename, len(df), issues, time.perf_counter() - started)
+
+
+def quarantine_folder(folder: str) -> str:
+    """
+    Returns the folder files failing their quality checks are landed in by default. It
+    sits next to the landing folder, so nothing reading the landed files ever sees them.
+    Args:
+        folder (str): The folder in the S3 bucket where files are landed.
+    Returns:
+        str: The quarantine folder, e.g. Energy_Price_Demand_quarantine/.
+    """
+    return f"{folder.rstrip('/')}_quarantine/"
+
+
+def save_reports(path: str | None, reports: list[dict]) -> None:
+    """
+    Writes the quality reports of a run to a local file as JSON lines, replacing it
+    atomically.
+    Args:
+        path (str | None): The local file to write the reports to, or None to skip writing.
+        reports (list[dict]): The reports, as returned by QualityReport.to_dict.
+    """
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(report) + "\n" for report in reports)
+    os.replace(tmp_path, path)
@@ -0,0 +1,120 @@
+"""Retry and Adaptive Rate Limiting Module."""
+
+import asyncio
+import random
+import time
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Parses a Retry-After header into a number of seconds to wait.
+    The header may hold either a number of seconds or an HTTP date.
+    Args:
+        value (str | None): The raw header value.
+    Returns:
+        float | None: The number of seconds to wait, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=UTC)
+    return max(0.0, (retry_at - datetime.now(UTC)).total_seconds())
+
+
+class RetryPolicy:
+    def __init__(self, max_retries=5, base_delay=0.5, max_delay=60.0):
+        """
+        Initializes a retry policy using jittered exponential backoff.
+
+        :param max_retries: Number of retries after the first attempt (default is 5)
+        :param base_delay: Backoff ceiling in seconds for the first retry (default is 0.5)
+        :param max_delay: Upper bound in seconds for any single wait (default is 60.0)
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, retry_after=None):
+        """
+        Returns the number of seconds to wait before the next attempt.
+
+        The wait is drawn uniformly between zero and an exponentially growing ceiling
+        ("full jitter"), so workers that failed together do not retry together.
+        A Retry-After value sent by the server is honoured as a lower bound.
+
+        :param attempt: Zero-based index of the attempt that just failed
+        :param retry_after: Seconds requested by the server's Retry-After header (default is None)
+        :return: The number of seconds to wait
+        """
+        ceiling = min(self.max_delay, self.base_delay * 2**attempt)
+        delay = random.uniform(0, ceiling)  # noqa: S311
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+class AdaptiveLimiter:
+    def __init__(self, max_limit, min_limit=1, increase=1.0, decrease=0.5, cooldown=1.0):
+        """
+        Initializes an AIMD (additive increase, multiplicative decrease) concurrency limiter.
+
+        The limiter starts half way between the bounds. Every successful request grows the
+        limit by roughly `increase` per window of requests, and every throttled request
+        multiplies it by `decrease`. Decreases are spaced by `cooldown` seconds so that a
+        burst of failures from requests that were already in flight only counts once.
+
+        :param max_limit: Largest number of requests allowed in flight
+        :param min_limit: Smallest number of requests allowed in flight (default is 1)
+        :param increase: Additive step applied per window of successes (default is 1.0)
+        :param decrease: Multiplicative factor applied on throttling (default is 0.5)
+        :param cooldown: Minimum number of seconds between two decreases (default is 1.0)
+        """
+        self.max_limit = max_limit
+        self.min_limit = min(min_limit, max_limit)
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.limit = float(max(self.min_limit, max_limit // 2))
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        """
+        Grows the limit after a request the source served normally.
+        """
+        self.limit = min(float(self.max_limit), self.limit + self.increase / self.limit)
+
+    def on_throttle(self):
+        """
+        Shrinks the limit after the source pushed back with a throttling status or a
+        transient failure.
+        """
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.min_limit), self.limit * self.decrease)
@@ -0,0 +1,141 @@
+"""Ingest Rollups Module."""
+
+from io import BytesIO
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Price quantiles kept for every day and month.
+QUANTILES = (0.05, 0.5, 0.95)
+PERIODS = {"daily": "D", "monthly": "M"}
+
+
+class RegionSeries:
+    def __init__(self, region, epochs, price, demand):
+        """
+        Holds the intervals of one region as compact columns.
+
+        SETTLEMENTDATE marks the end of each interval in NEM market time (AEST, UTC+10 all
+        year round), and is kept as seconds since 1970-01-01 00:00 market time.
+
+        :param region: The region, e.g. NSW1
+        :param epochs: int64 array of interval end times, in seconds
+        :param price: float32 array of regional reference prices, in $/MWh
+        :param demand: float32 array of total demand, in MW
+        """
+        self.region = region
+        self.epochs = epochs
+        self.price = price
+        self.demand = demand
+
+    @classmethod
+    def from_csv(cls, body):
+        """
+        Parses an AEMO price and demand CSV file of a single region.
+
+        :param body: The CSV file
+        :return: The RegionSeries of the file
+        :raises ValueError: If the file cannot be parsed, is empty or holds several regions
+        """
+        import numpy as np
+        import pandas as pd
+
+        df = pd.read_csv(
+            BytesIO(body),
+            usecols=["REGION", "SETTLEMENTDATE", "TOTALDEMAND", "RRP"],
+            dtype={"REGION": "category", "TOTALDEMAND": "float32", "RRP": "float32"},
+        )
+        regions = df["REGION"].unique()
+        if len(regions) != 1:
+            raise ValueError(f"Expected the intervals of one region, found {len(regions)}.")
+        settled = pd.to_datetime(df["SETTLEMENTDATE"], format="%Y/%m/%d %H:%M:%S")
+        return cls(
+            str(regions[0]),
+            settled.to_numpy("datetime64[s]").astype(np.int64),
+            df["RRP"].to_numpy(np.float32),
+            df["TOTALDEMAND"].to_numpy(np.float32),
+        )
+
+    def __len__(self):
+        return len(self.epochs)
+
+
+def rollup(series: RegionSeries, unit: str) -> "pd.DataFrame":
+    """
+    Aggregates the intervals of a region by day or month in a few vectorised passes.
+    An interval belongs to the period it starts in, so the interval settled at midnight
+    counts towards the day before. Intervals are sorted by period and price once; every
+    statistic is then read off the group boundaries with ufunc reductions, and price
+    quantiles by linear interpolation between neighbouring ranks, as in np.quantile.
+    Args:
+        series (RegionSeries): The intervals of the region.
+        unit (str): The NumPy datetime unit of the periods, "D" or "M".
+    Returns:
+        pd.DataFrame: One row per period with the interval count, the minimum, maximum and
+        mean price, the price quantiles, the minimum, mean and peak demand, and the number
+        of intervals with a negative price.
+    """
+    import numpy as np
+    import pandas as pd
+
+    periods = (series.epochs - 1).astype("datetime64[s]").astype(f"datetime64[{unit}]")
+    order = np.lexsort((series.price, periods))
+    periods, price, demand = periods[order], series.price[order], series.demand[order]
+    starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+    counts = np.diff(np.r_[starts, len(periods)])
+    ends = starts + counts - 1
+    rows = {
+        "region": series.region,
+        "period": periods[starts].astype(str),
+        "intervals": counts,
+        "price_min": price[starts],
+        "price_max": price[ends],
+        "price_mean": np.add.reduceat(price, starts, dtype=np.float64) / counts,
+    }
+    for q in QUANTILES:
+        position = starts + q * (counts - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, ends)
+        rows[f"price_p{round(q * 100):02}"] = price[lower] + (price[upper] - price[lower]) * (
+            position - lower
+        )
+    rows["demand_min"] = np.minimum.reduceat(demand, starts)
+    rows["demand_mean"] = np.add.reduceat(demand, starts, dtype=np.float64) / counts
+    rows["demand_peak"] = np.maximum.reduceat(demand, starts)
+    rows["negative_price_intervals"] = np.add.reduceat(price < 0, starts, dtype=np.int64)
+    return pd.DataFrame(rows)
+
+
+def rollup_files(filename: str, body: bytes) -> dict[str, bytes]:
+    """
+    Computes the daily and monthly rollups of a fetched file as small CSV files.
+    Args:
+        filename (str): The name of the source file, e.g. PRICE_AND_DEMAND_202401_NSW1.csv.
+        body (bytes): The CSV file.
+    Returns:
+        dict: The CSV bytes of every rollup, keyed by its path relative to the rollup
+        folder, e.g. daily/PRICE_AND_DEMAND_202401_NSW1.csv.
+    Raises:
+        ValueError: If the file cannot be parsed, is empty or holds several regions.
+    """
+    series = RegionSeries.from_csv(body)
+    if not len(series):
+        raise ValueError("The file holds no intervals.")
+    stem = filename.rsplit(".", 1)[0]
+    return {
+        f"{name}/{stem}.csv": rollup(series, unit).to_csv(index=False, float_format="%.2f").encode()
+        for name, unit in PERIODS.items()
+    }
+
+
+def rollup_folder(folder: str) -> str:
+    """
+    Returns the folder rollups of a landing folder are written to. It sits next to the
+    landing folder rather than inside it, so listings of the landed files never see it.
+    Args:
+        folder (str): The folder in the S3 bucket where files are landed.
+    Returns:
+        str: The rollup folder, e.g. Energy_Price_Demand_rollups/.
+    """
+    return f"{folder.rstrip('/')}_rollups/"
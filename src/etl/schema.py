@@ -0,0 +1,32 @@
+"""AEMO Price and Demand File Schema Module."""
+
+COLUMNS = ("REGION", "SETTLEMENTDATE", "TOTALDEMAND", "RRP", "PERIODTYPE")
+
+
+class UnexpectedColumnsError(ValueError):
+    """Raised when a file does not carry the expected AEMO price and demand columns."""
+
+
+def read_header(payload: bytes) -> list[str]:
+    """
+    Reads the column names from the header row of a CSV payload without parsing the rest.
+    Args:
+        payload (bytes): The raw CSV file.
+    Returns:
+        list: The column names, with surrounding quotes and whitespace removed.
+    """
+    end = payload.find(b"\n")
+    header = payload[: end if end != -1 else len(payload)]
+    header = header.decode("utf-8-sig", errors="replace")
+    return [column.strip().strip('"') for column in header.split(",")]
+
+
+def has_expected_columns(payload: bytes) -> bool:
+    """
+    Checks that a CSV payload carries exactly the expected AEMO price and demand columns.
+    Args:
+        payload (bytes): The raw CSV file.
+    Returns:
+        bool: True if the header row holds the expected set of columns.
+    """
+    return set(read_header(payload)) == set(COLUMNS)
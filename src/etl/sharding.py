@@ -0,0 +1,79 @@
+"""Extraction Sharding Module."""
+
+import hashlib
+import re
+
+from src.etl.planner import Plan
+
+# Files are named PRICE_AND_DEMAND_<year><month>_<region>1.csv.
+FILE_PATTERN = re.compile(r"_(\d{4})(\d{2})_([A-Z]+)1\.csv$")
+
+
+def partition(url: str) -> tuple[str, str, str]:
+    """
+    Returns the province, year and month a URL holds the data of.
+    Args:
+        url (str): The URL of a price and demand file.
+    Returns:
+        tuple: A tuple containing the province, the year and the month.
+    Raises:
+        ValueError: If the URL does not name a price and demand file.
+    """
+    match = FILE_PATTERN.search(url)
+    if match is None:
+        raise ValueError(f"Cannot shard '{url}': not a price and demand file.")
+    year, month, province = match.groups()
+    return province, year, month
+
+
+def shard_of(url: str, shard_count: int) -> int:
+    """
+    Returns the shard a URL belongs to.
+    The shard is a hash of the province, year and month of the file, not of the URL, so
+    it stays the same across hosts, Python versions and changes to the base URL.
+    Args:
+        url (str): The URL of a price and demand file.
+        shard_count (int): The number of shards.
+    Returns:
+        int: The shard, between 0 and `shard_count` - 1.
+    """
+    digest = hashlib.blake2b("/".join(partition(url)).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shard_count
+
+
+def shard_plan(plan: Plan, shard_index: int, shard_count: int) -> Plan:
+    """
+    Keeps only the URLs of a plan that belong to one shard.
+    Every worker of a sharded run plans the same URLs and keeps its own shard, so the
+    shards together cover the plan and no URL is fetched by two workers.
+    Args:
+        plan (Plan): The URLs the run needs to fetch.
+        shard_index (int): The shard of this worker, between 0 and `shard_count` - 1.
+        shard_count (int): The number of workers sharing the run.
+    Returns:
+        Plan: The URLs of the shard, with the others counted as skipped.
+    Raises:
+        ValueError: If the shard index is outside the shard count.
+    """
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"Shard index {shard_index} is outside a shard count of {shard_count}.")
+    if shard_count == 1:
+        return plan
+    urls = [url for url in plan if shard_of(url, shard_count) == shard_index]
+    return Plan(urls, {**plan.skipped, "other shards": len(plan) - len(urls)})
+
+
+def batches(plan: Plan) -> dict[str, list[str]]:
+    """
+    Groups the URLs of a plan into batches of one province and year, the unit workers
+    claim through a lease table.
+    Args:
+        plan (Plan): The URLs the run needs to fetch.
+    Returns:
+        dict: The URLs of every batch, keyed by "<province>/<year>" in plan order.
+    """
+    grouped = {}
+    for url in plan:
+        province, year, _ = partition(url)
+        grouped.setdefault(f"{province}/{year}", []).append(url)
+    return grouped
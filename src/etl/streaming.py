@@ -0,0 +1,120 @@
+"""Streaming S3 Upload Module."""
+
+import asyncio
+from collections.abc import AsyncIterable
+
+MIN_PART_SIZE = 5 * 1024 * 1024
+PART_SIZE = 8 * 1024 * 1024
+
+
+class StreamingUpload:
+    def __init__(self, s3, bucket_name, key, part_size=PART_SIZE):
+        """
+        Initializes an upload that writes an S3 object from a stream of chunks.
+
+        Chunks are gathered into a buffer of `part_size` bytes. Each full buffer is sent as
+        one part of a multipart upload while the next buffer fills, so at most two parts
+        are held in memory at once. Every part but the last holds exactly `part_size`
+        bytes, so the ETag of the object can be recomputed from its contents. An object
+        that never fills a part is sent with a single put when the upload is closed.
+
+        :param s3: The AsyncS3Buckets connection to upload with
+        :param bucket_name: Name of the S3 bucket
+        :param key: Key of the object to write
+        :param part_size: Size of each part in bytes, at least 5 MiB (default is 8 MiB)
+        """
+        self.s3 = s3
+        self.bucket_name = bucket_name
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.size = 0
+        self.upload_id = None
+        self.parts = []
+        self._buffer = bytearray()
+        self._in_flight = None
+
+    async def write(self, chunk):
+        """
+        Appends a chunk to the object, sending a part once the buffer is full.
+
+        :param chunk: The next bytes of the object
+        """
+        self._buffer += chunk
+        self.size += len(chunk)
+        while len(self._buffer) >= self.part_size:
+            await self._send_part()
+
+    async def close(self):
+        """
+        Sends whatever is left in the buffer and makes the object visible.
+
+        :return: The number of bytes written
+        """
+        if self.upload_id is None:
+            uploaded = await self.s3.upload_file(
+                bucket_name=self.bucket_name, filename=self.key, file=bytes(self._buffer)
+            )
+            if not uploaded:
+                raise self.s3.S3UploadError(f"Failed to upload {self.key}")
+            return self.size
+        if self._buffer:
+            await self._send_part()
+        self.parts.append(await self._in_flight)
+        self._in_flight = None
+        await self.s3.complete_multipart_upload(
+            self.bucket_name, self.key, self.upload_id, self.parts
+        )
+        return self.size
+
+    async def abort(self):
+        """
+        Abandons the upload so that no partial object or orphaned parts are left behind.
+        """
+        if self._in_flight is not None:
+            self._in_flight.cancel()
+        if self.upload_id is not None:
+            await self.s3.abort_multipart_upload(self.bucket_name, self.key, self.upload_id)
+
+    async def _send_part(self):
+        if self.upload_id is None:
+            self.upload_id = await self.s3.create_multipart_upload(self.bucket_name, self.key)
+        if self._in_flight is not None:
+            self.parts.append(await self._in_flight)
+        part, self._buffer = self._buffer[: self.part_size], self._buffer[self.part_size :]
+        self._in_flight = asyncio.ensure_future(
+            self.s3.upload_part(
+                self.bucket_name, self.key, self.upload_id, len(self.parts) + 1, part
+            )
+        )
+
+
+async def stream_to_s3(
+    s3,
+    chunks: AsyncIterable[bytes],
+    bucket_name: str,
+    key: str,
+    part_size: int = PART_SIZE,
+) -> int:
+    """
+    Asynchronously uploads a stream of chunks to S3 while the stream is still being read,
+    so download and upload overlap. If anything fails, the upload is aborted and the
+    error is re-raised.
+    Args:
+        s3 (AsyncS3Buckets): The S3 connection to upload with.
+        chunks (AsyncIterable[bytes]): The chunks of the object, in order.
+        bucket_name (str): The name of the S3 bucket.
+        key (str): The key of the object to upload.
+        part_size (int): The size of each part, at least 5 MiB.
+    Returns:
+        int: The number of bytes uploaded.
+    Raises:
+        S3UploadError: If S3 rejects the upload.
+    """
+    upload = StreamingUpload(s3, bucket_name, key, part_size)
+    try:
+        async for chunk in chunks:
+            await upload.write(chunk)
+        return await upload.close()
+    except BaseException:
+        await upload.abort()
+        raise
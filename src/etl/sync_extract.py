@@ -2,92 +2,297 @@
 
 import argparse
 import datetime
-from collections.abc import Generator
-from io import StringIO
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
 
-import pandas as pd
 import requests
-from logs import get_logger
-from s3 import S3Buckets
+from requests.adapters import HTTPAdapter
+
+from src.etl.http_cache import NEGATIVE_CACHE_TTL, NegativeCache
+from src.etl.manifest import Manifest
+from src.etl.planner import plan_urls
+from src.etl.quality import check_file, quarantine_folder, save_reports
+from src.etl.retry import RETRYABLE_STATUSES, RetryPolicy, parse_retry_after
+from src.etl.rollups import rollup_files, rollup_folder
+from src.utils.dynamo import FAILED, FETCHED, JobLedger, checksum, open_ledger
+from src.utils.logs import get_logger
+from src.utils.metrics import metrics
+from src.utils.s3 import S3Buckets, object_etag
 
 logger = get_logger(__name__)
-s3_conn = S3Buckets.credentials("us-east-2")
+DEFAULT_WORKERS = 16
+s3_conn = S3Buckets.credentials("us-east-2", max_pool_connections=DEFAULT_WORKERS)
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+    )
+}
+REQUEST_TIMEOUT = 10
 
 
-def get_url(
-    base_url: str,
-    current_year: int,
-    months: range,
-    provinces: list[str],
-) -> Generator[str]:
+def create_session(workers: int) -> requests.Session:
     """
-    Generates URLs for the specified base URL, year, months, and provinces.
+    Creates a requests session whose connection pool is shared by every worker thread.
+    The pool holds one connection per worker for each host and blocks a worker rather
+    than opening a throwaway connection when all of them are in use, so connections are
+    kept alive and reused across files.
     Args:
-        base_url (str): The base URL for the data.
-        current_year (int): The current year.
-        months (range): The range of months to generate URLs for.
-        provinces (list): The list of provinces to generate URLs for.
-    Yields:
-        str: The generated URL.
+        workers (int): The number of threads sharing the session.
+    Returns:
+        requests.Session: The session.
     """
-    for province in provinces:
-        for year in range(1998, current_year + 1):
-            for month in months:
-                url = f"{base_url}_{year}{month:02}_{province}1.csv"
-                yield url
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers, pool_block=True)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
 
-def get_data(url: str) -> tuple[StringIO, str]:
+def get_data(
+    url: str,
+    session: requests.Session,
+    retry_policy: RetryPolicy,
+    negative_cache: NegativeCache | None = None,
+) -> tuple[bytes, str]:
     """
-    Fetches data from the given URL and returns it as a StringIO object.
-    The data is read as a CSV file and then converted to a StringIO object.
-    If the request fails, it returns an empty StringIO object and the name of the file.
-    If the request is successful, it returns the StringIO object with the data and the
-    name of the file. The name of the file is extracted from the URL.
+    Fetches data from the given URL and returns its body exactly as it was received.
+    Throttling responses, server errors, timeouts and connection resets are retried with
+    jittered exponential backoff.
+    If the request fails, it returns empty bytes and the name of the file.
+    The name of the file is extracted from the URL.
     Args:
         url (str): The URL to fetch data from.
+        session (requests.Session): The pooled session to request with.
+        retry_policy (RetryPolicy): The policy deciding how often and how long to retry.
+        negative_cache (NegativeCache | None): The cache to record a 404 in.
     Returns:
-        tuple: A tuple containing the StringIO object with the data and the name of the file.
+        tuple: A tuple containing the body of the response and the name of the file.
     """
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-            "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        )
-    }
-    response = requests.get(url, headers=headers, timeout=10)
     name = url.split("/")[-1]
+    for attempt in range(retry_policy.max_retries + 1):
+        retry_after = None
+        try:
+            with metrics.timer("fetch"):
+                response = session.get(url, timeout=REQUEST_TIMEOUT)
+            if response.status_code == 200:
+                break
+            if response.status_code == 404 and negative_cache is not None:
+                negative_cache.add(url)
+            if response.status_code not in RETRYABLE_STATUSES:
+                metrics.increment("not_found" if response.status_code == 404 else "failed_fetches")
+                return b"", name
+            reason = f"status code {response.status_code}"
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        except (requests.ConnectionError, requests.Timeout) as e:
+            reason = f"request error {e!r}"
+        if attempt == retry_policy.max_retries:
+            metrics.increment("failed_fetches")
+            logger.error("Giving up on %s after %d attempts: %s", url, attempt + 1, reason)
+            return b"", name
+        metrics.increment("retries")
+        delay = retry_policy.delay(attempt, retry_after)
+        logger.warning("Retrying %s in %.2fs after %s", url, delay, reason)
+        time.sleep(delay)
 
-    if response.status_code == 200:
-        data = StringIO(response.text)
-        data = pd.read_csv(data)
+    if negative_cache is not None:
+        negative_cache.discard(url)
+    metrics.increment("bytes_fetched", len(response.content))
+    return response.content, name
+
+
+def parse_data(body: bytes) -> StringIO:
+    """
+    Reads a fetched file as a CSV file and writes it back out as a StringIO object, in the
+    form it is landed in.
+    Args:
+        body (bytes): The fetched file.
+    Returns:
+        StringIO: The parsed file.
+    Raises:
+        ValueError: If the file cannot be parsed.
+    """
+    import pandas as pd
+
+    with metrics.timer("parse"):
+        data = pd.read_csv(BytesIO(body))
         csv_file = StringIO()
         data.to_csv(csv_file, index=False)
-        return csv_file, name
-    else:
-        return StringIO(""), name
+    return csv_file
 
 
-def write_to_s3(bucket_name, filename, file, folder="") -> None:
+def write_to_s3(bucket_name, filename, file, manifest, folder="", overwrite=False) -> bool:
     """
-    Uploads a file to an S3 bucket. Checks if the file already exists in the bucket before
-    uploading. If the file already exists, it skips the upload.
-    If the file does not exist, it uploads the file to the specified folder in the S3 bucket.
+    Uploads a file to an S3 bucket. Checks the run's manifest index to see if the file
+    already exists in the bucket before uploading. If the file already exists, it skips
+    the upload unless `overwrite` is set.
+    If the file does not exist, it uploads the file to the specified folder in the S3 bucket
+    and records it in the manifest.
     Args:
         bucket_name (str): The name of the S3 bucket.
         filename (str): The name of the file to be uploaded.
         file (StringIO): The file object to be uploaded.
+        manifest (Manifest): The index of objects already stored under the folder.
         folder (str): The folder in the S3 bucket where the file will be uploaded.
+        overwrite (bool): Whether to replace a file that already exists.
+    Returns:
+        bool: True if the file was uploaded, False otherwise.
     """
+    key = f"{folder}{filename}"
+    if key in manifest and not overwrite:
+        metrics.increment("skipped_existing")
+        logger.info("File '%s' already exists in '%s'. Skipping upload.", filename, bucket_name)
+        return False
     try:
-        previously_uploaded = s3_conn.list_files(bucket_name=bucket_name, folder=folder)
-        if f"{folder}{filename}" in previously_uploaded:
-            logger.info(f"File '{filename}' already exists in '{bucket_name}'. Skipping upload.")
-            return
-        logger.info(f"Uploading '{filename}' to S3 bucket '{bucket_name}'...")
-        s3_conn.upload_file(bucket_name=bucket_name, filename=filename, file=file, folder=folder)
+        logger.info("Uploading '%s' to S3 bucket '%s'...", filename, bucket_name)
+        with metrics.timer("upload"):
+            uploaded = s3_conn.upload_file(
+                bucket_name=bucket_name, filename=filename, file=file, folder=folder
+            )
+        if uploaded:
+            manifest.add(key, object_etag(file.getvalue().encode()))
+            metrics.increment("files_uploaded")
+            return True
     except (s3_conn.S3UploadError, s3_conn.S3ConnectionError) as e:
-        logger.error(f"Failed to upload '{filename}' to '{bucket_name}': {e}")
+        logger.error("Failed to upload '%s' to '%s': %s", filename, bucket_name, e)
+    metrics.increment("failed_uploads")
+    return False
+
+
+def write_rollups(bucket_name, filename, file, folder="") -> None:
+    """
+    Computes the daily and monthly rollups of a landed file and uploads them to the rollup
+    folder next to the landing folder, replacing the rollups of any earlier version.
+    Args:
+        bucket_name (str): The name of the S3 bucket.
+        filename (str): The name of the landed file.
+        file (StringIO): The landed file.
+        folder (str): The folder in the S3 bucket where the file was landed.
+    """
+    try:
+        with metrics.timer("rollup"):
+            rollups = rollup_files(filename, file.getvalue().encode())
+    except ValueError as e:
+        logger.error("An error occurred while computing rollups of %s: %s", filename, e)
+        return
+    for name, body in rollups.items():
+        if s3_conn.upload_file(bucket_name, name, body, rollup_folder(folder)):
+            metrics.increment("rollups_uploaded")
+        else:
+            metrics.increment("failed_uploads")
+
+
+def passes_checks(bucket_name, filename, body, quarantine, reports) -> bool:
+    """
+    Runs the quality checks on a fetched file. A file failing them is uploaded as it was
+    received, together with its quality report, to the quarantine folder instead of the
+    landing folder.
+    Args:
+        bucket_name (str): The name of the S3 bucket.
+        filename (str): The name of the file.
+        body (bytes): The fetched file.
+        quarantine (str): The folder in the S3 bucket failing files are uploaded to.
+        reports (list): The list to add the quality report of the file to.
+    Returns:
+        bool: True if the file passed every check, False otherwise.
+    """
+    report = check_file(filename, body)
+    reports.append(report.to_dict())
+    metrics.observe("validate", report.seconds)
+    if report.passed:
+        return True
+    metrics.increment("quarantined")
+    logger.warning(
+        "File '%s' failed its quality checks (%s). Quarantining.", filename, report.describe()
+    )
+    report_name = f"{filename.rsplit('.', 1)[0]}.quality.json"
+    for name, upload in (
+        (filename, body),
+        (report_name, json.dumps(report.to_dict()).encode()),
+    ):
+        if not s3_conn.upload_file(bucket_name, name, upload, quarantine):
+            metrics.increment("failed_uploads")
+    return False
+
+
+def process_url(
+    url: str,
+    session: requests.Session,
+    retry_policy: RetryPolicy,
+    manifest: Manifest,
+    bucket_name: str,
+    folder: str,
+    negative_cache: NegativeCache | None = None,
+    ledger: JobLedger | None = None,
+    rollups: bool = False,
+    quarantine: str | None = None,
+    reports: list | None = None,
+    refresh: bool = False,
+) -> None:
+    """
+    Fetches one URL and uploads its file to S3, recording its progress in the ledger.
+    Errors are logged rather than raised, so one bad file never stops the other workers.
+    When refreshing, a stored file is only uploaded again if its content changed.
+    Args:
+        url (str): The URL to fetch data from.
+        session (requests.Session): The pooled session to request with.
+        retry_policy (RetryPolicy): The policy deciding how often and how long to retry.
+        manifest (Manifest): The index of objects already stored under the folder.
+        bucket_name (str): The name of the S3 bucket.
+        folder (str): The folder in the S3 bucket where the file will be uploaded.
+        negative_cache (NegativeCache | None): The cache to record a 404 in.
+        ledger (JobLedger | None): The ledger tracking the state of every URL (default: an
+        in-memory ledger).
+        rollups (bool): Whether to land the daily and monthly rollups of the file next to it.
+        quarantine (str | None): The folder in the S3 bucket the file is uploaded to if it
+        fails its quality checks (default: the file is not checked).
+        reports (list | None): The list to add the quality report of the file to.
+        refresh (bool): Whether to replace the stored file if its content changed.
+    """
+    ledger = ledger or JobLedger()
+    reports = reports if reports is not None else []
+    try:
+        raw, filename = get_data(url, session, retry_policy, negative_cache)
+        if not raw:
+            ledger.record(url, FAILED, error="data not available")
+            logger.error("Data not available: %s. Skipping upload.", filename)
+            return
+        ledger.record(url, FETCHED)
+        if quarantine is not None and not passes_checks(
+            bucket_name, filename, raw, quarantine, reports
+        ):
+            ledger.record(url, FAILED, error="failed quality checks")
+            return
+        file = parse_data(raw)
+        body = file.getvalue().encode()
+        if refresh and manifest.unchanged(f"{folder}{filename}", body):
+            metrics.increment("skipped_same_content")
+            logger.info("File '%s' holds the same content in S3. Skipping upload.", filename)
+            ledger.land(url, checksum(body))
+            return
+        if not write_to_s3(
+            bucket_name=bucket_name,
+            filename=filename,
+            file=file,
+            manifest=manifest,
+            folder=folder,
+            overwrite=refresh,
+        ):
+            return
+        if not ledger.land(url, checksum(body)):
+            logger.info("File '%s' had already been landed by another run.", filename)
+        if rollups:
+            write_rollups(bucket_name, filename, file, folder)
+    except (
+        requests.RequestException,
+        ValueError,
+        s3_conn.S3UploadError,
+    ) as e:
+        ledger.record(url, FAILED, error=str(e))
+        logger.error("An error occurred while processing %s: %s", url, e)
 
 
 def run_data_extraction(
@@ -97,9 +302,29 @@ def run_data_extraction(
     months: range,
     provinces: list[str],
     folder: str,
+    max_retries: int = 5,
+    manifest_path: str | None = None,
+    manifest_max_age: float | None = None,
+    metrics_path: str | None = None,
+    prometheus_path: str | None = None,
+    workers: int = DEFAULT_WORKERS,
+    negative_cache_path: str = "negative_cache.json",
+    negative_cache_ttl: float = NEGATIVE_CACHE_TTL,
+    dry_run: bool = False,
+    ledger_path: str | None = None,
+    ledger_table: str | None = None,
+    dynamodb_endpoint: str | None = None,
+    rollups: bool = False,
+    validate: bool = False,
+    quarantine: str | None = None,
+    quality_report_path: str | None = None,
+    refresh: bool = False,
 ) -> None:
     """
     Main function to run the data extraction and upload process.
+    Every planned URL is processed exactly once, by a pool of `workers` threads sharing
+    one pooled requests session, so downloads, parsing and uploads of different files
+    overlap. This is the engine for environments that cannot run asyncio.
     Args:
         base_url (str): The base URL for the data.
         bucket_name (str): The name of the S3 bucket.
@@ -107,29 +332,84 @@ def run_data_extraction(
         months (range): The range of months to generate URLs for.
         provinces (list): The list of provinces to generate URLs for.
         folder (str): The folder in the S3 bucket where the file will be uploaded.
+        max_retries (int): The number of retries for throttled or failed requests.
+        manifest_path (str | None): A local file the manifest index is persisted to.
+        manifest_max_age (float | None): The number of seconds a persisted manifest is reused.
+        metrics_path (str | None): A local file the JSON run summary is written to.
+        prometheus_path (str | None): A local file the metrics are written to for Prometheus.
+        workers (int): The number of worker threads.
+        negative_cache_path (str): The local file the known-missing URLs are persisted to.
+        negative_cache_ttl (float): The number of seconds a missing URL is skipped for.
+        dry_run (bool): Whether to only log the plan, without fetching anything.
+        ledger_path (str | None): A local SQLite file to keep the job ledger in.
+        ledger_table (str | None): A DynamoDB table to keep the job ledger in.
+        dynamodb_endpoint (str | None): The endpoint of a DynamoDB-compatible service.
+        rollups (bool): Whether to land daily and monthly rollups next to every file.
+        validate (bool): Whether to check every file before landing it.
+        quarantine (str | None): The folder in the S3 bucket files failing their checks are
+        uploaded to (default: next to the landing folder).
+        quality_report_path (str | None): A local file the quality reports are written to.
+        refresh (bool): Whether to fetch stored files again and land those that changed.
     """
-    gen = get_url(base_url, current_year, months, provinces)
-    for _ in gen:
-        try:
-            file, filename = get_data(next(gen))
-            if file.getvalue() == "":
-                logger.error(f"Data not available: {filename}. Skipping upload.")
-                continue
-            write_to_s3(
-                bucket_name=bucket_name,
-                filename=filename,
-                file=file,
-                folder=folder,
+    metrics.reset()
+    manifest = Manifest.load(
+        s3_conn, bucket_name, folder, path=manifest_path, max_age=manifest_max_age
+    )
+    negative_cache = NegativeCache.load(negative_cache_path, ttl=negative_cache_ttl)
+    ledger = open_ledger(ledger_table, ledger_path, "us-east-2", dynamodb_endpoint) or JobLedger()
+    with metrics.timer("plan"):
+        plan = plan_urls(
+            base_url,
+            current_year,
+            months,
+            provinces,
+            key=lambda url: f"{folder}{url.split('/')[-1]}",
+            manifest=manifest,
+            negative_cache=negative_cache,
+            done=None if refresh else ledger.done(),
+            include_stored=refresh,
+        )
+    logger.info("Plan: %s", plan.describe())
+    if dry_run:
+        for url in plan:
+            logger.info("Planned: %s", url)
+        ledger.close()
+        return
+    retry_policy = RetryPolicy(max_retries=max_retries)
+    quarantine = (quarantine or quarantine_folder(folder)) if validate else None
+    reports = []
+    ledger.plan(plan)
+    with (
+        ledger,
+        create_session(workers) as session,
+        ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extract") as executor,
+    ):
+        futures = [
+            executor.submit(
+                process_url,
+                url,
+                session,
+                retry_policy,
+                manifest,
+                bucket_name,
+                folder,
+                negative_cache,
+                ledger,
+                rollups,
+                quarantine,
+                reports,
+                refresh,
             )
-        except StopIteration:
-            logger.info("All generated links have been yielded.")
-            break
-        except (
-            requests.RequestException,
-            pd.errors.ParserError,
-            s3_conn.S3UploadError,
-        ) as e:
-            logger.error(f"An error occurred: {e}")
+            for url in plan
+        ]
+        for future in futures:
+            future.result()
+    logger.info("All generated links have been processed.")
+    if manifest_path:
+        manifest.save(manifest_path)
+    negative_cache.save(negative_cache_path)
+    save_reports(quality_report_path, reports)
+    metrics.save(metrics_path, prometheus_path)
 
 
 if __name__ == "__main__":
@@ -172,6 +452,104 @@ if __name__ == "__main__":
         nargs="+",
         default=["QLD", "NSW", "VIC", "SA", "TAS"],
     )
+    parser.add_argument(
+        "--max_retries",
+        type=int,
+        default=5,
+        help="Number of retries for throttled or failed requests.",
+    )
+    parser.add_argument(
+        "--manifest_path",
+        type=str,
+        default=None,
+        help="Local file to persist the S3 manifest index to between runs.",
+    )
+    parser.add_argument(
+        "--manifest_max_age",
+        type=float,
+        default=86400,
+        help="Seconds a persisted manifest index is reused before S3 is listed again.",
+    )
+    parser.add_argument(
+        "--metrics_path",
+        type=str,
+        default=None,
+        help="Local file to write the JSON run summary of stage latencies and counters to.",
+    )
+    parser.add_argument(
+        "--prometheus_path",
+        type=str,
+        default=None,
+        help="Local file to write the run metrics to in Prometheus text format.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="Number of worker threads fetching and uploading files.",
+    )
+    parser.add_argument(
+        "--negative_cache_path",
+        type=str,
+        default="negative_cache.json",
+        help="Local file to persist the URLs recently found missing to between runs.",
+    )
+    parser.add_argument(
+        "--negative_cache_ttl",
+        type=float,
+        default=NEGATIVE_CACHE_TTL,
+        help="Seconds a URL found missing is skipped for before it is requested again.",
+    )
+    parser.add_argument(
+        "--dry_run",
+        action="store_true",
+        help="Log the planned URLs without fetching or uploading anything.",
+    )
+    parser.add_argument(
+        "--ledger_path",
+        type=str,
+        default=None,
+        help="Local SQLite file to keep the job ledger in, so a crashed run can resume.",
+    )
+    parser.add_argument(
+        "--ledger_table",
+        type=str,
+        default=None,
+        help="DynamoDB table to keep the job ledger in; takes precedence over --ledger_path.",
+    )
+    parser.add_argument(
+        "--dynamodb_endpoint",
+        type=str,
+        default=None,
+        help="Endpoint of a DynamoDB-compatible service, such as DynamoDB Local.",
+    )
+    parser.add_argument(
+        "--rollups",
+        action="store_true",
+        help="Land daily and monthly price and demand rollups next to the landed files.",
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Check every file's schema, values and intervals before landing it.",
+    )
+    parser.add_argument(
+        "--quarantine",
+        type=str,
+        default=None,
+        help="Folder in AWS S3 files failing their checks land in (default <folder>_quarantine/).",
+    )
+    parser.add_argument(
+        "--quality_report_path",
+        type=str,
+        default=None,
+        help="Local file to write the quality report of every checked file to, as JSON lines.",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Fetch stored files again and upload only those whose content changed.",
+    )
     args = parser.parse_args()
     logger.info(f"Arguments: {args}")
     logger.info("Starting data extraction and upload process...")
@@ -182,5 +560,22 @@ if __name__ == "__main__":
         months=args.months,
         provinces=args.provinces,
         folder=args.folder,
+        max_retries=args.max_retries,
+        manifest_path=args.manifest_path,
+        manifest_max_age=args.manifest_max_age,
+        metrics_path=args.metrics_path,
+        prometheus_path=args.prometheus_path,
+        workers=args.workers,
+        negative_cache_path=args.negative_cache_path,
+        negative_cache_ttl=args.negative_cache_ttl,
+        dry_run=args.dry_run,
+        ledger_path=args.ledger_path,
+        ledger_table=args.ledger_table,
+        dynamodb_endpoint=args.dynamodb_endpoint,
+        rollups=args.rollups,
+        validate=args.validate,
+        quarantine=args.quarantine,
+        quality_report_path=args.quality_report_path,
+        refresh=args.refresh,
     )
     logger.info("Data extraction and upload to AWS S3 completed.")
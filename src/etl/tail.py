@@ -0,0 +1,472 @@
+"""Current Month Tail Module."""
+
+import asyncio
+import datetime
+import json
+import os
+import re
+import time
+import zlib
+from collections.abc import Callable
+
+from src.etl.parquet import parse_filename
+from src.etl.planner import last_published_month
+from src.utils.logs import get_logger
+from src.utils.metrics import metrics
+from src.utils.s3 import object_etag
+
+logger = get_logger(__name__)
+POLL_SECONDS = 300
+COMPACT_SECONDS = 3600
+REVALIDATE_SECONDS = 3600
+# Delta objects are named after the byte range of the source file they hold, zero-padded
+# so that listing them in key order lists them in file order.
+DELTA_PATTERN = re.compile(r"(\d{12})-(\d{12})\.csv$")
+
+
+def last_line(lines: bytes) -> bytes:
+    """
+    Returns the last line of a block of whole lines, with its line break.
+    Args:
+        lines (bytes): Lines ending with a line break.
+    Returns:
+        bytes: The last line, or empty bytes if there is none.
+    """
+    return lines[lines.rfind(b"\n", 0, len(lines) - 1) + 1 :]
+
+
+def delta_folder(folder: str) -> str:
+    """
+    Returns the folder the delta objects of a landing folder are written to. It sits next
+    to the landing folder, so listings of the landed files never see it.
+    Args:
+        folder (str): The folder in the S3 bucket where files are landed.
+    Returns:
+        str: The delta folder, e.g. Energy_Price_Demand_deltas/.
+    """
+    return f"{folder.rstrip('/')}_deltas/"
+
+
+def fold(monthly: bytes, deltas: dict[str, bytes]) -> tuple[bytes, list[str]]:
+    """
+    Appends the rows of delta objects to the monthly file they continue, in file order.
+    A delta whose byte range the monthly file already holds is left out, so folding is
+    safe to repeat after a crash, and folding stops at the first gap.
+    Args:
+        monthly (bytes): The landed monthly file, the first bytes of the source file.
+        deltas (dict[str, bytes]): The delta objects of the file, keyed by their keys.
+    Returns:
+        tuple: The monthly file with the deltas folded in, and the keys of the deltas it
+        now holds, which can be deleted.
+    """
+    folded = []
+    for key in sorted(deltas):
+        start, end = (int(offset) for offset in DELTA_PATTERN.search(key).groups())
+        if end > len(monthly):
+            if start != len(monthly):
+                break
+            body = deltas[key]
+            monthly += body[body.find(b"\n") + 1 :]
+        folded.append(key)
+    return monthly, folded
+
+
+class TailCache:
+    def __init__(self, entries=None):
+        """
+        Initializes the position reached in every followed file.
+
+        Each entry holds the number of bytes of the source file landed so far, always whole
+        lines, the last of those lines, the header row and the ETag of the last response.
+        The next poll asks only for the bytes from the start of that last line on; the
+        repeated line confirms the file was only appended to since. Lines are kept as
+        Latin-1 text, which maps every byte to one character.
+
+        Corrections to earlier rows do not show in the repeated line, so each entry also
+        holds a CRC-32 of the landed bytes and the ETag of the last whole copy of the file
+        they were checked against. A revalidating poll fetches the whole file, unless it
+        still has that ETag, and compares its first bytes with the CRC.
+
+        :param entries: Mapping of URL to its position (default is None, an empty cache)
+        """
+        self.entries = dict(entries or {})
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a cache previously written with `save`. A missing file yields an empty cache.
+
+        :param path: Local file holding the persisted cache
+        :return: The loaded TailCache
+        """
+        if not os.path.exists(path):
+            return cls()
+        with open(path, encoding="utf-8") as f:
+            cache = cls(json.load(f))
+        logger.info("Loaded tail positions of %d files from '%s'.", len(cache), path)
+        return cache
+
+    def save(self, path):
+        """
+        Persists the positions to a local file, replacing it atomically.
+
+        :param path: Local file to write the cache to
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, path)
+
+    def request_headers(self, url, revalidate=False):
+        """
+        Builds the headers of the next poll of a URL: a range starting at the last landed
+        line, made conditional on the ETag of the last response. A revalidating poll asks
+        for the whole file instead, unless it is unchanged since it was last checked whole.
+
+        :param url: The URL about to be polled
+        :param revalidate: Whether to fetch the whole file (default is False)
+        :return: A dict holding Range and If-None-Match, empty if the URL is not followed yet
+        """
+        entry = self.entries.get(url)
+        if entry is None:
+            return {}
+        if revalidate:
+            return {"If-None-Match": entry["verified"]} if entry.get("verified") else {}
+        headers = {"Range": f"bytes={entry['offset'] - len(entry['last_line'])}-"}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        return headers
+
+    def appended(self, url, status, body):
+        """
+        Picks the whole lines appended to a followed file out of a response to its poll.
+
+        :param url: The polled URL
+        :param status: The status of the response, 206 for the requested range or 200 for
+        the whole file
+        :param body: The body of the response
+        :return: The appended lines, empty if none has been completed, or None if the
+        response does not continue the landed bytes, as when the file has been rewritten.
+        The whole file is checked against the CRC of every landed byte, a range only
+        against the last landed line.
+        """
+        entry = self.entries.get(url)
+        if entry is None:
+            return None
+        if status == 200 and zlib.crc32(body[: entry["offset"]]) != entry.get("crc"):
+            return None
+        line = entry["last_line"].encode("latin-1")
+        position = len(line) if status == 206 else entry["offset"]
+        if body[position - len(line) : position] != line:
+            return None
+        new = body[position:]
+        return new[: new.rfind(b"\n") + 1]
+
+    def header(self, url):
+        """
+        Returns the header row of a followed file.
+
+        :param url: The followed URL
+        :return: The header row, with its line break
+        """
+        return self.entries[url]["header"].encode("latin-1")
+
+    def advance(self, url, lines, etag=None):
+        """
+        Moves the position of a followed file past lines that have been landed.
+
+        :param url: The followed URL
+        :param lines: The landed lines
+        :param etag: ETag of the response the lines came from (default is None)
+        """
+        entry = self.entries[url]
+        if lines:
+            entry["offset"] += len(lines)
+            entry["last_line"] = last_line(lines).decode("latin-1")
+            entry["crc"] = zlib.crc32(lines, entry.get("crc", 0))
+        entry["etag"] = etag
+
+    def verify(self, url, etag):
+        """
+        Records that the whole file, as of a response, still starts with the landed bytes.
+
+        :param url: The followed URL
+        :param etag: ETag of the response holding the whole file
+        """
+        self.entries[url]["verified"] = etag
+
+    def complete(self, url):
+        """
+        Tells whether the last interval of a followed month, 00:00 on the first of the
+        next month, has been landed.
+
+        :param url: The followed URL
+        :return: True if the last landed line is that of the month's last interval
+        """
+        entry = self.entries.get(url)
+        if entry is None:
+            return False
+        _, year, month = parse_filename(url.split("/")[-1])
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        fields = entry["last_line"].split(",")
+        return len(fields) > 1 and fields[1].strip('" ') == f"{year}/{month:02}/01 00:00:00"
+
+    def rebase(self, url, body, etag=None):
+        """
+        Starts following a file from a copy of the whole file.
+
+        :param url: The followed URL
+        :param body: The whole file
+        :param etag: ETag of the response the file came from (default is None)
+        :return: The whole lines of the file, to land as the monthly file
+        """
+        lines = body[: body.rfind(b"\n") + 1]
+        self.entries[url] = {
+            "offset": len(lines),
+            "last_line": last_line(lines).decode("latin-1"),
+            "header": lines[: lines.find(b"\n") + 1].decode("latin-1"),
+            "etag": etag,
+            "crc": zlib.crc32(lines),
+            "verified": etag,
+        }
+        return lines
+
+    def forget(self, url):
+        """
+        Stops following a URL.
+
+        :param url: The URL
+        """
+        self.entries.pop(url, None)
+
+    def __contains__(self, url):
+        return url in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def current_urls(
+    base_url: str, provinces: list[str], now: datetime.datetime | None = None
+) -> list[str]:
+    """
+    Returns the URLs of the files of the current month, the ones still being appended to.
+    Args:
+        base_url (str): The base URL for the data.
+        provinces (list): The provinces to follow.
+        now (datetime.datetime | None): The time to follow at (default: now).
+    Returns:
+        list: The URL of the current month's file of every province.
+    """
+    year, month = last_published_month(now)
+    return [f"{base_url}_{year}{month:02}_{province}1.csv" for province in provinces]
+
+
+def file_names(ctx, url: str) -> tuple[str, str]:
+    """
+    Returns the name a followed file lands under and the folder its deltas are written to.
+    Args:
+        ctx (ExtractionContext): The settings and shared resources of the run.
+        url (str): The followed URL.
+    Returns:
+        tuple: The name of the monthly file and its delta folder in the S3 bucket.
+    """
+    filename = url.split("/")[-1]
+    return filename, f"{delta_folder(ctx.folder)}{filename.rsplit('.', 1)[0]}/"
+
+
+async def land_month(url: str, ctx, tails: TailCache, body: bytes, etag: str | None) -> None:
+    """
+    Asynchronously lands a whole followed file as its monthly file and starts following it
+    from there. Deltas of an earlier version of the file are deleted, since they no longer
+    continue it.
+    Args:
+        url (str): The followed URL.
+        ctx (ExtractionContext): The settings and shared resources of the run.
+        tails (TailCache): The positions reached in every followed file.
+        body (bytes): The whole file.
+        etag (str | None): ETag of the response the file came from.
+    """
+    filename, deltas = file_names(ctx, url)
+    lines = tails.rebase(url, body, etag)
+    if not await ctx.s3.upload_file(ctx.bucket_name, filename, lines, ctx.folder):
+        metrics.increment("failed_uploads")
+        tails.forget(url)
+        return
+    ctx.manifest.add(f"{ctx.folder}{filename}", object_etag(lines))
+    metrics.increment("files_uploaded")
+    logger.info("Following '%s' from %d bytes.", filename, len(lines))
+    try:
+        stale = await ctx.s3.list_objects(ctx.bucket_name, deltas)
+        if stale:
+            await ctx.s3.delete_objects(ctx.bucket_name, list(stale))
+    except ctx.s3.S3ConnectionError as e:
+        logger.error("Failed to delete the stale deltas of '%s': %s", filename, e)
+
+
+async def land_delta(url: str, ctx, tails: TailCache, lines: bytes, etag: str | None) -> None:
+    """
+    Asynchronously lands the lines appended to a followed file as a small delta object,
+    with the header row of the file so it can be read on its own.
+    Args:
+        url (str): The followed URL.
+        ctx (ExtractionContext): The settings and shared resources of the run.
+        tails (TailCache): The positions reached in every followed file.
+        lines (bytes): The appended lines.
+        etag (str | None): ETag of the response the lines came from.
+    """
+    _, deltas = file_names(ctx, url)
+    start = tails.entries[url]["offset"]
+    name = f"{start:012}-{start + len(lines):012}.csv"
+    if not await ctx.s3.upload_file(ctx.bucket_name, name, tails.header(url) + lines, deltas):
+        metrics.increment("failed_uploads")
+        return
+    tails.advance(url, lines, etag)
+    metrics.increment("intervals_appended", lines.count(b"\n"))
+    metrics.increment("deltas_uploaded")
+    logger.info("Landed %d new intervals of '%s'.", lines.count(b"\n"), url.split("/")[-1])
+
+
+async def poll(url: str, ctx, tails: TailCache, revalidate: bool = False) -> None:
+    """
+    Asynchronously polls a followed file and lands what was appended to it since the last
+    poll. A file that is not followed yet, or whose landed bytes no longer match the source,
+    is fetched and landed whole. A revalidating poll fetches the whole file, so that rows
+    corrected since they were landed are caught too. A failed poll is only logged; the
+    next poll catches up.
+    Args:
+        url (str): The followed URL.
+        ctx (ExtractionContext): The settings and shared resources of the run.
+        tails (TailCache): The positions reached in every followed file.
+        revalidate (bool): Whether to check the whole file against the landed bytes.
+    """
+    import aiohttp
+
+    headers = tails.request_headers(url, revalidate)
+    try:
+        async with ctx.session.get(url, headers=headers) as response:
+            status = response.status
+            etag = response.headers.get("ETag")
+            body = await response.read() if status in (200, 206) else b""
+    except (aiohttp.ClientError, TimeoutError) as e:
+        metrics.increment("failed_fetches")
+        logger.warning("Failed to poll %s: %r", url, e)
+        return
+    if status == 304:
+        metrics.increment("skipped_unchanged")
+        return
+    if status not in (200, 206, 416):
+        metrics.increment("not_found" if status == 404 else "failed_fetches")
+        logger.warning("Failed to poll %s. Status code: %s", url, status)
+        return
+    metrics.increment("bytes_fetched", len(body))
+    lines = tails.appended(url, status, body)
+    if lines is None and status == 200:
+        if url in tails:
+            metrics.increment("files_rewritten")
+            logger.warning("File '%s' was rewritten at the source. Landing it again.", url)
+        await land_month(url, ctx, tails, body, etag)
+        return
+    if lines is None:
+        logger.warning("File '%s' was rewritten at the source. Fetching it whole.", url)
+        tails.forget(url)
+        await poll(url, ctx, tails)
+        return
+    if status == 200:
+        tails.verify(url, etag)
+    if lines:
+        await land_delta(url, ctx, tails, lines, etag)
+    else:
+        tails.advance(url, lines, etag)
+
+
+async def compact(url: str, ctx) -> None:
+    """
+    Asynchronously folds the delta objects of a followed file back into its monthly file,
+    then deletes them. The monthly file is replaced before any delta is deleted, so a
+    crash in between leaves deltas that the next compaction recognises as folded.
+    Args:
+        url (str): The followed URL.
+        ctx (ExtractionContext): The settings and shared resources of the run.
+    """
+    filename, deltas = file_names(ctx, url)
+    s3 = ctx.s3
+    try:
+        keys = sorted(await s3.list_objects(ctx.bucket_name, deltas))
+        if not keys:
+            return
+        monthly = await s3.read_object(ctx.bucket_name, f"{ctx.folder}{filename}")
+        bodies = await asyncio.gather(*(s3.read_object(ctx.bucket_name, key) for key in keys))
+        compacted, folded = fold(monthly, dict(zip(keys, bodies, strict=True)))
+        if len(compacted) > len(monthly):
+            if not await s3.upload_file(ctx.bucket_name, filename, compacted, ctx.folder):
+                metrics.increment("failed_uploads")
+                return
+            ctx.manifest.add(f"{ctx.folder}{filename}", object_etag(compacted))
+        if folded:
+            await s3.delete_objects(ctx.bucket_name, folded)
+    except s3.S3ConnectionError as e:
+        logger.error("Failed to compact the deltas of '%s': %s", filename, e)
+        return
+    metrics.increment("deltas_compacted", len(folded))
+    logger.info("Folded %d deltas into '%s'.", len(folded), filename)
+
+
+async def follow(
+    ctx,
+    base_url: str,
+    provinces: list[str],
+    state_path: str,
+    poll_seconds: float = POLL_SECONDS,
+    compact_seconds: float = COMPACT_SECONDS,
+    polls: int | None = None,
+    revalidate_seconds: float = REVALIDATE_SECONDS,
+    after_poll: Callable[[], None] | None = None,
+) -> None:
+    """
+    Asynchronously follows the current month's file of every province, landing the
+    intervals appended to it as small delta objects every `poll_seconds`, and folding the
+    deltas back into the monthly files every `compact_seconds`. Every `revalidate_seconds`
+    the whole files are checked against the landed bytes, and a file whose earlier rows
+    were corrected is landed again. When the month rolls over, the files of the finished
+    month are followed until their last interval, 00:00 on the first of the new month,
+    has been landed, then compacted and no longer followed. Positions are persisted after
+    every poll, so a restarted follower carries on where the last one stopped.
+    Args:
+        ctx (ExtractionContext): The settings and shared resources of the run.
+        base_url (str): The base URL for the data.
+        provinces (list): The provinces to follow.
+        state_path (str): The local file the positions are persisted to.
+        poll_seconds (float): The number of seconds between polls.
+        compact_seconds (float): The number of seconds between compactions.
+        polls (int | None): The number of polls to run before returning, compacting after
+        the last (default: poll until cancelled).
+        revalidate_seconds (float): The number of seconds between checks of the whole files.
+        after_poll (Callable | None): Called after every poll, to persist the rest of the
+        run's state.
+    """
+    tails = TailCache.load(state_path)
+    compacted_at = revalidated_at = time.monotonic()
+    done = 0
+    while polls is None or done < polls:
+        current = current_urls(base_url, provinces)
+        urls = current + [url for url in tails.entries if url not in current]
+        revalidate = time.monotonic() - revalidated_at >= revalidate_seconds
+        with metrics.timer("poll"):
+            await asyncio.gather(*(poll(url, ctx, tails, revalidate) for url in urls))
+        if revalidate:
+            revalidated_at = time.monotonic()
+        finished = [url for url in urls if url not in current and tails.complete(url)]
+        done += 1
+        last = polls is not None and done >= polls
+        if finished or last or time.monotonic() - compacted_at >= compact_seconds:
+            with metrics.timer("compact"):
+                await asyncio.gather(*(compact(url, ctx) for url in urls))
+            compacted_at = time.monotonic()
+        for url in finished:
+            tails.forget(url)
+        tails.save(state_path)
+        if after_poll is not None:
+            after_poll()
+        if not last:
+            await asyncio.sleep(poll_seconds)
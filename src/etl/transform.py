@@ -0,0 +1,95 @@
+"""Energy Data Transform Module."""
+
+from io import BytesIO
+
+from src.etl.parquet import to_parquet
+from src.etl.quality import check_file
+from src.etl.rollups import rollup_files
+from src.etl.schema import has_expected_columns, read_header
+from src.utils.logs import get_logger
+
+logger = get_logger(__name__)
+
+
+def prepare_payload(
+    url: str,
+    body: bytes,
+    raw: bool,
+    output_format: str = "csv",
+    compression: str = "zstd",
+) -> bytes:
+    """
+    Turns a fetched response body into the bytes to land. This is the CPU-bound step of the
+    pipeline and runs in a worker process, so it only takes and returns picklable values.
+    In Parquet format the body is parsed into typed columns and written as a Parquet file.
+    In raw mode only the header row is checked and the body itself is returned unchanged.
+    Otherwise the body is parsed as a CSV file and written back out.
+    Args:
+        url (str): The URL the body was fetched from.
+        body (bytes): The response body.
+        raw (bool): Whether to pass the body through without parsing it.
+        output_format (str): The format to land the file in, "csv" or "parquet".
+        compression (str): The Parquet compression codec, "zstd" or "snappy".
+    Returns:
+        bytes: The bytes to land, or empty bytes if the body is not a valid file.
+    """
+    if output_format == "parquet":
+        try:
+            return to_parquet(body, compression)
+        except ValueError as e:
+            logger.error("An error occurred while converting data from %s: %s", url, e)
+            return b""
+    if raw:
+        if not has_expected_columns(body):
+            logger.error("Unexpected columns in data from %s: %s", url, read_header(body))
+            return b""
+        return body
+    import pandas as pd
+
+    try:
+        df = pd.read_csv(BytesIO(body))
+    except ValueError as e:
+        logger.error("An error occurred while parsing data from %s: %s", url, e)
+        return b""
+    return df.to_csv(index=False).encode()
+
+
+def prepare_file(
+    url: str,
+    body: bytes,
+    raw: bool,
+    output_format: str = "csv",
+    compression: str = "zstd",
+    rollups: bool = False,
+    check_quality: bool = False,
+) -> tuple[bytes, dict[str, bytes], dict | None]:
+    """
+    Turns a fetched response body into the bytes to land and, when asked, its quality
+    report and its daily and monthly rollups, in one trip to a worker process. A file
+    failing its quality checks is passed on exactly as received, to be quarantined. A file
+    whose rollups cannot be computed is still landed.
+    Args:
+        url (str): The URL the body was fetched from.
+        body (bytes): The response body.
+        raw (bool): Whether to pass the body through without parsing it.
+        output_format (str): The format to land the file in, "csv" or "parquet".
+        compression (str): The Parquet compression codec, "zstd" or "snappy".
+        rollups (bool): Whether to compute the rollups of the file.
+        check_quality (bool): Whether to run the quality checks on the file.
+    Returns:
+        tuple: The bytes to land, or empty bytes if the body is not a valid file, the
+        rollup files keyed by their path relative to the rollup folder, and the quality
+        report of the file, or None if it was not checked.
+    """
+    filename = url.split("/")[-1]
+    report = check_file(filename, body).to_dict() if check_quality else None
+    if report is not None and not report["passed"]:
+        return body, {}, report
+    payload = prepare_payload(url, body, raw, output_format, compression)
+    if not (payload and rollups):
+        return payload, {}, report
+    try:
+        return payload, rollup_files(filename, body), report
+    except ValueError as e:
+        logger.error("An error occurred while computing rollups of %s: %s", url, e)
+        return payload, {}, report
@@ -1 +1,762 @@
 """Module for Connecting to AWS DynamoDB"""
+
+import hashlib
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from botocore.exceptions import BotoCoreError, ClientError
+from dotenv import load_dotenv
+
+PLANNED = "planned"
+FETCHED = "fetched"
+UPLOADED = "uploaded"
+FAILED = "failed"
+STATES = (PLANNED, FETCHED, UPLOADED, FAILED)
+
+UPSERT_JOB = (
+    "INSERT INTO jobs (url, state, attempts, checksum, error, updated_at) "
+    "VALUES (:url, :state, :attempts, :checksum, :error, :updated_at) "
+    "ON CONFLICT (url) DO UPDATE SET state = excluded.state, attempts = excluded.attempts, "
+    "checksum = excluded.checksum, error = excluded.error, updated_at = excluded.updated_at"
+)
+UPSERT_JOB_IF_NOT_UPLOADED = (
+    "INSERT INTO jobs (url, state, attempts, checksum, error, updated_at) "
+    "VALUES (:url, :state, :attempts, :checksum, :error, :updated_at) "
+    "ON CONFLICT (url) DO UPDATE SET state = excluded.state, attempts = excluded.attempts, "
+    "checksum = excluded.checksum, error = excluded.error, updated_at = excluded.updated_at "
+    "WHERE jobs.state <> 'uploaded'"
+)
+
+LEASED = "leased"
+FINISHED = "finished"
+# Long enough for a batch of one region-year, renewed while the batch runs.
+LEASE_SECONDS = 300
+
+ACQUIRE_LEASE = (
+    "INSERT INTO leases (lease_id, owner, state, expires_at) "
+    "VALUES (:lease_id, :owner, 'leased', :expires_at) "
+    "ON CONFLICT (lease_id) DO UPDATE SET owner = excluded.owner, state = excluded.state, "
+    "expires_at = excluded.expires_at "
+    "WHERE leases.state <> 'finished' AND (leases.expires_at <= :now OR leases.owner = :owner)"
+)
+RENEW_LEASE = (
+    "UPDATE leases SET expires_at = :expires_at "
+    "WHERE lease_id = :lease_id AND owner = :owner AND state = 'leased'"
+)
+FINISH_LEASE = (
+    "UPDATE leases SET state = 'finished' "
+    "WHERE lease_id = :lease_id AND owner = :owner AND state = 'leased'"
+)
+SELECT_LEASES = (
+    "SELECT lease_id, owner, state, expires_at FROM leases WHERE substr(lease_id, 1, ?) = ?"
+)
+
+
+def checksum(payload):
+    """
+    Computes the checksum recorded for a landed file, the hex MD5 digest of its bytes.
+    For a single-part upload this is also the object's ETag.
+
+    :param payload: The bytes of the file
+    :return: The checksum
+    """
+    return hashlib.md5(payload, usedforsecurity=False).hexdigest()
+
+
+def dynamodb_resource(secret, access, region=None, endpoint_url=None):
+    """
+    Creates a boto3 DynamoDB resource. boto3 is imported here rather than with this module,
+    so runs keeping their ledger and leases in SQLite or in memory never load it.
+
+    :param secret: User's AWS secret key loaded from the environment file
+    :param access: User's AWS access key loaded from the environment file
+    :param region: AWS region of the resource (default is None)
+    :param endpoint_url: Endpoint of a DynamoDB-compatible service (default is None, AWS)
+    :return: The DynamoDB resource
+    """
+    import boto3
+
+    return boto3.resource(
+        "dynamodb",
+        aws_access_key_id=access,
+        aws_secret_access_key=secret,
+        region_name=region,
+        endpoint_url=endpoint_url,
+    )
+
+
+class JobLedger:
+    class LedgerError(Exception):
+        """Raised when the ledger cannot be read or written."""
+
+    def __init__(self, batch_size=25):
+        """
+        Initializes a ledger of the state of every URL an extraction run works on.
+
+        Each URL moves through planned -> fetched -> uploaded, or to failed, and its entry
+        keeps the number of fetch attempts and the checksum of the landed file. State
+        changes are buffered and written in batches. Landing a file is the exception: it is
+        written at once and only if no other worker has already landed the same URL, so each
+        file is recorded as landed exactly once however many workers run.
+
+        The base class keeps the ledger in memory only, for the lifetime of one run.
+        Durable backends implement `_read_all`, `_write_batch` and `_put_if_not_uploaded`.
+        The in-memory state is guarded by a lock that is never held across a write to the
+        backend, so recording a state change never waits on the network. Writes to the
+        backend are serialized by a lock of their own, which keeps them in the order the
+        state changes were made and keeps a connection or resource from being written by
+        two threads at once.
+
+        :param batch_size: Number of buffered state changes written together (default is 25,
+        the DynamoDB batch limit)
+        """
+        self.batch_size = batch_size
+        self.items = {}
+        self.pending = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def load(self):
+        """
+        Reads every entry from the backend, so a new run can resume where the last one
+        stopped.
+
+        :return: The ledger itself
+        """
+        self.items = self._read_all()
+        return self
+
+    def state(self, url):
+        """
+        Returns the last recorded state of a URL.
+
+        :param url: The URL
+        :return: The state, or None if the URL has never been recorded
+        """
+        item = self.items.get(url)
+        return item["state"] if item else None
+
+    def done(self):
+        """
+        Returns the URLs whose file has been landed.
+
+        :return: A set of URLs
+        """
+        return {url for url, item in self.items.items() if item["state"] == UPLOADED}
+
+    def plan(self, urls):
+        """
+        Records the URLs of a new plan that have never been seen before as planned.
+
+        :param urls: The planned URLs
+        """
+        for url in urls:
+            if url not in self.items:
+                self.record(url, PLANNED)
+
+    def record(self, url, state, checksum=None, error=None):
+        """
+        Buffers a state change of a URL, writing the buffer out once it is full.
+        A fetch counts as one more attempt, and so does a failure, unless it follows a
+        fetch of the same attempt, as when a fetched file fails its quality checks.
+
+        :param url: The URL
+        :param state: The new state, one of STATES
+        :param checksum: Checksum of the file, if known (default is None)
+        :param error: Reason the URL failed (default is None)
+        """
+        with self._lock:
+            item = self._item(url, state, checksum, error)
+            self.items[url] = item
+            self.pending[url] = item
+            full = len(self.pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def complete(self, url, checksum=None):
+        """
+        Records that the file of a URL has been landed, unless it already was.
+
+        :param url: The URL
+        :param checksum: Checksum of the landed file (default is None)
+        :return: True if this call recorded the landing, False if the URL had been landed
+        before, by this or another worker
+        """
+        with self._write_lock:
+            with self._lock:
+                self.pending.pop(url, None)
+                item = self._item(url, UPLOADED, checksum, None)
+            landed = self._put_if_not_uploaded(item)
+        if landed:
+            with self._lock:
+                self.items[url] = item
+        return landed
+
+    def land(self, url, checksum=None):
+        """
+        Records that the file of a URL has been landed. A URL this ledger already records
+        as landed, whose file a refresh or incremental run has landed again, only has its
+        checksum updated; any other URL is recorded as in `complete`.
+
+        :param url: The URL
+        :param checksum: Checksum of the landed file (default is None)
+        :return: False if another worker had landed the URL first, True otherwise
+        """
+        if self.state(url) == UPLOADED:
+            self.record(url, UPLOADED, checksum)
+            return True
+        return self.complete(url, checksum)
+
+    def flush(self):
+        """
+        Writes out every buffered state change. State changes recorded while the buffer is
+        being written go to a new buffer. If the write fails, the buffer is kept, so the
+        next flush writes it again.
+        """
+        with self._write_lock:
+            with self._lock:
+                items, self.pending = self.pending, {}
+            if not items:
+                return
+            try:
+                self._write_batch(list(items.values()))
+            except self.LedgerError:
+                with self._lock:
+                    self.pending = {**items, **self.pending}
+                raise
+
+    def close(self):
+        """
+        Writes out every buffered state change and releases the backend.
+        """
+        self.flush()
+
+    def _item(self, url, state, checksum, error):
+        if state not in STATES:
+            raise ValueError(f"Unknown ledger state '{state}'.")
+        previous = self.items.get(url, {})
+        attempt = state == FETCHED or (state == FAILED and previous.get("state") != FETCHED)
+        attempts = int(previous.get("attempts", 0)) + attempt
+        return {
+            "url": url,
+            "state": state,
+            "attempts": attempts,
+            "checksum": checksum or previous.get("checksum"),
+            "error": error,
+            "updated_at": int(time.time()),
+        }
+
+    def _read_all(self):
+        return {}
+
+    def _write_batch(self, items):
+        pass
+
+    def _put_if_not_uploaded(self, item):
+        return self.state(item["url"]) != UPLOADED
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class DynamoLedger(JobLedger):
+    @classmethod
+    def credentials(cls, table_name, region=None, endpoint_url=None, batch_size=25):
+        """
+        Retrieves AWS credentials from a hidden environment file.
+
+        :param table_name: Name of the DynamoDB table holding the ledger
+        :param region: AWS region specified by the user (default is None)
+        :param endpoint_url: Endpoint of a DynamoDB-compatible service such as DynamoDB
+        Local (default is None, AWS)
+        :param batch_size: Number of buffered state changes written together (default is 25)
+        :return: An instance of the DynamoLedger class initialized with the user's credentials
+        """
+        load_dotenv()
+        secret = os.getenv("ACCESS_SECRET")
+        access = os.getenv("ACCESS_KEY")
+
+        return cls(table_name, secret, access, region, endpoint_url, batch_size)
+
+    def __init__(self, table_name, secret, access, region=None, endpoint_url=None, batch_size=25):
+        """
+        Initializes a ledger stored in a DynamoDB table keyed by URL.
+
+        :param table_name: Name of the DynamoDB table holding the ledger
+        :param secret: User's AWS secret key loaded from the environment file
+        :param access: User's AWS access key loaded from the environment file
+        :param region: Specified AWS region during instantiation (default is None)
+        :param endpoint_url: Endpoint of a DynamoDB-compatible service (default is None, AWS)
+        :param batch_size: Number of buffered state changes written together (default is 25)
+        """
+        super().__init__(batch_size)
+        self.resource = dynamodb_resource(secret, access, region, endpoint_url)
+        self.table = self.resource.Table(table_name)
+
+    def create_table(self):
+        """
+        Creates the ledger table with on-demand capacity, unless it already exists.
+        """
+        try:
+            self.resource.create_table(
+                TableName=self.table.name,
+                KeySchema=[{"AttributeName": "url", "KeyType": "HASH"}],
+                AttributeDefinitions=[{"AttributeName": "url", "AttributeType": "S"}],
+                BillingMode="PAY_PER_REQUEST",
+            )
+            self.table.wait_until_exists()
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ResourceInUseException":
+                raise self.LedgerError(f"Error creating ledger table: {e}") from e
+
+    def _read_all(self):
+        items = {}
+        kwargs = {}
+        try:
+            while True:
+                response = self.table.scan(**kwargs)
+                for item in response.get("Items", []):
+                    items[item["url"]] = item
+                if "LastEvaluatedKey" not in response:
+                    return items
+                kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        except (ClientError, BotoCoreError) as e:
+            raise self.LedgerError(f"Error reading ledger table: {e}") from e
+
+    def _write_batch(self, items):
+        try:
+            with self.table.batch_writer(overwrite_by_pkeys=["url"]) as batch:
+                for item in items:
+                    batch.put_item(Item=item)
+        except (ClientError, BotoCoreError) as e:
+            raise self.LedgerError(f"Error writing to ledger table: {e}") from e
+
+    def _put_if_not_uploaded(self, item):
+        try:
+            from boto3.dynamodb.conditions import Attr
+
+            self.table.put_item(
+                Item=item,
+                ConditionExpression=Attr("url").not_exists() | Attr("state").ne(UPLOADED),
+            )
+            return True
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            raise self.LedgerError(f"Error writing to ledger table: {e}") from e
+
+
+class SQLiteLedger(JobLedger):
+    def __init__(self, path, batch_size=25):
+        """
+        Initializes a ledger stored in a local SQLite database, for runs without DynamoDB.
+
+        :param path: Local file holding the database
+        :param batch_size: Number of buffered state changes written together (default is 25)
+        """
+        super().__init__(batch_size)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "url TEXT PRIMARY KEY, state TEXT NOT NULL, attempts INTEGER NOT NULL, "
+                "checksum TEXT, error TEXT, updated_at INTEGER NOT NULL)"
+            )
+
+    def close(self):
+        super().close()
+        self.connection.close()
+
+    def _read_all(self):
+        self.connection.row_factory = sqlite3.Row
+        try:
+            rows = self.connection.execute("SELECT * FROM jobs").fetchall()
+        except sqlite3.Error as e:
+            raise self.LedgerError(f"Error reading ledger database: {e}") from e
+        finally:
+            self.connection.row_factory = None
+        return {row["url"]: dict(row) for row in rows}
+
+    def _write_batch(self, items):
+        try:
+            with self.connection:
+                self.connection.executemany(UPSERT_JOB, items)
+        except sqlite3.Error as e:
+            raise self.LedgerError(f"Error writing to ledger database: {e}") from e
+
+    def _put_if_not_uploaded(self, item):
+        try:
+            with self.connection:
+                cursor = self.connection.execute(UPSERT_JOB_IF_NOT_UPLOADED, item)
+        except sqlite3.Error as e:
+            raise self.LedgerError(f"Error writing to ledger database: {e}") from e
+        return cursor.rowcount == 1
+
+
+class LeaseTable:
+    class LeaseError(Exception):
+        """Raised when the lease table cannot be read or written."""
+
+    def __init__(self, run_id, owner=None, lease_seconds=LEASE_SECONDS):
+        """
+        Initializes a table of leases through which the workers of one run share its batches.
+
+        A worker claims a batch by writing a lease on it that expires after
+        `lease_seconds`, renews the lease while it works and marks it finished at the end.
+        A lease can only be taken over once it has expired, so a batch is worked on by one
+        worker at a time and the batch of a crashed worker is reclaimed by another once its
+        lease runs out. Finished batches are never claimed again within the run.
+
+        The base class keeps the leases in memory, which only shares batches between the
+        workers of one process. Durable backends implement `_acquire`, `_renew`, `_finish`
+        and `_leases`.
+
+        :param run_id: Name of the run the batches belong to, shared by all of its workers
+        :param owner: Name of this worker (default is None, the host, process and a random
+        suffix)
+        :param lease_seconds: Seconds a lease is held without being renewed (default is
+        LEASE_SECONDS)
+        """
+        self.run_id = run_id
+        self.owner = owner or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = lease_seconds
+        self.leases = {}
+        self._lock = threading.Lock()
+
+    def claim(self, batches):
+        """
+        Claims the first batch that is neither finished nor leased by another worker.
+        The leases of the run are read once, and a lease is only written for batches that
+        are free or whose lease has expired, so a worker waiting on batches leased by
+        others makes a single read per claim.
+
+        :param batches: Names of the candidate batches, in order
+        :return: A tuple of the claimed batch, or None, and the unclaimed batches that are
+        still unfinished, which can be claimed later if their lease expires
+        """
+        now = time.time()
+        leases = self._leases()
+        pending = []
+        claimed = None
+        for batch in batches:
+            lease_id = self.lease_id(batch)
+            lease = leases.get(lease_id)
+            if lease is not None and lease["state"] == FINISHED:
+                continue
+            free = lease is None or lease["expires_at"] <= now or lease["owner"] == self.owner
+            if claimed is None and free and self._acquire(lease_id, now):
+                claimed = batch
+            else:
+                pending.append(batch)
+        return claimed, pending
+
+    def renew(self, batch):
+        """
+        Extends the lease on a claimed batch by another `lease_seconds`.
+
+        :param batch: Name of the batch
+        :return: True if the lease was extended, False if it had expired and been taken over
+        """
+        return self._renew(self.lease_id(batch), time.time())
+
+    def finish(self, batch):
+        """
+        Marks a claimed batch as finished, so no worker of the run claims it again.
+
+        :param batch: Name of the batch
+        :return: True if the batch was marked, False if its lease had been taken over
+        """
+        return self._finish(self.lease_id(batch))
+
+    def lease_id(self, batch):
+        """
+        Returns the key of the lease on a batch within this run.
+
+        :param batch: Name of the batch
+        :return: The lease key
+        """
+        return f"{self.run_id}/{batch}"
+
+    def close(self):
+        """
+        Releases the backend.
+        """
+
+    def _acquire(self, lease_id, now):
+        with self._lock:
+            lease = self.leases.get(lease_id)
+            if lease and (
+                lease["state"] == FINISHED
+                or (lease["expires_at"] > now and lease["owner"] != self.owner)
+            ):
+                return False
+            self.leases[lease_id] = self._lease(lease_id, now)
+            return True
+
+    def _renew(self, lease_id, now):
+        with self._lock:
+            lease = self.leases.get(lease_id)
+            if not lease or lease["owner"] != self.owner or lease["state"] != LEASED:
+                return False
+            lease["expires_at"] = now + self.lease_seconds
+            return True
+
+    def _finish(self, lease_id):
+        with self._lock:
+            lease = self.leases.get(lease_id)
+            if not lease or lease["owner"] != self.owner or lease["state"] != LEASED:
+                return False
+            lease["state"] = FINISHED
+            return True
+
+    def _leases(self):
+        prefix = self.lease_id("")
+        with self._lock:
+            return {
+                lease_id: dict(lease)
+                for lease_id, lease in self.leases.items()
+                if lease_id.startswith(prefix)
+            }
+
+    def _lease(self, lease_id, now):
+        return {
+            "lease_id": lease_id,
+            "owner": self.owner,
+            "state": LEASED,
+            "expires_at": int(now + self.lease_seconds),
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class DynamoLeaseTable(LeaseTable):
+    @classmethod
+    def credentials(cls, table_name, run_id, region=None, endpoint_url=None, **kwargs):
+        """
+        Retrieves AWS credentials from a hidden environment file.
+
+        :param table_name: Name of the DynamoDB table holding the leases
+        :param run_id: Name of the run the batches belong to
+        :param region: AWS region specified by the user (default is None)
+        :param endpoint_url: Endpoint of a DynamoDB-compatible service (default is None, AWS)
+        :param kwargs: Further arguments of the LeaseTable class
+        :return: An instance of the DynamoLeaseTable class initialized with the user's
+        credentials
+        """
+        load_dotenv()
+        secret = os.getenv("ACCESS_SECRET")
+        access = os.getenv("ACCESS_KEY")
+
+        return cls(table_name, secret, access, run_id, region, endpoint_url, **kwargs)
+
+    def __init__(
+        self, table_name, secret, access, run_id, region=None, endpoint_url=None, **kwargs
+    ):
+        """
+        Initializes a lease table stored in DynamoDB, keyed by lease and written only with
+        conditional writes, so two workers can never hold the same lease.
+
+        :param table_name: Name of the DynamoDB table holding the leases
+        :param secret: User's AWS secret key loaded from the environment file
+        :param access: User's AWS access key loaded from the environment file
+        :param run_id: Name of the run the batches belong to
+        :param region: Specified AWS region during instantiation (default is None)
+        :param endpoint_url: Endpoint of a DynamoDB-compatible service (default is None, AWS)
+        :param kwargs: Further arguments of the LeaseTable class
+        """
+        super().__init__(run_id, **kwargs)
+        self.resource = dynamodb_resource(secret, access, region, endpoint_url)
+        self.table = self.resource.Table(table_name)
+
+    def create_table(self):
+        """
+        Creates the lease table with on-demand capacity, unless it already exists.
+        """
+        try:
+            self.resource.create_table(
+                TableName=self.table.name,
+                KeySchema=[{"AttributeName": "lease_id", "KeyType": "HASH"}],
+                AttributeDefinitions=[{"AttributeName": "lease_id", "AttributeType": "S"}],
+                BillingMode="PAY_PER_REQUEST",
+            )
+            self.table.wait_until_exists()
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ResourceInUseException":
+                raise self.LeaseError(f"Error creating lease table: {e}") from e
+
+    def _acquire(self, lease_id, now):
+        from boto3.dynamodb.conditions import Attr
+
+        condition = Attr("lease_id").not_exists() | (
+            Attr("state").ne(FINISHED)
+            & (Attr("expires_at").lte(int(now)) | Attr("owner").eq(self.owner))
+        )
+        return self._conditional(
+            self.table.put_item, Item=self._lease(lease_id, now), ConditionExpression=condition
+        )
+
+    def _renew(self, lease_id, now):
+        from boto3.dynamodb.conditions import Attr
+
+        return self._conditional(
+            self.table.update_item,
+            Key={"lease_id": lease_id},
+            UpdateExpression="SET expires_at = :expires_at",
+            ConditionExpression=Attr("owner").eq(self.owner) & Attr("state").eq(LEASED),
+            ExpressionAttributeValues={":expires_at": int(now + self.lease_seconds)},
+        )
+
+    def _finish(self, lease_id):
+        from boto3.dynamodb.conditions import Attr
+
+        return self._conditional(
+            self.table.update_item,
+            Key={"lease_id": lease_id},
+            UpdateExpression="SET #state = :finished",
+            ConditionExpression=Attr("owner").eq(self.owner) & Attr("state").eq(LEASED),
+            ExpressionAttributeNames={"#state": "state"},
+            ExpressionAttributeValues={":finished": FINISHED},
+        )
+
+    def _leases(self):
+        from boto3.dynamodb.conditions import Attr
+
+        leases = {}
+        kwargs = {
+            "FilterExpression": Attr("lease_id").begins_with(self.lease_id("")),
+            "ConsistentRead": True,
+        }
+        try:
+            while True:
+                response = self.table.scan(**kwargs)
+                for item in response.get("Items", []):
+                    leases[item["lease_id"]] = item
+                if "LastEvaluatedKey" not in response:
+                    return leases
+                kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        except (ClientError, BotoCoreError) as e:
+            raise self.LeaseError(f"Error reading lease table: {e}") from e
+
+    def _conditional(self, write, **kwargs):
+        try:
+            write(**kwargs)
+            return True
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            raise self.LeaseError(f"Error writing to lease table: {e}") from e
+        except BotoCoreError as e:
+            raise self.LeaseError(f"Error writing to lease table: {e}") from e
+
+
+class SQLiteLeaseTable(LeaseTable):
+    def __init__(self, path, run_id, **kwargs):
+        """
+        Initializes a lease table stored in a local SQLite database, for workers sharing a
+        host or a network file system instead of DynamoDB.
+
+        :param path: Local file holding the database
+        :param run_id: Name of the run the batches belong to
+        :param kwargs: Further arguments of the LeaseTable class
+        """
+        super().__init__(run_id, **kwargs)
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                "lease_id TEXT PRIMARY KEY, owner TEXT NOT NULL, state TEXT NOT NULL, "
+                "expires_at INTEGER NOT NULL)"
+            )
+
+    def close(self):
+        self.connection.close()
+
+    def _acquire(self, lease_id, now):
+        return self._execute(ACQUIRE_LEASE, {**self._lease(lease_id, now), "now": int(now)})
+
+    def _renew(self, lease_id, now):
+        return self._execute(
+            RENEW_LEASE,
+            {
+                "lease_id": lease_id,
+                "owner": self.owner,
+                "expires_at": int(now + self.lease_seconds),
+            },
+        )
+
+    def _finish(self, lease_id):
+        return self._execute(FINISH_LEASE, {"lease_id": lease_id, "owner": self.owner})
+
+    def _leases(self):
+        prefix = self.lease_id("")
+        try:
+            rows = self.connection.execute(SELECT_LEASES, (len(prefix), prefix)).fetchall()
+        except sqlite3.Error as e:
+            raise self.LeaseError(f"Error reading lease database: {e}") from e
+        return {
+            lease_id: {"lease_id": lease_id, "owner": owner, "state": state, "expires_at": expires}
+            for lease_id, owner, state, expires in rows
+        }
+
+    def _execute(self, statement, parameters):
+        try:
+            with self.connection:
+                cursor = self.connection.execute(statement, parameters)
+        except sqlite3.Error as e:
+            raise self.LeaseError(f"Error writing to lease database: {e}") from e
+        return cursor.rowcount == 1
+
+
+def open_ledger(table_name=None, path=None, region=None, endpoint_url=None):
+    """
+    Opens the ledger of a run and reads its entries.
+
+    :param table_name: Name of a DynamoDB table holding the ledger (default is None)
+    :param path: Local SQLite file holding the ledger, used when no table is given
+    (default is None)
+    :param region: AWS region of the table (default is None)
+    :param endpoint_url: Endpoint of a DynamoDB-compatible service (default is None, AWS)
+    :return: The loaded JobLedger, or None if neither a table nor a path is given
+    """
+    if table_name:
+        ledger = DynamoLedger.credentials(table_name, region, endpoint_url)
+        ledger.create_table()
+        return ledger.load()
+    if path:
+        return SQLiteLedger(path).load()
+    return None
+
+
+def open_leases(run_id, table_name=None, path=None, region=None, endpoint_url=None, **kwargs):
+    """
+    Opens the lease table the workers of a run claim batches through.
+
+    :param run_id: Name of the run the batches belong to
+    :param table_name: Name of a DynamoDB table holding the leases (default is None)
+    :param path: Local SQLite file holding the leases, used when no table is given
+    (default is None)
+    :param region: AWS region of the table (default is None)
+    :param endpoint_url: Endpoint of a DynamoDB-compatible service (default is None, AWS)
+    :param kwargs: Further arguments of the LeaseTable class
+    :return: The LeaseTable, or None if neither a table nor a path is given
+    """
+    if (table_name or path) and not run_id:
+        raise ValueError("A run id is required to share a run through a lease table.")
+    if table_name:
+        leases = DynamoLeaseTable.credentials(table_name, run_id, region, endpoint_url, **kwargs)
+        leases.create_table()
+        return leases
+    if path:
+        return SQLiteLeaseTable(path, run_id, **kwargs)
+    return None
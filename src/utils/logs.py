@@ -1,13 +1,26 @@
+import atexit
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
+_log_queue = queue.SimpleQueue()
+_listener = None
 
-def get_logger(name):
+
+class DeferredQueueHandler(QueueHandler):
+    """Queues records as they are, leaving all formatting to the listener thread."""
+
+    def prepare(self, record):
+        # The queue never leaves the process, so the record does not need to be pickled
+        # and its message can be formatted later, off the caller's thread.
+        return record
+
+
+def _start_listener():
     """
-    Create a logger with the specified name and set up handlers and formatters.
+    Start the thread that formats queued records and writes them to the console.
     """
-    # Create a custom logger
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
+    global _listener
 
     # Create handlers
     console_handler = logging.StreamHandler()
@@ -19,7 +32,28 @@ def get_logger(name):
     console_format = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
     console_handler.setFormatter(console_format)
 
-    # Add handlers to the logger
-    logger.addHandler(console_handler)
+    _listener = QueueListener(_log_queue, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def get_logger(name):
+    """
+    Create a logger with the specified name that hands its records to a queue.
+    Records are formatted and written by a single listener thread, so logging never blocks
+    the event loop on console I/O. Calling it again for the same name returns the same
+    logger without adding another handler.
+    """
+    if _listener is None:
+        _start_listener()
+
+    # Create a custom logger
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    # Add the queue handler to the logger, once
+    if not any(isinstance(handler, QueueHandler) for handler in logger.handlers):
+        logger.addHandler(DeferredQueueHandler(_log_queue))
 
     return logger
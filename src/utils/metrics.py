@@ -0,0 +1,218 @@
+"""Pipeline Metrics Module."""
+
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Initializes a latency histogram.
+
+        Observations are counted into cumulative buckets for Prometheus, and the run summary
+        estimates quantiles from the same buckets, so a histogram takes the same memory
+        however many files a run processes.
+
+        :param buckets: Upper bounds of the buckets in seconds (default is DEFAULT_BUCKETS)
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def observe(self, value):
+        """
+        Records one observation.
+
+        :param value: The observed duration in seconds
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """
+        Estimates a quantile of the observations by interpolating linearly within the bucket
+        it falls in, bounded by the smallest and largest observations.
+
+        :param q: The quantile, between 0 and 1
+        :return: The quantile in seconds, or 0.0 if nothing was observed
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative, lower = 0, 0.0
+        for bound, count in zip(self.buckets, self.counts, strict=True):
+            if count and cumulative + count >= rank:
+                estimate = lower + (bound - lower) * (rank - cumulative) / count
+                return min(max(estimate, self.min), self.max)
+            cumulative += count
+            lower = bound
+        # Beyond the last bucket.
+        return self.max
+
+    def summary(self):
+        """
+        Summarises the observations.
+
+        :return: A dict holding the count, sum, mean and quantiles in seconds
+        """
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            **{f"p{round(q * 100)}": self.quantile(q) for q in QUANTILES},
+        }
+
+
+class Metrics:
+    def __init__(self, namespace="energy_etl"):
+        """
+        Initializes a registry of counters and latency histograms for one pipeline run.
+
+        Histograms are named after pipeline stages (plan, fetch, parse, upload) and
+        counters after events (bytes fetched, retries, skips, 404s). The registry is safe
+        to update from the event loop and from worker threads at the same time.
+
+        :param namespace: Prefix of every metric name in Prometheus output
+        (default is energy_etl)
+        """
+        self.namespace = namespace
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """
+        Drops every recorded value and restarts the run clock.
+        """
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+            self.started = time.time()
+
+    def increment(self, name, value=1):
+        """
+        Adds to a counter.
+
+        :param name: Name of the counter
+        :param value: Amount to add (default is 1)
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        """
+        Records a duration in a stage histogram.
+
+        :param name: Name of the stage
+        :param seconds: The duration in seconds
+        """
+        with self._lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram()
+            self.histograms[name].observe(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        """
+        Times the enclosed block, awaits included, into a stage histogram.
+
+        :param name: Name of the stage
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def summary(self):
+        """
+        Summarises the run.
+
+        :return: A JSON-serialisable dict of the wall-clock time, counters and stage latencies
+        """
+        with self._lock:
+            return {
+                "wall_seconds": time.time() - self.started,
+                "counters": dict(self.counters),
+                "stages": {name: hist.summary() for name, hist in self.histograms.items()},
+            }
+
+    def to_prometheus(self):
+        """
+        Renders the counters and histograms in the Prometheus text exposition format.
+
+        :return: The metrics as text
+        """
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                metric = f"{self.namespace}_{name}_total"
+                lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+            for name, hist in sorted(self.histograms.items()):
+                metric = f"{self.namespace}_{name}_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts, strict=True):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+                lines += [
+                    f'{metric}_bucket{{le="+Inf"}} {hist.count}',
+                    f"{metric}_sum {hist.sum}",
+                    f"{metric}_count {hist.count}",
+                ]
+        return "\n".join(lines) + "\n"
+
+    def save_json(self, path):
+        """
+        Writes the run summary to a local JSON file, replacing it atomically.
+
+        :param path: Local file to write the summary to
+        """
+        self._write(path, json.dumps(self.summary(), indent=2))
+
+    def save_prometheus(self, path):
+        """
+        Writes the metrics to a local file in Prometheus text format, replacing it atomically
+        so a node exporter textfile collector never reads a partial file.
+
+        :param path: Local file to write the metrics to
+        """
+        self._write(path, self.to_prometheus())
+
+    def save(self, json_path=None, prometheus_path=None):
+        """
+        Writes the run summary and the Prometheus metrics to whichever files are given.
+
+        :param json_path: Local file to write the JSON summary to (default is None)
+        :param prometheus_path: Local file to write the Prometheus metrics to (default is None)
+        """
+        if json_path:
+            self.save_json(json_path)
+        if prometheus_path:
+            self.save_prometheus(prometheus_path)
+
+    @staticmethod
+    def _write(path, text):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+metrics = Metrics()
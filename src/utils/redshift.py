@@ -1 +1,279 @@
 """AWS RedShift Connction Module"""
+
+import json
+import os
+import time
+
+from dotenv import load_dotenv
+
+from src.utils.logs import get_logger
+from src.utils.metrics import metrics
+
+logger = get_logger(__name__)
+
+# The landed CSV files hold REGION, SETTLEMENTDATE, TOTALDEMAND, RRP and PERIODTYPE, in
+# that order, and every table below keeps its columns in the same order.
+CREATE_TARGET = (
+    "CREATE TABLE IF NOT EXISTS price_demand ("
+    "region VARCHAR(8) NOT NULL, settlement_date TIMESTAMP NOT NULL, total_demand REAL, "
+    "rrp REAL, period_type VARCHAR(16), PRIMARY KEY (region, settlement_date)) "
+    "DISTKEY (region) SORTKEY (settlement_date)"
+)
+CREATE_TARGET_POSTGRES = (
+    "CREATE TABLE IF NOT EXISTS price_demand ("
+    "region VARCHAR(8) NOT NULL, settlement_date TIMESTAMP NOT NULL, total_demand REAL, "
+    "rrp REAL, period_type VARCHAR(16), PRIMARY KEY (region, settlement_date))"
+)
+CREATE_LOADED = (
+    "CREATE TABLE IF NOT EXISTS loaded_files ("
+    "s3_key VARCHAR(1024) NOT NULL PRIMARY KEY, etag VARCHAR(64) NOT NULL, "
+    "loaded_at TIMESTAMP NOT NULL)"
+)
+SELECT_LOADED = "SELECT s3_key, etag FROM loaded_files"
+CREATE_STAGING = "CREATE TEMP TABLE price_demand_staging (LIKE price_demand)"
+CREATE_LOADED_STAGING = "CREATE TEMP TABLE loaded_files_staging (LIKE loaded_files)"
+COPY_FROM_MANIFEST = (
+    "COPY price_demand_staging FROM %s IAM_ROLE %s MANIFEST "
+    "CSV IGNOREHEADER 1 TIMEFORMAT 'YYYY/MM/DD HH:MI:SS'"
+)
+COPY_FROM_STDIN = "COPY price_demand_staging FROM STDIN WITH (FORMAT csv, HEADER true)"
+# A region and settlement time present in more than one staged file is merged once.
+MERGE_STATEMENTS = (
+    "DELETE FROM price_demand USING price_demand_staging "
+    "WHERE price_demand.region = price_demand_staging.region "
+    "AND price_demand.settlement_date = price_demand_staging.settlement_date",
+    "INSERT INTO price_demand "
+    "SELECT region, settlement_date, total_demand, rrp, period_type FROM ("
+    "SELECT *, ROW_NUMBER() OVER (PARTITION BY region, settlement_date "
+    "ORDER BY settlement_date) AS copy_number FROM price_demand_staging) AS staged "
+    "WHERE copy_number = 1",
+)
+INSERT_LOADED_STAGING = "INSERT INTO loaded_files_staging (s3_key, etag, loaded_at) VALUES %s"
+RECORD_LOADED_STATEMENTS = (
+    "DELETE FROM loaded_files USING loaded_files_staging "
+    "WHERE loaded_files.s3_key = loaded_files_staging.s3_key",
+    "INSERT INTO loaded_files SELECT * FROM loaded_files_staging",
+    "DROP TABLE loaded_files_staging",
+    "DROP TABLE price_demand_staging",
+)
+
+
+def connect(dsn):
+    """
+    Opens a database connection with psycopg2, which speaks to Redshift as well as to
+    PostgreSQL. psycopg2 is imported here, so the rest of the pipeline runs without it.
+
+    :param dsn: The libpq connection string, e.g.
+    "host=... port=5439 dbname=dev user=... password=..."
+    :return: The open connection
+    """
+    import psycopg2
+
+    try:
+        return psycopg2.connect(dsn)
+    except psycopg2.Error as e:
+        raise RedshiftLoader.LoadError(f"Error connecting to the warehouse: {e}") from e
+
+
+class RedshiftLoader:
+    class LoadError(Exception):
+        """Raised when files cannot be loaded into the warehouse."""
+
+    create_target = CREATE_TARGET
+
+    @classmethod
+    def credentials(cls, s3_conn, bucket_name, dsn=None, **kwargs):
+        """
+        Retrieves the warehouse connection string and the IAM role Redshift reads S3 with
+        from a hidden environment file.
+
+        :param s3_conn: The S3Buckets connection the landed files are read through
+        :param bucket_name: Name of the S3 bucket holding the landed files
+        :param dsn: The libpq connection string (default is None, REDSHIFT_DSN)
+        :param kwargs: Further arguments of the loader
+        :return: An instance of the loader connected to the warehouse
+        """
+        load_dotenv()
+        dsn = dsn or os.getenv("REDSHIFT_DSN")
+        kwargs.setdefault("iam_role", os.getenv("REDSHIFT_IAM_ROLE"))
+
+        return cls(connect(dsn), s3_conn, bucket_name, **kwargs)
+
+    def __init__(
+        self,
+        connection,
+        s3_conn,
+        bucket_name,
+        iam_role=None,
+        manifest_folder="copy_manifests/",
+        batch_size=500,
+    ):
+        """
+        Initializes a bulk loader of the landed CSV files into the price_demand table.
+
+        Files are loaded in batches. Each batch is copied into a temporary staging table
+        with a single COPY over a manifest listing its files, then merged into the target
+        table, replacing the rows of the same region and settlement time, so no row is ever
+        inserted on its own. The key and ETag of every loaded file are kept in the
+        loaded_files table, written in the same transaction as the merge, so each run loads
+        only the files that are new or have changed since they were last loaded.
+
+        :param connection: An open psycopg2 connection to the warehouse
+        :param s3_conn: The S3Buckets connection the landed files are read through
+        :param bucket_name: Name of the S3 bucket holding the landed files
+        :param iam_role: ARN of the IAM role Redshift reads the bucket with (default is None)
+        :param manifest_folder: Folder in the bucket the COPY manifests are written to
+        (default is copy_manifests/)
+        :param batch_size: Number of files loaded by each COPY (default is 500)
+        """
+        self.connection = connection
+        self.s3_conn = s3_conn
+        self.bucket_name = bucket_name
+        self.iam_role = iam_role
+        self.manifest_folder = manifest_folder
+        self.batch_size = batch_size
+
+    def create_tables(self):
+        """
+        Creates the target and loaded_files tables, unless they already exist.
+        """
+        self._execute(self.create_target, CREATE_LOADED)
+
+    def loaded(self):
+        """
+        Reads the files loaded by earlier runs.
+
+        :return: A dict mapping the key of every loaded file to its ETag
+        """
+        try:
+            with self.connection, self.connection.cursor() as cursor:
+                cursor.execute(SELECT_LOADED)
+                return dict(cursor.fetchall())
+        except self.connection.Error as e:
+            raise self.LoadError(f"Error reading loaded files: {e}") from e
+
+    def delta(self, objects):
+        """
+        Picks the landed files that have not been loaded yet, or have changed since.
+
+        :param objects: A dict mapping the key of every landed object to its ETag
+        :return: The keys of the CSV files to load, in key order
+        """
+        loaded = self.loaded()
+        return sorted(
+            key for key, etag in objects.items() if key.endswith(".csv") and loaded.get(key) != etag
+        )
+
+    def load(self, folder=""):
+        """
+        Loads every new or changed CSV file under a folder of the bucket.
+
+        :param folder: Folder in the bucket holding the landed files (default is "")
+        :return: The number of files loaded
+        """
+        objects = self.s3_conn.list_objects(bucket_name=self.bucket_name, folder=folder)
+        keys = self.delta(objects)
+        logger.info("%d of %d landed files need loading.", len(keys), len(objects))
+        for start in range(0, len(keys), self.batch_size):
+            batch = keys[start : start + self.batch_size]
+            with metrics.timer("load"):
+                self.load_batch(batch, objects, start // self.batch_size)
+            metrics.increment("files_loaded", len(batch))
+        return len(keys)
+
+    def load_batch(self, keys, objects, index=0):
+        """
+        Copies a batch of files into the staging table and merges it into the target
+        table, recording the files as loaded, all in one transaction.
+
+        :param keys: Keys of the files to load
+        :param objects: A dict mapping the key of every landed object to its ETag
+        :param index: Position of the batch within the run (default is 0)
+        """
+        loaded_at = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+        try:
+            with self.connection, self.connection.cursor() as cursor:
+                cursor.execute(CREATE_STAGING)
+                cursor.execute(CREATE_LOADED_STAGING)
+                self._copy(cursor, keys, index)
+                for statement in MERGE_STATEMENTS:
+                    cursor.execute(statement)
+                logger.info("Merged %d rows from %d files.", cursor.rowcount, len(keys))
+                self._insert_values(
+                    cursor, INSERT_LOADED_STAGING, [(key, objects[key], loaded_at) for key in keys]
+                )
+                for statement in RECORD_LOADED_STATEMENTS:
+                    cursor.execute(statement)
+        except self.connection.Error as e:
+            raise self.LoadError(f"Error loading batch {index}: {e}") from e
+
+    def write_manifest(self, keys, index=0):
+        """
+        Writes the COPY manifest of a batch of files to the bucket.
+
+        :param keys: Keys of the files in the batch
+        :param index: Position of the batch within the run (default is 0)
+        :return: The S3 URL of the manifest
+        """
+        manifest = {
+            "entries": [
+                {"url": f"s3://{self.bucket_name}/{key}", "mandatory": True} for key in keys
+            ]
+        }
+        filename = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{index:04}.manifest"
+        if not self.s3_conn.upload_file(
+            bucket_name=self.bucket_name,
+            filename=filename,
+            file=json.dumps(manifest).encode(),
+            folder=self.manifest_folder,
+        ):
+            raise self.LoadError(f"Error writing COPY manifest {filename}.")
+        return f"s3://{self.bucket_name}/{self.manifest_folder}{filename}"
+
+    def close(self):
+        """
+        Closes the warehouse connection.
+        """
+        self.connection.close()
+
+    def _copy(self, cursor, keys, index):
+        cursor.execute(COPY_FROM_MANIFEST, (self.write_manifest(keys, index), self.iam_role))
+
+    def _execute(self, *statements):
+        try:
+            with self.connection, self.connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+        except self.connection.Error as e:
+            raise self.LoadError(f"Error preparing the warehouse: {e}") from e
+
+    @staticmethod
+    def _insert_values(cursor, statement, rows):
+        from psycopg2.extras import execute_values
+
+        execute_values(cursor, statement, rows, page_size=len(rows) or 1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PostgresLoader(RedshiftLoader):
+    """
+    Loads the landed files into PostgreSQL, a local stand-in for Redshift. PostgreSQL
+    cannot COPY from S3, so each file of a batch is streamed from the bucket into the
+    staging table with COPY FROM STDIN instead; staging, merging and tracking the loaded
+    files work exactly as on Redshift.
+    """
+
+    create_target = CREATE_TARGET_POSTGRES
+
+    def _copy(self, cursor, keys, index):
+        for key in keys:
+            body = self.s3_conn.open_object(self.bucket_name, key)
+            try:
+                cursor.copy_expert(COPY_FROM_STDIN, body)
+            finally:
+                body.close()
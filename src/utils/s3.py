@@ -1,16 +1,100 @@
 """AWS S3 Connection Module"""
 
+import asyncio
+import base64
+import functools
+import hashlib
 import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-import boto3
-from botocore.exceptions import ClientError
+from botocore.exceptions import BotoCoreError, ClientError
 from dotenv import load_dotenv
 
+# S3 clients are shared by every S3Buckets of the process with the same credentials, region
+# and pool size, and are only built when first used.
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def shared_client(secret, access, region=None, max_pool_connections=10):
+    """
+    Returns the S3 client of a set of credentials, region and pool size, building it on
+    first use. boto3 is imported here, since importing it and building a client takes a
+    few hundred milliseconds that a run which never reaches S3 should not pay.
+
+    :param secret: User's AWS secret key, or None to read ACCESS_SECRET from the environment
+    :param access: User's AWS access key, or None to read ACCESS_KEY from the environment
+    :param region: AWS region of the client (default is None, AWS assigns one)
+    :param max_pool_connections: Size of the client's HTTP connection pool (default is 10)
+    :return: The boto3 S3 client
+    """
+    import boto3
+    from botocore.config import Config
+
+    key = (secret, access, region, max_pool_connections)
+    with _clients_lock:
+        if key not in _clients:
+            if secret is None and access is None:
+                load_dotenv()
+                secret = os.getenv("ACCESS_SECRET")
+                access = os.getenv("ACCESS_KEY")
+            kwargs = {} if region is None else {"region_name": region}
+            _clients[key] = boto3.client(
+                "s3",
+                aws_access_key_id=access,
+                aws_secret_access_key=secret,
+                config=Config(max_pool_connections=max_pool_connections),
+                **kwargs,
+            )
+        return _clients[key]
+
+
+def content_md5(body):
+    """
+    Computes the Content-MD5 header of a request body, the base64 MD5 digest S3 checks the
+    body it receives against, so a payload corrupted in transit is rejected, not stored.
+
+    :param body: The bytes of the request body
+    :return: The header value
+    """
+    return base64.b64encode(hashlib.md5(body, usedforsecurity=False).digest()).decode()
+
+
+def object_etag(body, part_size=None):
+    """
+    Computes the ETag S3 gives an object holding a body, to tell whether a stored object
+    already holds it without downloading the object. An object written with a single put
+    has the hex MD5 digest of its bytes as its ETag. An object written in parts has the
+    MD5 digest of the concatenated MD5 digests of its parts, followed by the number of
+    parts, so the part size it was uploaded with must be known. Objects encrypted with
+    SSE-KMS have other ETags, and never match.
+
+    :param body: The bytes of the object
+    :param part_size: Size of every part but the last, if the object was written as a
+    multipart upload once it reached that size (default is None, a single put)
+    :return: The ETag, without quotes
+    """
+    if part_size is None or len(body) < part_size:
+        return hashlib.md5(body, usedforsecurity=False).hexdigest()
+    digests = b"".join(
+        hashlib.md5(body[start : start + part_size], usedforsecurity=False).digest()
+        for start in range(0, len(body), part_size)
+    )
+    parts = -(-len(body) // part_size)
+    return f"{hashlib.md5(digests, usedforsecurity=False).hexdigest()}-{parts}"
+
 
 class S3Buckets:
+    class S3ConnectionError(Exception):
+        """Raised when S3 cannot be reached or refuses a request."""
+
+    class S3UploadError(Exception):
+        """Raised when an object cannot be written to S3."""
+
     @classmethod
-    def credentials(cls, region=None):
+    def credentials(cls, region=None, max_pool_connections=10):
         """
         Retrieves AWS credentials from a hidden environment file.
 
@@ -19,41 +103,53 @@ class S3Buckets:
         If a region is specified, the methods within the S3Buckets class will
         execute in that region.
         Otherwise, AWS will assign a default region.
+        The environment file is only read when the client is first used, so creating the
+        instance at import time costs nothing and needs no credentials.
 
         :param region: AWS region specified by the user (default is None)
+        :param max_pool_connections: Size of the client's HTTP connection pool (default is 10)
         :return: An instance of the S3Buckets class initialized with the user's
         credentials and specified region
         """
-        load_dotenv()
-        secret = os.getenv("ACCESS_SECRET")
-        access = os.getenv("ACCESS_KEY")
-
-        return cls(secret, access, region)
+        return cls(None, None, region, max_pool_connections)
 
-    def __init__(self, secret, access, region):
+    def __init__(self, secret, access, region, max_pool_connections=10):
         """
-        Initializes the S3Buckets class with user credentials and creates the AWS S3 client.
+        Initializes the S3Buckets class with user credentials.
 
         This constructor method initializes the S3Buckets class using the provided secret
         and access keys.
-        It creates an AWS S3 client using the boto3 library. If no region is specified,
-        AWS assigns a default
-        region. The created client is available for subsequent methods within the class.
+        The AWS S3 client is created with the boto3 library when first used, and shared
+        with every other instance of the same credentials, region and pool size. If no
+        region is specified, AWS assigns a default region.
 
-        :param secret: User's AWS secret key loaded from the environment file
-        :param access: User's AWS access key loaded from the environment file
+        :param secret: User's AWS secret key loaded from the environment file, or None to
+        read it from the environment file when the client is first used
+        :param access: User's AWS access key loaded from the environment file, or None to
+        read it from the environment file when the client is first used
         :param region: Specified AWS region during instantiation (default is None)
+        :param max_pool_connections: Size of the client's HTTP connection pool. Match it to
+        the number of threads sharing the client (default is 10)
         """
-        if region is None:
-            self.client = boto3.client("s3", aws_access_key_id=access, aws_secret_access_key=secret)
-        else:
+        self.secret = secret
+        self.access = access
+        self.region = region
+        self.max_pool_connections = max_pool_connections
+        self._client = None
+        if region is not None:
             self.location = {"LocationConstraint": region}
-            self.client = boto3.client(
-                "s3",
-                aws_access_key_id=access,
-                aws_secret_access_key=secret,
-                region_name=region,
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = shared_client(
+                self.secret, self.access, self.region, self.max_pool_connections
             )
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
 
     def list_buckets(self):
         """
@@ -103,34 +199,49 @@ class S3Buckets:
         - Error: If there's an error during the list retrieval."""
 
         try:
-            response = self.client.list_objects_v2(Bucket=bucket_name, Prefix=folder)
-            if "Contents" in response:
-                files = [item["Key"] for item in response["Contents"]]
-                logging.info(f"Files retrieved successfully from {bucket_name}/{folder}")
-                return files
-            else:
-                logging.info(f"No files found in {bucket_name}/{folder}")
-                return []
-        except ClientError as e:
+            files = list(self.list_objects(bucket_name=bucket_name, folder=folder))
+        except self.S3ConnectionError as e:
             logging.error(f"Error retrieving file list from S3: {str(e)}")
             return []
-        except KeyError as e:
-            logging.error(f"KeyError occurred: {str(e)}")
-            return []
-        except TypeError as e:
-            logging.error(f"TypeError occurred: {str(e)}")
-            return []
+        if files:
+            logging.info(f"Files retrieved successfully from {bucket_name}/{folder}")
+        else:
+            logging.info(f"No files found in {bucket_name}/{folder}")
+        return files
+
+    def list_objects(self, bucket_name, folder=""):
+        """
+        Lists every object under a prefix of an S3 bucket together with its ETag.
+        The listing is paginated, so prefixes holding more than 1,000 keys are complete.
+        Parameters:
+        - bucket_name (str): The name of the S3 bucket.
+        - folder (str, optional): The folder path within the S3 bucket. Default is an empty string.
+
+        Returns: dict: A mapping of object key to ETag for the specified bucket and folder.
+
+        Raises:
+        - S3ConnectionError: If the listing fails part way through.
+        """
+        paginator = self.client.get_paginator("list_objects_v2")
+        objects = {}
+        try:
+            for page in paginator.paginate(Bucket=bucket_name, Prefix=folder):
+                for item in page.get("Contents", []):
+                    objects[item["Key"]] = item["ETag"].strip('"')
+        except (ClientError, BotoCoreError) as e:
+            raise self.S3ConnectionError(str(e)) from e
+        return objects
 
     def upload_file(self, bucket_name, filename, file, folder=""):
         """
-        Uploads a file to an S3 bucket.
+        Uploads a file to an S3 bucket, with the Content-MD5 header of its contents.
         Parameters:
         - bucket_name (str): The name of the target S3 bucket.
         - filename (str): The name of the file to be uploaded.
-        - file (io.BytesIO): The file object to be uploaded.
+        - file (bytes | io.BytesIO): The contents or file object to be uploaded.
         - folder (str, optional): The folder path within the S3 bucket. Default is an empty string.
 
-        Returns: None
+        Returns: bool: True if the file was uploaded, False otherwise.
 
         Logs:
         - Info: On successful upload of the file.
@@ -138,15 +249,282 @@ class S3Buckets:
         - Error: If an unexpected error occurs.
         """
         try:
+            body = file if isinstance(file, bytes) else file.getvalue()
+            if isinstance(body, str):
+                body = body.encode()
             self.client.put_object(
-                Bucket=bucket_name, Key=f"{folder}{filename}", Body=file.getvalue()
+                Bucket=bucket_name,
+                Key=f"{folder}{filename}",
+                Body=body,
+                ContentMD5=content_md5(body),
             )
-            logging.info(f"File {filename} uploaded successfully to {bucket_name}/{folder}")
-        except ClientError as e:
-            logging.error(f"Error uploading file to S3: {str(e)}")
+            logging.info("File %s uploaded successfully to %s/%s", filename, bucket_name, folder)
+            return True
+        except (ClientError, BotoCoreError) as e:
+            logging.error("Error uploading file to S3: %s", e)
         except OSError as e:
-            logging.error(f"OS error occurred while uploading file to S3: {str(e)}")
+            logging.error("OS error occurred while uploading file to S3: %s", e)
         except ValueError as e:
-            logging.error(f"Value error occurred while uploading file to S3: {str(e)}")
-        except boto3.exceptions.S3UploadFailedError as e:
-            logging.error(f"S3 upload failed: {str(e)}")
+            logging.error("Value error occurred while uploading file to S3: %s", e)
+        return False
+
+    def open_object(self, bucket_name, key):
+        """
+        Opens an object of an S3 bucket for reading, without downloading it up front.
+        Parameters:
+        - bucket_name (str): The name of the S3 bucket.
+        - key (str): The key of the object.
+
+        Returns: botocore.response.StreamingBody: A file-like stream of the object's bytes.
+
+        Raises:
+        - S3ConnectionError: If the object cannot be read.
+        """
+        try:
+            response = self.client.get_object(Bucket=bucket_name, Key=key)
+        except (ClientError, BotoCoreError) as e:
+            raise self.S3ConnectionError(str(e)) from e
+        return response["Body"]
+
+    def read_object(self, bucket_name, key):
+        """
+        Downloads an object of an S3 bucket.
+        Parameters:
+        - bucket_name (str): The name of the S3 bucket.
+        - key (str): The key of the object.
+
+        Returns: bytes: The contents of the object.
+
+        Raises:
+        - S3ConnectionError: If the object cannot be read.
+        """
+        body = self.open_object(bucket_name, key)
+        try:
+            return body.read()
+        except (ClientError, BotoCoreError, OSError) as e:
+            raise self.S3ConnectionError(str(e)) from e
+        finally:
+            body.close()
+
+    def delete_objects(self, bucket_name, keys):
+        """
+        Deletes objects of an S3 bucket, up to 1,000 keys per request.
+        Parameters:
+        - bucket_name (str): The name of the S3 bucket.
+        - keys (list[str]): The keys of the objects to delete.
+
+        Returns: None
+
+        Raises:
+        - S3ConnectionError: If a request fails or an object cannot be deleted.
+        """
+        keys = list(keys)
+        for start in range(0, len(keys), 1000):
+            batch = [{"Key": key} for key in keys[start : start + 1000]]
+            try:
+                response = self.client.delete_objects(
+                    Bucket=bucket_name, Delete={"Objects": batch, "Quiet": True}
+                )
+            except (ClientError, BotoCoreError) as e:
+                raise self.S3ConnectionError(str(e)) from e
+            if response.get("Errors"):
+                raise self.S3ConnectionError(f"Failed to delete {response['Errors']}")
+
+    def create_multipart_upload(self, bucket_name, key):
+        """
+        Starts a multipart upload.
+        Parameters:
+        - bucket_name (str): The name of the target S3 bucket.
+        - key (str): The key of the object to be uploaded.
+
+        Returns: str: The ID of the new multipart upload.
+
+        Raises:
+        - S3UploadError: If the upload cannot be started.
+        """
+        try:
+            response = self.client.create_multipart_upload(Bucket=bucket_name, Key=key)
+        except (ClientError, BotoCoreError) as e:
+            raise self.S3UploadError(str(e)) from e
+        return response["UploadId"]
+
+    def upload_part(self, bucket_name, key, upload_id, part_number, body):
+        """
+        Uploads one part of a multipart upload, with the Content-MD5 header of its contents.
+        Parameters:
+        - bucket_name (str): The name of the target S3 bucket.
+        - key (str): The key of the object being uploaded.
+        - upload_id (str): The ID of the multipart upload.
+        - part_number (int): The one-based position of the part in the object.
+        - body (bytes | bytearray): The contents of the part.
+
+        Returns: dict: The part descriptor expected by complete_multipart_upload.
+
+        Raises:
+        - S3UploadError: If the part cannot be uploaded.
+        """
+        try:
+            response = self.client.upload_part(
+                Bucket=bucket_name,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=body,
+                ContentMD5=content_md5(body),
+            )
+        except (ClientError, BotoCoreError) as e:
+            raise self.S3UploadError(str(e)) from e
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+    def complete_multipart_upload(self, bucket_name, key, upload_id, parts):
+        """
+        Completes a multipart upload, making the object visible.
+        Parameters:
+        - bucket_name (str): The name of the target S3 bucket.
+        - key (str): The key of the object being uploaded.
+        - upload_id (str): The ID of the multipart upload.
+        - parts (list): The part descriptors returned by upload_part, in order.
+
+        Returns: None
+
+        Raises:
+        - S3UploadError: If the upload cannot be completed.
+        """
+        try:
+            self.client.complete_multipart_upload(
+                Bucket=bucket_name,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except (ClientError, BotoCoreError) as e:
+            raise self.S3UploadError(str(e)) from e
+
+    def abort_multipart_upload(self, bucket_name, key, upload_id):
+        """
+        Aborts a multipart upload so that its parts stop being stored.
+        Parameters:
+        - bucket_name (str): The name of the target S3 bucket.
+        - key (str): The key of the object being uploaded.
+        - upload_id (str): The ID of the multipart upload.
+
+        Returns: None
+
+        Logs:
+        - Error: If the upload cannot be aborted.
+        """
+        try:
+            self.client.abort_multipart_upload(Bucket=bucket_name, Key=key, UploadId=upload_id)
+        except (ClientError, BotoCoreError) as e:
+            logging.error("Error aborting multipart upload of %s: %s", key, e)
+
+
+class AsyncS3Buckets:
+    S3ConnectionError = S3Buckets.S3ConnectionError
+    S3UploadError = S3Buckets.S3UploadError
+
+    def __init__(self, s3_conn, max_workers=10):
+        """
+        Wraps an S3Buckets connection with an awaitable API for use from asyncio code.
+
+        Every boto3 call runs on a dedicated thread pool, so S3 round trips never block
+        the event loop. Size the pool to the connection's `max_pool_connections`, so that
+        each thread can hold its own pooled HTTP connection.
+
+        :param s3_conn: The S3Buckets connection whose client is shared by the pool
+        :param max_workers: Number of threads running S3 calls at once (default is 10)
+        """
+        self.s3_conn = s3_conn
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="s3")
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def list_objects(self, bucket_name, folder=""):
+        """
+        Awaitable version of S3Buckets.list_objects.
+        """
+        return await self._run(self.s3_conn.list_objects, bucket_name=bucket_name, folder=folder)
+
+    async def upload_file(self, bucket_name, filename, file, folder=""):
+        """
+        Awaitable version of S3Buckets.upload_file.
+        """
+        return await self._run(
+            self.s3_conn.upload_file,
+            bucket_name=bucket_name,
+            filename=filename,
+            file=file,
+            folder=folder,
+        )
+
+    async def read_object(self, bucket_name, key):
+        """
+        Awaitable version of S3Buckets.read_object.
+        """
+        return await self._run(self.s3_conn.read_object, bucket_name, key)
+
+    async def iter_object(self, bucket_name, key, chunk_size=1024 * 1024):
+        """
+        Reads an object of an S3 bucket chunk by chunk, each read running on the thread
+        pool, so the object is never held in memory whole.
+
+        :param bucket_name: Name of the S3 bucket
+        :param key: Key of the object
+        :param chunk_size: Largest number of bytes read at once (default is 1 MiB)
+        :return: An async iterator over the chunks of the object
+        :raises S3ConnectionError: If the object cannot be read
+        """
+        body = await self._run(self.s3_conn.open_object, bucket_name, key)
+        try:
+            while True:
+                try:
+                    chunk = await self._run(body.read, chunk_size)
+                except (ClientError, BotoCoreError, OSError) as e:
+                    raise self.S3ConnectionError(str(e)) from e
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            body.close()
+
+    async def delete_objects(self, bucket_name, keys):
+        """
+        Awaitable version of S3Buckets.delete_objects.
+        """
+        return await self._run(self.s3_conn.delete_objects, bucket_name, keys)
+
+    async def create_multipart_upload(self, bucket_name, key):
+        """
+        Awaitable version of S3Buckets.create_multipart_upload.
+        """
+        return await self._run(self.s3_conn.create_multipart_upload, bucket_name, key)
+
+    async def upload_part(self, bucket_name, key, upload_id, part_number, body):
+        """
+        Awaitable version of S3Buckets.upload_part.
+        """
+        return await self._run(
+            self.s3_conn.upload_part, bucket_name, key, upload_id, part_number, body
+        )
+
+    async def complete_multipart_upload(self, bucket_name, key, upload_id, parts):
+        """
+        Awaitable version of S3Buckets.complete_multipart_upload.
+        """
+        return await self._run(
+            self.s3_conn.complete_multipart_upload, bucket_name, key, upload_id, parts
+        )
+
+    async def abort_multipart_upload(self, bucket_name, key, upload_id):
+        """
+        Awaitable version of S3Buckets.abort_multipart_upload.
+        """
+        return await self._run(self.s3_conn.abort_multipart_upload, bucket_name, key, upload_id)
+
+    def close(self):
+        """
+        Waits for pending S3 calls to finish and stops the thread pool.
+        """
+        self.executor.shutdown(wait=True)
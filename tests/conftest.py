@@ -0,0 +1,42 @@
+"""Shared Test Fixtures."""
+
+import pytest
+
+from benchmarks.fake_s3 import FakeS3Client
+from benchmarks.server import SyntheticAEMO
+from src.utils.metrics import metrics
+from src.utils.s3 import AsyncS3Buckets, S3Buckets
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest.fixture
+def fake_s3():
+    return FakeS3Client()
+
+
+@pytest.fixture
+def s3_conn(fake_s3):
+    conn = S3Buckets(None, None, None)
+    conn.client = fake_s3
+    return conn
+
+
+@pytest.fixture
+def async_s3(s3_conn):
+    s3 = AsyncS3Buckets(s3_conn, max_workers=4)
+    yield s3
+    s3.close()
+
+
+@pytest.fixture
+def aemo():
+    server = SyntheticAEMO(last_year=2020)
+    base_url = server.start_in_thread()
+    yield server, base_url
+    server.stop_thread()
@@ -0,0 +1,210 @@
+"""Monthly File Compaction Tests."""
+
+import asyncio
+import json
+
+import pytest
+
+from benchmarks.server import synthetic_csv
+from src.etl import compaction
+from src.etl.compaction import (
+    HEADER,
+    compact_folder,
+    compacted_folder,
+    dataset_name,
+    group_sources,
+    interval_month,
+    manifest_key,
+    month_rows,
+    settlement,
+)
+from src.utils.metrics import metrics
+
+BUCKET_NAME = "test-bucket"
+FOLDER = "Energy_Price_Demand/"
+OUTPUT = compacted_folder(FOLDER)
+
+
+def land(fake_s3, region, year, month, body=None):
+    name = f"PRICE_AND_DEMAND_{year}{month:02}_{region}.csv"
+    fake_s3.put_object(Bucket=BUCKET_NAME, Key=f"{FOLDER}{name}", Body=body or synthetic_csv(name))
+
+
+def expected(*bodies):
+    rows = {}
+    for body in bodies:
+        for line in month_rows(body):
+            rows.setdefault(settlement(line), line)
+    return HEADER + b"".join(rows[settled] for settled in sorted(rows))
+
+
+def compact(async_s3, partition_by="region", output_folder=OUTPUT):
+    return asyncio.run(
+        compact_folder(
+            async_s3, BUCKET_NAME, FOLDER, output_folder, partition_by, part_size=5 * 1024 * 1024
+        )
+    )
+
+
+@pytest.mark.unit
+def test_interval_month_counts_midnight_on_the_first_as_the_month_before():
+    assert interval_month(b"2024/02/01 00:00:00") == (2024, 1)
+    assert interval_month(b"2024/01/01 00:00:00") == (2023, 12)
+    assert interval_month(b"2024/02/01 00:05:00") == (2024, 2)
+
+
+@pytest.mark.unit
+def test_month_rows_sorts_rows_and_rejects_other_columns():
+    body = HEADER + b"NSW1,2024/01/01 01:00:00,1,1,TRADE\r\nNSW1,2024/01/01 00:30:00,1,1,TRADE\r\n"
+    assert [settlement(line) for line in month_rows(body)] == [
+        b"2024/01/01 00:30:00",
+        b"2024/01/01 01:00:00",
+    ]
+    with pytest.raises(ValueError, match="Unexpected columns"):
+        month_rows(b"REGION,RRP\nNSW1,1\n")
+
+
+@pytest.mark.unit
+def test_month_rows_rejects_rows_without_a_readable_settlement_time():
+    row = b"NSW1,2024/01/01 00:30:00,1,1,TRADE\n"
+    with pytest.raises(ValueError, match="without a settlement time"):
+        month_rows(HEADER + row + b"NSW1\n")
+    with pytest.raises(ValueError, match="Unreadable settlement time in row 2"):
+        month_rows(HEADER + row + b"NSW1,2024/01/01 01:\n")
+
+
+@pytest.mark.unit
+def test_group_sources_names_a_dataset_per_partition():
+    objects = {
+        f"{FOLDER}PRICE_AND_DEMAND_202001_NSW1.csv": "a",
+        f"{FOLDER}PRICE_AND_DEMAND_202101_NSW1.csv": "b",
+        f"{FOLDER}region=NSW1/year=2020/month=01/part.parquet": "c",
+        f"{FOLDER}nested/PRICE_AND_DEMAND_202001_VIC1.csv": "d",
+    }
+    assert group_sources(objects, FOLDER, "region") == {
+        "PRICE_AND_DEMAND_NSW1.csv": {
+            f"{FOLDER}PRICE_AND_DEMAND_202001_NSW1.csv": "a",
+            f"{FOLDER}PRICE_AND_DEMAND_202101_NSW1.csv": "b",
+        }
+    }
+    assert set(group_sources(objects, FOLDER, "year")) == {
+        dataset_name("NSW1", 2020, "year"),
+        dataset_name("NSW1", 2021, "year"),
+    }
+
+
+@pytest.mark.integration
+def test_compaction_merges_months_into_one_sorted_dataset_per_region(async_s3, fake_s3):
+    for region in ("NSW1", "VIC1"):
+        for month in (3, 1, 2):
+            land(fake_s3, region, 2020, month)
+    # The last interval of January published again, differently, in February's file.
+    february = synthetic_csv("PRICE_AND_DEMAND_202002_NSW1.csv")
+    overlap = b"NSW1,2020/02/01 00:00:00,1.00,1.00,TRADE\n"
+    land(fake_s3, "NSW1", 2020, 2, february + overlap)
+    assert compact(async_s3) == 2
+    dataset = fake_s3.objects[(BUCKET_NAME, f"{OUTPUT}PRICE_AND_DEMAND_NSW1.csv")]
+    months = [synthetic_csv(f"PRICE_AND_DEMAND_2020{month:02}_NSW1.csv") for month in (1, 2, 3)]
+    assert dataset == expected(*months)
+    assert overlap not in dataset
+    assert metrics.counters["duplicate_rows"] == 1
+    manifest = json.loads(fake_s3.objects[(BUCKET_NAME, manifest_key(OUTPUT))])
+    assert manifest["PRICE_AND_DEMAND_NSW1.csv"]["rows"] == dataset.count(b"\n") - 1
+
+
+@pytest.mark.integration
+def test_an_unreadable_month_is_left_out(async_s3, fake_s3):
+    land(fake_s3, "SA1", 2020, 1)
+    land(fake_s3, "SA1", 2020, 2, b"<html>maintenance</html>\n")
+    assert compact(async_s3) == 1
+    dataset = fake_s3.objects[(BUCKET_NAME, f"{OUTPUT}PRICE_AND_DEMAND_SA1.csv")]
+    assert dataset == expected(synthetic_csv("PRICE_AND_DEMAND_202001_SA1.csv"))
+    assert metrics.counters["unreadable_files"] == 1
+
+
+@pytest.mark.integration
+def test_run_compaction_rejects_unknown_partitions(monkeypatch, s3_conn):
+    monkeypatch.setattr(compaction, "s3_conn", s3_conn)
+    with pytest.raises(ValueError, match="Unknown partitioning"):
+        asyncio.run(compaction.run_compaction(BUCKET_NAME, FOLDER, partition_by="month"))
+
+
+@pytest.mark.integration
+def test_a_month_with_a_short_row_is_left_out(async_s3, fake_s3):
+    land(fake_s3, "SA1", 2020, 1)
+    land(fake_s3, "SA1", 2020, 2, synthetic_csv("PRICE_AND_DEMAND_202002_SA1.csv") + b"SA1\n")
+    assert compact(async_s3) == 1
+    dataset = fake_s3.objects[(BUCKET_NAME, f"{OUTPUT}PRICE_AND_DEMAND_SA1.csv")]
+    assert dataset == expected(synthetic_csv("PRICE_AND_DEMAND_202001_SA1.csv"))
+    assert metrics.counters["unreadable_files"] == 1
+
+
+@pytest.mark.integration
+def test_changed_and_new_months_are_spliced_into_the_dataset(async_s3, fake_s3):
+    for month in (1, 2, 3):
+        land(fake_s3, "NSW1", 2020, month)
+    assert compact(async_s3) == 1
+    revised = synthetic_csv("PRICE_AND_DEMAND_202002_NSW1.csv").replace(b",TRADE", b",REVISED")
+    land(fake_s3, "NSW1", 2020, 2, revised)
+    land(fake_s3, "NSW1", 2020, 4)
+    metrics.reset()
+    assert compact(async_s3) == 1
+    assert metrics.counters["files_merged"] == 2
+    dataset = fake_s3.objects[(BUCKET_NAME, f"{OUTPUT}PRICE_AND_DEMAND_NSW1.csv")]
+    january, march, april = (
+        synthetic_csv(f"PRICE_AND_DEMAND_2020{month:02}_NSW1.csv") for month in (1, 3, 4)
+    )
+    assert dataset == expected(january, revised, march, april)
+
+
+@pytest.mark.integration
+def test_an_unchanged_folder_is_not_compacted_again(async_s3, fake_s3):
+    for region in ("NSW1", "VIC1"):
+        land(fake_s3, region, 2020, 1)
+    assert compact(async_s3) == 2
+    objects = dict(fake_s3.objects)
+    calls = dict(fake_s3.calls)
+    metrics.reset()
+    assert compact(async_s3) == 0
+    assert metrics.counters["datasets_unchanged"] == 2
+    assert fake_s3.objects == objects
+    assert fake_s3.calls.get("put_object") == calls.get("put_object")
+    # Only the manifest is read.
+    assert fake_s3.calls["get_object"] == calls["get_object"] + 1
+
+
+@pytest.mark.integration
+def test_year_partitions_hold_the_intervals_of_one_year(async_s3, fake_s3):
+    output = compacted_folder(FOLDER, "year")
+    land(fake_s3, "QLD1", 2020, 12)
+    land(fake_s3, "QLD1", 2021, 1)
+    assert compact(async_s3, "year", output) == 2
+    for year, month in ((2020, 12), (2021, 1)):
+        name = dataset_name("QLD1", year, "year")
+        body = synthetic_csv(f"PRICE_AND_DEMAND_{year}{month:02}_QLD1.csv")
+        assert fake_s3.objects[(BUCKET_NAME, f"{output}{name}")] == expected(body)
+    assert set(json.loads(fake_s3.objects[(BUCKET_NAME, manifest_key(output))])) == {
+        dataset_name("QLD1", 2020, "year"),
+        dataset_name("QLD1", 2021, "year"),
+    }
+
+
+@pytest.mark.integration
+def test_a_malformed_row_of_the_dataset_is_left_out_when_splicing(async_s3, fake_s3, s3_conn):
+    land(fake_s3, "TAS1", 2020, 1)
+    assert compact(async_s3) == 1
+    name = "PRICE_AND_DEMAND_TAS1.csv"
+    key = f"{OUTPUT}{name}"
+    fake_s3.put_object(
+        Bucket=BUCKET_NAME, Key=key, Body=fake_s3.objects[(BUCKET_NAME, key)] + b"TAS1\n"
+    )
+    manifest = json.loads(fake_s3.objects[(BUCKET_NAME, manifest_key(OUTPUT))])
+    manifest[name]["etag"] = s3_conn.list_objects(BUCKET_NAME, OUTPUT)[key]
+    fake_s3.put_object(Bucket=BUCKET_NAME, Key=manifest_key(OUTPUT), Body=json.dumps(manifest))
+    land(fake_s3, "TAS1", 2020, 2)
+    metrics.reset()
+    assert compact(async_s3) == 1
+    assert metrics.counters["files_merged"] == 1
+    assert metrics.counters["malformed_rows"] == 1
+    months = [synthetic_csv(f"PRICE_AND_DEMAND_2020{month:02}_TAS1.csv") for month in (1, 2)]
+    assert fake_s3.objects[(BUCKET_NAME, key)] == expected(*months)
@@ -0,0 +1,263 @@
+"""Data Extraction Pipeline Tests."""
+
+import asyncio
+import contextlib
+import functools
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks import server as synthetic_server
+from benchmarks.server import synthetic_csv
+from src.etl import extract, manifest
+from src.etl.extract import ExtractionSettings, parse_args, run_data_extraction
+from src.etl.http_cache import ValidatorCache
+from src.utils.dynamo import FAILED, FETCHED, UPLOADED, LeaseTable, SQLiteLedger
+from src.utils.metrics import metrics
+
+BUCKET_NAME = "test-bucket"
+FOLDER = "Energy_Price_Demand/"
+PROVINCES = ["NSW", "VIC"]
+# December 1998 to December 2000, for each province.
+FILES_PER_RUN = 2 * 25
+
+
+@pytest.fixture
+def settings(aemo, s3_conn, monkeypatch, tmp_path):
+    monkeypatch.setattr(extract, "s3_conn", s3_conn)
+    _, base_url = aemo
+
+    def build(**kwargs):
+        return ExtractionSettings(
+            **{
+                "base_url": base_url,
+                "bucket_name": BUCKET_NAME,
+                "current_year": 2000,
+                "months": range(1, 13),
+                "provinces": PROVINCES,
+                "folder": FOLDER,
+                "concurrency": 4,
+                "raw": True,
+                "negative_cache_path": str(tmp_path / "negative_cache.json"),
+                "validator_cache_path": str(tmp_path / "validator_cache.json"),
+                **kwargs,
+            }
+        )
+
+    return build
+
+
+class LosingLeaseTable(LeaseTable):
+    def __init__(self, *args, **kwargs):
+        """
+        Keeps leases in memory, but loses the lease on the first batch it renews, as if
+        another worker had taken it over.
+        """
+        super().__init__(*args, **kwargs)
+        self.lost = None
+
+    def renew(self, batch):
+        if self.lost is None:
+            self.lost = batch
+            return False
+        return super().renew(batch)
+
+
+def landed(fake_s3):
+    return {key: body for (_, key), body in fake_s3.objects.items() if key.startswith(FOLDER)}
+
+
+@pytest.mark.integration
+def test_a_run_lands_every_published_file_once(settings, aemo, fake_s3):
+    server, _ = aemo
+    asyncio.run(run_data_extraction(settings()))
+    files = landed(fake_s3)
+    assert len(files) == FILES_PER_RUN
+    name = "PRICE_AND_DEMAND_199812_NSW1.csv"
+    assert files[f"{FOLDER}{name}"] == synthetic_csv(name)
+    assert metrics.counters["files_uploaded"] == FILES_PER_RUN
+    requests = server.requests
+    asyncio.run(run_data_extraction(settings()))
+    assert server.requests == requests
+    assert metrics.counters.get("files_uploaded", 0) == 0
+
+
+@pytest.mark.integration
+def test_a_blank_file_fails_without_stopping_the_run(settings, fake_s3, monkeypatch, tmp_path):
+    blank = "PRICE_AND_DEMAND_199902_NSW1.csv"
+    monkeypatch.setattr(
+        synthetic_server,
+        "synthetic_csv",
+        lambda name, *args: b"\n\n\n" if name == blank else synthetic_csv(name, *args),
+    )
+    path = str(tmp_path / "ledger.db")
+    asyncio.run(
+        run_data_extraction(
+            settings(raw=False, transform_workers=1, provinces=["NSW"], ledger_path=path)
+        )
+    )
+    files = landed(fake_s3)
+    assert f"{FOLDER}{blank}" not in files
+    assert len(files) == FILES_PER_RUN // 2 - 1
+    ledger = SQLiteLedger(path).load()
+    assert ledger.items[next(url for url in ledger.items if url.endswith(blank))]["state"] == FAILED
+    ledger.close()
+
+
+@pytest.mark.integration
+def test_a_persisted_manifest_expires_across_runs(settings, fake_s3, monkeypatch, tmp_path):
+    clock = SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(manifest, "time", SimpleNamespace(time=lambda: clock.now))
+    build = functools.partial(
+        settings, manifest_path=str(tmp_path / "manifest.json"), manifest_max_age=60
+    )
+    asyncio.run(run_data_extraction(build()))
+    # Removed from the bucket outside the pipeline.
+    key = f"{FOLDER}PRICE_AND_DEMAND_199901_NSW1.csv"
+    del fake_s3.objects[(BUCKET_NAME, key)]
+    clock.now += 40
+    asyncio.run(run_data_extraction(build()))
+    assert key not in landed(fake_s3)
+    clock.now += 40
+    asyncio.run(run_data_extraction(build()))
+    assert key in landed(fake_s3)
+    assert fake_s3.calls["list_objects_v2"] == 2
+
+
+@pytest.mark.integration
+def test_a_dry_run_fetches_nothing(settings, aemo, fake_s3):
+    server, _ = aemo
+    asyncio.run(run_data_extraction(settings(dry_run=True)))
+    assert server.requests == 0
+    assert landed(fake_s3) == {}
+
+
+@pytest.mark.integration
+def test_an_incremental_run_only_transfers_changed_files(settings, aemo, fake_s3):
+    server, _ = aemo
+    asyncio.run(run_data_extraction(settings(incremental=True)))
+    sent = server.bytes_sent
+    asyncio.run(run_data_extraction(settings(incremental=True)))
+    assert server.bytes_sent == sent
+    assert metrics.counters["skipped_unchanged"] == FILES_PER_RUN
+
+
+@pytest.mark.integration
+def test_missing_files_are_not_requested_again(settings, aemo, fake_s3):
+    server, _ = aemo
+    asyncio.run(run_data_extraction(settings(current_year=2021, provinces=["NSW"])))
+    assert metrics.counters["not_found"] == 12
+    requests = server.requests
+    asyncio.run(run_data_extraction(settings(current_year=2021, provinces=["NSW"])))
+    assert server.requests == requests
+
+
+@pytest.mark.integration
+def test_the_ledger_records_every_landed_file(settings, fake_s3, tmp_path):
+    path = str(tmp_path / "ledger.db")
+    asyncio.run(run_data_extraction(settings(ledger_path=path)))
+    ledger = SQLiteLedger(path).load()
+    assert len(ledger.done()) == FILES_PER_RUN
+    assert {item["state"] for item in ledger.items.values()} == {UPLOADED}
+    ledger.close()
+
+
+@pytest.mark.integration
+def test_a_restarted_run_resumes_from_the_ledger(settings, aemo, fake_s3, tmp_path):
+    _, base_url = aemo
+    path = str(tmp_path / "ledger.db")
+    uploaded, failed, fetched = (f"{base_url}_1999{month:02}_NSW1.csv" for month in (1, 2, 3))
+    # The ledger a run that crashed part way through leaves behind.
+    with SQLiteLedger(path) as ledger:
+        ledger.complete(uploaded, "abc")
+        ledger.record(failed, FAILED, error="status code 500")
+        ledger.record(fetched, FETCHED)
+    asyncio.run(
+        run_data_extraction(settings(ledger_path=path, provinces=["NSW"], current_year=1999))
+    )
+    files = landed(fake_s3)
+    assert f"{FOLDER}PRICE_AND_DEMAND_199901_NSW1.csv" not in files
+    assert f"{FOLDER}PRICE_AND_DEMAND_199902_NSW1.csv" in files
+    assert f"{FOLDER}PRICE_AND_DEMAND_199903_NSW1.csv" in files
+    assert len(files) == 12
+    ledger = SQLiteLedger(path).load()
+    assert len(ledger.done()) == 13
+    assert ledger.items[uploaded]["checksum"] == "abc"
+    assert ledger.items[failed]["attempts"] == ledger.items[fetched]["attempts"] == 2
+    ledger.close()
+
+
+@pytest.mark.integration
+def test_a_batch_is_stopped_when_its_lease_is_lost_and_run_again(
+    settings, aemo, fake_s3, monkeypatch
+):
+    server, _ = aemo
+    server.latency = 0.2
+    leases = LosingLeaseTable("run", lease_seconds=0.3)
+    monkeypatch.setattr(extract, "open_leases", lambda *args, **kwargs: leases)
+    asyncio.run(run_data_extraction(settings(provinces=["NSW"], current_year=1999)))
+    assert leases.lost == "NSW/1998"
+    assert metrics.counters["batches_lost"] == 1
+    assert metrics.counters["batches_claimed"] == 3
+    assert len(landed(fake_s3)) == 13
+
+
+@pytest.mark.integration
+def test_a_cancelled_follow_run_keeps_its_caches(settings, fake_s3, monkeypatch, tmp_path):
+    paths = {name: str(tmp_path / f"{name}.json") for name in ("validators", "metrics", "tails")}
+    following = []
+
+    async def follow_until_cancelled(*args, **kwargs):
+        following.append(True)
+        await tail_follow(*args, **kwargs)
+
+    tail_follow = extract.follow
+    monkeypatch.setattr(extract, "follow", follow_until_cancelled)
+
+    async def main():
+        run = asyncio.create_task(
+            run_data_extraction(
+                settings(
+                    incremental=True,
+                    following=True,
+                    poll_seconds=0.05,
+                    validator_cache_path=paths["validators"],
+                    metrics_path=paths["metrics"],
+                    tail_state_path=paths["tails"],
+                )
+            )
+        )
+        while not following:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.2)
+        run.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await run
+
+    asyncio.run(main())
+    assert len(ValidatorCache.load(paths["validators"])) == FILES_PER_RUN
+    with open(paths["metrics"], encoding="utf-8") as f:
+        assert json.load(f)["counters"]["files_uploaded"] == FILES_PER_RUN
+
+
+@pytest.mark.integration
+def test_streamed_files_match_buffered_ones(settings, fake_s3):
+    asyncio.run(run_data_extraction(settings(stream=True, provinces=["NSW"])))
+    name = "PRICE_AND_DEMAND_200006_NSW1.csv"
+    assert landed(fake_s3)[f"{FOLDER}{name}"] == synthetic_csv(name)
+
+
+@pytest.mark.unit
+def test_settings_are_built_from_the_command_line():
+    args = parse_args(["--follow", "--part_size_mb", "6", "--format", "csv", "--stream"])
+    settings = ExtractionSettings.from_args(args)
+    assert settings.following
+    assert settings.stream
+    assert settings.part_size == 6 * 1024 * 1024
+
+
+@pytest.mark.unit
+def test_settings_reject_parquet_when_streaming():
+    with pytest.raises(ValueError, match="cannot be raw or streamed"):
+        ExtractionSettings.from_args(parse_args(["--stream", "--format", "parquet"]))
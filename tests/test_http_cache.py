@@ -0,0 +1,83 @@
+"""HTTP Validator Cache Tests."""
+
+import time
+
+import pytest
+
+from src.etl.http_cache import NegativeCache, ValidatorCache
+
+URL = "https://example.com/PRICE_AND_DEMAND_202401_NSW1.csv"
+HEADERS = {
+    "ETag": '"abc"',
+    "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT",
+    "Content-Length": "10",
+}
+
+
+@pytest.mark.unit
+def test_validators_are_only_sent_once_committed():
+    cache = ValidatorCache()
+    cache.stage(URL, HEADERS)
+    assert cache.conditional_headers(URL) == {}
+    cache.commit(URL)
+    assert cache.conditional_headers(URL) == {
+        "If-None-Match": '"abc"',
+        "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+    }
+
+
+@pytest.mark.unit
+def test_unchanged_prefers_the_etag():
+    cache = ValidatorCache({URL: {"etag": '"abc"', "last_modified": None}})
+    assert cache.unchanged(URL, {"ETag": '"abc"'})
+    assert not cache.unchanged(URL, {"ETag": '"def"'})
+    assert not cache.unchanged("https://example.com/other.csv", {"ETag": '"abc"'})
+
+
+@pytest.mark.unit
+def test_unchanged_falls_back_to_last_modified_and_length():
+    cache = ValidatorCache(
+        {URL: {"etag": None, "last_modified": HEADERS["Last-Modified"], "content_length": "10"}}
+    )
+    headers = {"Last-Modified": HEADERS["Last-Modified"], "Content-Length": "10"}
+    assert cache.unchanged(URL, headers)
+    assert not cache.unchanged(URL, {**headers, "Content-Length": "11"})
+    assert not cache.unchanged(URL, {})
+
+
+@pytest.mark.unit
+def test_validator_cache_round_trips_committed_entries_only(tmp_path):
+    path = str(tmp_path / "validators.json")
+    cache = ValidatorCache()
+    cache.stage(URL, HEADERS)
+    cache.commit(URL)
+    cache.stage("https://example.com/pending.csv", HEADERS)
+    cache.save(path)
+    loaded = ValidatorCache.load(path)
+    assert URL in loaded
+    assert len(loaded) == 1
+
+
+@pytest.mark.unit
+def test_validator_cache_load_without_a_file_is_empty(tmp_path):
+    assert len(ValidatorCache.load(str(tmp_path / "missing.json"))) == 0
+
+
+@pytest.mark.unit
+def test_negative_cache_entries_expire_after_the_ttl():
+    cache = NegativeCache({URL: time.time() - 120}, ttl=60)
+    assert URL not in cache
+    cache.add(URL)
+    assert URL in cache
+    cache.discard(URL)
+    assert URL not in cache
+
+
+@pytest.mark.unit
+def test_negative_cache_save_drops_expired_entries(tmp_path):
+    path = str(tmp_path / "missing.json")
+    cache = NegativeCache({"https://example.com/old.csv": time.time() - 120}, ttl=60)
+    cache.add(URL)
+    cache.save(path)
+    loaded = NegativeCache.load(path, ttl=60)
+    assert set(loaded.entries) == {URL}
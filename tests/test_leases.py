@@ -0,0 +1,138 @@
+"""Lease Table Tests."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from src.utils import dynamo
+from src.utils.dynamo import LeaseTable, SQLiteLeaseTable, open_leases
+
+BATCHES = ["NSW/2019", "NSW/2020", "VIC/2020"]
+
+
+@pytest.fixture
+def lease_path(tmp_path):
+    return str(tmp_path / "leases.db")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(dynamo, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+class CountingLeaseTable(SQLiteLeaseTable):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reads = 0
+        self.writes = 0
+
+    def _leases(self):
+        self.reads += 1
+        return super()._leases()
+
+    def _acquire(self, lease_id, now):
+        self.writes += 1
+        return super()._acquire(lease_id, now)
+
+
+@pytest.mark.unit
+def test_workers_claim_different_batches(lease_path):
+    first = SQLiteLeaseTable(lease_path, "run", owner="first")
+    second = SQLiteLeaseTable(lease_path, "run", owner="second")
+    assert first.claim(BATCHES) == ("NSW/2019", ["NSW/2020", "VIC/2020"])
+    assert second.claim(BATCHES) == ("NSW/2020", ["NSW/2019", "VIC/2020"])
+    first.close()
+    second.close()
+
+
+@pytest.mark.unit
+def test_finished_batches_are_never_claimed_again(lease_path):
+    with SQLiteLeaseTable(lease_path, "run", owner="first") as first:
+        batch, _ = first.claim(BATCHES[:1])
+        assert first.finish(batch)
+        assert first.claim(BATCHES[:1]) == (None, [])
+
+
+@pytest.mark.unit
+def test_only_the_owner_renews_or_finishes_a_lease(lease_path):
+    first = SQLiteLeaseTable(lease_path, "run", owner="first")
+    second = SQLiteLeaseTable(lease_path, "run", owner="second")
+    first.claim(BATCHES[:1])
+    assert first.renew(BATCHES[0])
+    assert not second.renew(BATCHES[0])
+    assert not second.finish(BATCHES[0])
+    first.close()
+    second.close()
+
+
+@pytest.mark.unit
+def test_runs_do_not_share_leases(lease_path):
+    with (
+        SQLiteLeaseTable(lease_path, "monday", owner="first") as first,
+        SQLiteLeaseTable(lease_path, "tuesday", owner="second") as second,
+    ):
+        assert first.claim(BATCHES[:1])[0] == second.claim(BATCHES[:1])[0] == BATCHES[0]
+
+
+@pytest.mark.unit
+def test_in_memory_leases_follow_the_same_rules():
+    table = LeaseTable("run", owner="first")
+    batch, pending = table.claim(BATCHES)
+    assert batch == "NSW/2019"
+    assert table.finish(batch)
+    assert table.claim(pending)[0] == "NSW/2020"
+
+
+@pytest.mark.unit
+def test_a_lease_table_needs_a_run_id(lease_path):
+    with pytest.raises(ValueError, match="run id"):
+        open_leases(None, path=lease_path)
+    assert open_leases("run") is None
+
+
+@pytest.mark.unit
+def test_an_expired_lease_is_reclaimed_by_another_worker(lease_path, clock):
+    first = SQLiteLeaseTable(lease_path, "run", owner="first", lease_seconds=60)
+    second = SQLiteLeaseTable(lease_path, "run", owner="second", lease_seconds=60)
+    first.claim(BATCHES[:1])
+    clock.now += 59
+    assert second.claim(BATCHES[:1]) == (None, BATCHES[:1])
+    clock.now += 1
+    assert second.claim(BATCHES[:1]) == (BATCHES[0], [])
+    assert not first.renew(BATCHES[0])
+    assert not first.finish(BATCHES[0])
+    assert second.finish(BATCHES[0])
+    first.close()
+    second.close()
+
+
+@pytest.mark.unit
+def test_a_renewed_lease_is_not_reclaimed(lease_path, clock):
+    first = SQLiteLeaseTable(lease_path, "run", owner="first", lease_seconds=60)
+    second = SQLiteLeaseTable(lease_path, "run", owner="second", lease_seconds=60)
+    first.claim(BATCHES[:1])
+    clock.now += 50
+    assert first.renew(BATCHES[0])
+    clock.now += 50
+    assert second.claim(BATCHES[:1]) == (None, BATCHES[:1])
+    first.close()
+    second.close()
+
+
+@pytest.mark.unit
+def test_a_claim_reads_the_leases_once_and_writes_only_free_batches(lease_path, clock):
+    with (
+        SQLiteLeaseTable(lease_path, "run", owner="first", lease_seconds=60) as first,
+        CountingLeaseTable(lease_path, "run", owner="second", lease_seconds=60) as second,
+    ):
+        pending = BATCHES
+        while pending:
+            _, pending = first.claim(pending)
+        assert second.claim(BATCHES) == (None, BATCHES)
+        assert (second.reads, second.writes) == (1, 0)
+        first.finish(BATCHES[0])
+        clock.now += 60
+        assert second.claim(BATCHES) == (BATCHES[1], [BATCHES[2]])
+        assert (second.reads, second.writes) == (2, 1)
@@ -0,0 +1,124 @@
+"""Job Ledger Tests."""
+
+import threading
+
+import pytest
+
+from src.utils.dynamo import FAILED, FETCHED, PLANNED, UPLOADED, JobLedger, SQLiteLedger
+
+URLS = [f"https://example.com/PRICE_AND_DEMAND_2020{month:02}_NSW1.csv" for month in (1, 2, 3)]
+
+
+@pytest.fixture
+def ledger_path(tmp_path):
+    return str(tmp_path / "ledger.db")
+
+
+@pytest.mark.unit
+def test_state_changes_are_buffered_until_the_batch_is_full(ledger_path):
+    ledger = SQLiteLedger(ledger_path, batch_size=2)
+    ledger.plan(URLS[:1])
+    assert SQLiteLedger(ledger_path).load().items == {}
+    ledger.plan(URLS[1:2])
+    assert SQLiteLedger(ledger_path).load().state(URLS[0]) == PLANNED
+    ledger.close()
+
+
+@pytest.mark.unit
+def test_close_writes_out_the_buffer(ledger_path):
+    with SQLiteLedger(ledger_path) as ledger:
+        ledger.plan(URLS)
+    loaded = SQLiteLedger(ledger_path).load()
+    assert {url: loaded.state(url) for url in URLS} == dict.fromkeys(URLS, PLANNED)
+
+
+@pytest.mark.unit
+def test_fetches_and_failed_fetches_count_as_attempts():
+    ledger = JobLedger()
+    ledger.plan(URLS[:1])
+    ledger.record(URLS[0], FAILED, error="status code 500")
+    ledger.record(URLS[0], FAILED, error="status code 500")
+    ledger.record(URLS[0], FETCHED)
+    assert ledger.items[URLS[0]]["attempts"] == 3
+    assert ledger.items[URLS[0]]["error"] is None
+
+
+@pytest.mark.unit
+def test_a_fetched_file_failing_its_checks_is_one_attempt():
+    ledger = JobLedger()
+    ledger.record(URLS[0], FETCHED)
+    ledger.record(URLS[0], FAILED, error="failed quality checks")
+    assert ledger.items[URLS[0]]["attempts"] == 1
+    ledger.record(URLS[0], FETCHED)
+    assert ledger.items[URLS[0]]["attempts"] == 2
+
+
+class SlowLedger(JobLedger):
+    def __init__(self):
+        super().__init__(batch_size=100)
+        self.writing = threading.Event()
+        self.release = threading.Event()
+        self.batches = []
+        self.fail = False
+
+    def _write_batch(self, items):
+        self.writing.set()
+        self.release.wait(timeout=5)
+        if self.fail:
+            raise self.LedgerError("throttled")
+        self.batches.append(items)
+
+
+@pytest.mark.unit
+def test_recording_does_not_wait_for_a_write_in_flight():
+    ledger = SlowLedger()
+    ledger.record(URLS[0], FETCHED)
+    flushing = threading.Thread(target=ledger.flush)
+    flushing.start()
+    assert ledger.writing.wait(timeout=5)
+    ledger.record(URLS[1], FETCHED)
+    assert ledger.state(URLS[1]) == FETCHED
+    ledger.release.set()
+    flushing.join()
+    ledger.flush()
+    assert [[item["url"] for item in batch] for batch in ledger.batches] == [URLS[:1], URLS[1:2]]
+
+
+@pytest.mark.unit
+def test_a_failed_write_keeps_the_buffer():
+    ledger = SlowLedger()
+    ledger.release.set()
+    ledger.fail = True
+    ledger.record(URLS[0], FETCHED)
+    with pytest.raises(JobLedger.LedgerError):
+        ledger.flush()
+    ledger.record(URLS[1], FETCHED)
+    ledger.fail = False
+    ledger.flush()
+    assert [item["url"] for item in ledger.batches[0]] == URLS[:2]
+
+
+@pytest.mark.unit
+def test_unknown_states_are_rejected():
+    with pytest.raises(ValueError, match="Unknown ledger state"):
+        JobLedger().record(URLS[0], "lost")
+
+
+@pytest.mark.unit
+def test_a_file_is_landed_exactly_once_across_workers(ledger_path):
+    first, second = SQLiteLedger(ledger_path).load(), SQLiteLedger(ledger_path).load()
+    assert first.complete(URLS[0], "abc")
+    assert not second.complete(URLS[0], "abc")
+    assert second.state(URLS[0]) is None
+    assert SQLiteLedger(ledger_path).load().done() == {URLS[0]}
+    first.close()
+    second.close()
+
+
+@pytest.mark.unit
+def test_landing_a_landed_file_again_updates_its_checksum(ledger_path):
+    with SQLiteLedger(ledger_path) as ledger:
+        assert ledger.land(URLS[0], "abc")
+        assert ledger.land(URLS[0], "def")
+    item = SQLiteLedger(ledger_path).load().items[URLS[0]]
+    assert (item["state"], item["checksum"]) == (UPLOADED, "def")
@@ -0,0 +1,50 @@
+"""Queued Logging Tests."""
+
+import logging
+import threading
+
+import pytest
+
+from src.utils import logs
+from src.utils.logs import DeferredQueueHandler, get_logger
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        """
+        Keeps every record it is handed, with the thread that formatted it.
+        """
+        super().__init__()
+        self.records = []
+        self.emitted = threading.Event()
+
+    def emit(self, record):
+        self.records.append((threading.current_thread(), self.format(record)))
+        self.emitted.set()
+
+
+@pytest.mark.unit
+def test_a_logger_gets_one_queue_handler():
+    logger = get_logger("tests.logs.handlers")
+    assert get_logger("tests.logs.handlers") is logger
+    assert [type(handler) for handler in logger.handlers] == [DeferredQueueHandler]
+    assert not logger.propagate
+
+
+@pytest.mark.unit
+def test_records_are_queued_unformatted():
+    record = logging.LogRecord("tests", logging.INFO, __file__, 1, "landed %d files", (3,), None)
+    assert DeferredQueueHandler(None).prepare(record) is record
+    assert record.args == (3,)
+
+
+@pytest.mark.unit
+def test_records_are_formatted_by_the_listener_thread(monkeypatch):
+    logger = get_logger("tests.logs.listener")
+    handler = RecordingHandler()
+    monkeypatch.setattr(logs._listener, "handlers", (*logs._listener.handlers, handler))
+    logger.info("landed %d files", 3)
+    assert handler.emitted.wait(5)
+    thread, message = handler.records[0]
+    assert thread is not threading.current_thread()
+    assert message == "landed 3 files"
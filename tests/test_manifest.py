@@ -0,0 +1,102 @@
+"""S3 Manifest Index Tests."""
+
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from src.etl import manifest as manifest_module
+from src.etl.manifest import Manifest
+from src.etl.streaming import MIN_PART_SIZE
+from src.utils.s3 import object_etag
+
+BUCKET_NAME = "test-bucket"
+FOLDER = "Energy_Price_Demand/"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(manifest_module, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+@pytest.mark.unit
+def test_load_indexes_a_prefix_with_one_listing(s3_conn, fake_s3):
+    fake_s3.put_object(Bucket=BUCKET_NAME, Key=f"{FOLDER}a.csv", Body=b"a")
+    fake_s3.put_object(Bucket=BUCKET_NAME, Key=f"{FOLDER}b.csv", Body=b"b")
+    fake_s3.put_object(Bucket=BUCKET_NAME, Key="other/c.csv", Body=b"c")
+    manifest = Manifest.load(s3_conn, BUCKET_NAME, FOLDER)
+    assert manifest.objects == {
+        f"{FOLDER}a.csv": object_etag(b"a"),
+        f"{FOLDER}b.csv": object_etag(b"b"),
+    }
+    assert fake_s3.calls["list_objects_v2"] == 1
+
+
+@pytest.mark.unit
+def test_load_reuses_a_fresh_persisted_index(s3_conn, fake_s3, tmp_path):
+    path = str(tmp_path / "manifest.json")
+    fake_s3.put_object(Bucket=BUCKET_NAME, Key=f"{FOLDER}a.csv", Body=b"a")
+    Manifest.load(s3_conn, BUCKET_NAME, FOLDER, path=path, max_age=60)
+    fake_s3.put_object(Bucket=BUCKET_NAME, Key=f"{FOLDER}b.csv", Body=b"b")
+    cached = Manifest.load(s3_conn, BUCKET_NAME, FOLDER, path=path, max_age=60)
+    assert f"{FOLDER}b.csv" not in cached
+    assert fake_s3.calls["list_objects_v2"] == 1
+
+
+@pytest.mark.unit
+def test_load_lists_again_once_the_persisted_index_expires(s3_conn, fake_s3, tmp_path, clock):
+    path = str(tmp_path / "manifest.json")
+    Manifest.load(s3_conn, BUCKET_NAME, FOLDER, path=path)
+    clock.now += 61
+    fake_s3.put_object(Bucket=BUCKET_NAME, Key=f"{FOLDER}b.csv", Body=b"b")
+    assert f"{FOLDER}b.csv" in Manifest.load(s3_conn, BUCKET_NAME, FOLDER, path=path, max_age=60)
+    assert fake_s3.calls["list_objects_v2"] == 2
+
+
+@pytest.mark.unit
+def test_saving_at_the_end_of_a_run_keeps_the_age_of_the_listing(s3_conn, fake_s3, tmp_path, clock):
+    path = str(tmp_path / "manifest.json")
+    for _ in range(4):
+        manifest = Manifest.load(s3_conn, BUCKET_NAME, FOLDER, path=path, max_age=60)
+        manifest.add(f"{FOLDER}a.csv", '"etag"')
+        clock.now += 25
+        manifest.save(path)
+    assert fake_s3.calls["list_objects_v2"] == 2
+    assert Manifest.from_file(path).listed_at == 1_000_000.0 + 75
+
+
+@pytest.mark.unit
+def test_an_index_saved_without_its_listing_time_is_listed_again(s3_conn, fake_s3, tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps({f"{FOLDER}a.csv": '"etag"'}))
+    assert Manifest.from_file(str(path)).objects == {f"{FOLDER}a.csv": '"etag"'}
+    assert len(Manifest.load(s3_conn, BUCKET_NAME, FOLDER, path=str(path), max_age=60)) == 0
+    assert fake_s3.calls["list_objects_v2"] == 1
+
+
+@pytest.mark.unit
+def test_save_and_from_file_round_trip(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    Manifest({"a.csv": '"etag"'}, listed_at=123.0).save(path)
+    assert Manifest.from_file(path).objects == {"a.csv": '"etag"'}
+    assert Manifest.from_file(path).listed_at == 123.0
+    assert not os.path.exists(f"{path}.tmp")
+
+
+@pytest.mark.unit
+def test_unchanged_compares_single_part_etags():
+    manifest = Manifest({"a.csv": object_etag(b"payload")})
+    assert manifest.unchanged("a.csv", b"payload")
+    assert not manifest.unchanged("a.csv", b"changed")
+    assert not manifest.unchanged("missing.csv", b"payload")
+
+
+@pytest.mark.unit
+def test_unchanged_recomputes_multipart_etags_with_the_part_size():
+    payload = b"x" * (MIN_PART_SIZE + 10)
+    manifest = Manifest({"a.csv": object_etag(payload, MIN_PART_SIZE)})
+    assert manifest.unchanged("a.csv", payload, part_size=MIN_PART_SIZE)
+    assert not manifest.unchanged("a.csv", payload + b"y", part_size=MIN_PART_SIZE)
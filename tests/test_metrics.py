@@ -0,0 +1,113 @@
+"""Pipeline Metrics Tests."""
+
+import json
+import random
+import threading
+
+import pytest
+
+from src.utils.metrics import DEFAULT_BUCKETS, Histogram, Metrics
+
+
+@pytest.mark.unit
+def test_quantiles_are_estimated_within_their_bucket():
+    rng = random.Random(0)  # noqa: S311
+    samples = [rng.uniform(0.0, 2.0) for _ in range(10_000)]
+    hist = Histogram()
+    for value in samples:
+        hist.observe(value)
+    ordered = sorted(samples)
+    for q in (0.5, 0.95, 0.99):
+        exact = ordered[int(q * len(ordered)) - 1]
+        index = DEFAULT_BUCKETS.index(next(bound for bound in DEFAULT_BUCKETS if bound >= exact))
+        lower = DEFAULT_BUCKETS[index - 1] if index else 0.0
+        assert lower <= hist.quantile(q) <= DEFAULT_BUCKETS[index]
+    assert hist.quantile(0.5) == pytest.approx(1.0, abs=0.05)
+
+
+@pytest.mark.unit
+def test_quantiles_stay_within_the_observed_range():
+    hist = Histogram()
+    assert hist.quantile(0.5) == 0.0
+    for _ in range(3):
+        hist.observe(0.3)
+    assert hist.quantile(0.01) == hist.quantile(0.99) == 0.3
+    hist.observe(120.0)
+    assert hist.quantile(1.0) == 120.0
+
+
+@pytest.mark.unit
+def test_histogram_memory_does_not_grow_with_observations():
+    hist = Histogram()
+    for i in range(100_000):
+        hist.observe(i / 1000)
+    assert len(hist.counts) == len(DEFAULT_BUCKETS)
+    assert [value for value in vars(hist).values() if isinstance(value, list)] == [hist.counts]
+    summary = hist.summary()
+    assert summary["count"] == 100_000
+    assert summary["mean"] == pytest.approx(49.9995)
+
+
+@pytest.mark.unit
+def test_counters_and_stages_are_summarised():
+    registry = Metrics()
+    registry.increment("files_uploaded")
+    registry.increment("bytes_fetched", 512)
+    with registry.timer("fetch"):
+        pass
+    registry.observe("fetch", 0.2)
+    summary = registry.summary()
+    assert summary["counters"] == {"files_uploaded": 1, "bytes_fetched": 512}
+    assert summary["stages"]["fetch"]["count"] == 2
+    assert set(summary["stages"]["fetch"]) == {"count", "sum", "mean", "p50", "p95", "p99"}
+    registry.reset()
+    assert registry.summary()["counters"] == {}
+    assert registry.summary()["stages"] == {}
+
+
+@pytest.mark.unit
+def test_updates_from_many_threads_are_all_counted():
+    registry = Metrics()
+
+    def work():
+        for _ in range(1000):
+            registry.increment("retries")
+            registry.observe("upload", 0.01)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert registry.counters["retries"] == 8000
+    assert registry.histograms["upload"].count == 8000
+
+
+@pytest.mark.unit
+def test_prometheus_output_has_cumulative_buckets():
+    registry = Metrics(namespace="etl")
+    registry.increment("files_uploaded", 3)
+    for seconds in (0.004, 0.2, 0.2, 90.0):
+        registry.observe("upload", seconds)
+    lines = registry.to_prometheus().splitlines()
+    assert "# TYPE etl_files_uploaded_total counter" in lines
+    assert "etl_files_uploaded_total 3" in lines
+    assert "# TYPE etl_upload_seconds histogram" in lines
+    assert 'etl_upload_seconds_bucket{le="0.005"} 1' in lines
+    assert 'etl_upload_seconds_bucket{le="0.25"} 3' in lines
+    assert 'etl_upload_seconds_bucket{le="60.0"} 3' in lines
+    assert 'etl_upload_seconds_bucket{le="+Inf"} 4' in lines
+    assert "etl_upload_seconds_count 4" in lines
+
+
+@pytest.mark.unit
+def test_metrics_are_saved_to_whichever_files_are_given(tmp_path):
+    registry = Metrics()
+    registry.increment("files_uploaded")
+    json_path, prometheus_path = tmp_path / "run.json", tmp_path / "run.prom"
+    registry.save(str(json_path))
+    assert json.loads(json_path.read_text())["counters"] == {"files_uploaded": 1}
+    assert not prometheus_path.exists()
+    registry.save(prometheus_path=str(prometheus_path))
+    assert "energy_etl_files_uploaded_total 1" in prometheus_path.read_text()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["run.json", "run.prom"]
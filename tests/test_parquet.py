@@ -0,0 +1,52 @@
+"""Partitioned Parquet Landing Tests."""
+
+from io import BytesIO
+
+import pyarrow.parquet as pq
+import pytest
+
+from benchmarks.server import synthetic_csv
+from src.etl.parquet import parquet_schema, parse_filename, partition_path, to_parquet
+from src.etl.schema import COLUMNS
+
+FILENAME = "PRICE_AND_DEMAND_202401_NSW1.csv"
+
+
+@pytest.mark.unit
+def test_filename_gives_the_region_and_month():
+    assert parse_filename(FILENAME) == ("NSW1", 2024, 1)
+    assert parse_filename("PRICE_AND_DEMAND_199812_VIC1.csv") == ("VIC1", 1998, 12)
+
+
+@pytest.mark.unit
+def test_files_land_in_hive_style_partitions():
+    assert partition_path(FILENAME) == (
+        "region=NSW1/year=2024/month=01/PRICE_AND_DEMAND_202401_NSW1.parquet"
+    )
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("compression", ["zstd", "snappy"])
+def test_parquet_file_holds_every_row_with_the_landed_schema(compression):
+    body = synthetic_csv(FILENAME)
+    parquet = pq.ParquetFile(BytesIO(to_parquet(body, compression)))
+    assert parquet.schema_arrow == parquet_schema()
+    assert parquet.metadata.row_group(0).column(0).compression == compression.upper()
+    table = parquet.read()
+    assert table.column_names == list(COLUMNS)
+    rows = body.decode().splitlines()[1:]
+    assert table.num_rows == len(rows)
+    region, settled, demand, price, period = rows[0].split(",")
+    first = table.slice(0, 1).to_pylist()[0]
+    assert first["REGION"] == region
+    assert f"{first['SETTLEMENTDATE']:%Y/%m/%d %H:%M:%S}" == settled
+    assert first["TOTALDEMAND"] == pytest.approx(float(demand))
+    assert first["RRP"] == pytest.approx(float(price), abs=1e-3)
+    assert first["PERIODTYPE"] == period
+
+
+@pytest.mark.unit
+def test_a_file_with_values_of_the_wrong_type_is_rejected():
+    body = synthetic_csv(FILENAME).replace(b"TRADE\n", b"TRADE\nNSW1,not a date,1,2,TRADE\n", 1)
+    with pytest.raises(ValueError):
+        to_parquet(body)
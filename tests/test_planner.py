@@ -0,0 +1,108 @@
+"""Extraction Planning Tests."""
+
+import datetime
+
+import pytest
+
+from src.etl.http_cache import NegativeCache
+from src.etl.manifest import Manifest
+from src.etl.planner import (
+    MARKET_TIMEZONE,
+    Plan,
+    first_published_month,
+    get_url,
+    last_published_month,
+    plan_urls,
+)
+
+BASE_URL = "https://example.com/PRICE_AND_DEMAND"
+
+
+def key(url):
+    return f"Energy_Price_Demand/{url.split('/')[-1]}"
+
+
+@pytest.mark.unit
+def test_last_published_month_is_the_current_month_in_market_time():
+    # 15:30 UTC on the last day of January is already February in AEST.
+    now = datetime.datetime(2024, 1, 31, 15, 30, tzinfo=datetime.UTC)
+    assert last_published_month(now) == (2024, 2)
+    assert last_published_month(now.astimezone(MARKET_TIMEZONE)) == (2024, 2)
+
+
+@pytest.mark.unit
+def test_get_url_skips_months_before_the_first_file_and_after_the_last():
+    urls = list(get_url(BASE_URL, 1999, range(1, 13), ["NSW"], last_published=(1999, 2)))
+    assert urls == [
+        f"{BASE_URL}_199812_NSW1.csv",
+        f"{BASE_URL}_199901_NSW1.csv",
+        f"{BASE_URL}_199902_NSW1.csv",
+    ]
+
+
+@pytest.mark.unit
+def test_regions_that_joined_later_start_at_their_first_file():
+    assert first_published_month("NSW1") == (1998, 12)
+    assert first_published_month("TAS1") == (2005, 5)
+    urls = list(get_url(BASE_URL, 2005, range(1, 13), ["TAS"], last_published=(2005, 12)))
+    assert urls == [f"{BASE_URL}_2005{month:02}_TAS1.csv" for month in range(5, 13)]
+
+
+@pytest.mark.unit
+def test_plan_urls_counts_months_before_a_region_joined_as_unpublished():
+    plan = plan_urls(
+        BASE_URL,
+        2005,
+        range(1, 13),
+        ["TAS"],
+        key=key,
+        manifest=Manifest(),
+        last_published=(2005, 12),
+    )
+    assert len(plan) == 8
+    assert plan.skipped["unpublished"] == 8 * 12 - 8
+
+
+@pytest.mark.unit
+def test_plan_urls_counts_every_skipped_url():
+    urls = list(get_url(BASE_URL, 2000, range(1, 13), ["NSW"], last_published=(2000, 6)))
+    stored, landed, missing = urls[0], urls[1], urls[2]
+    plan = plan_urls(
+        BASE_URL,
+        2000,
+        range(1, 13),
+        ["NSW"],
+        key=key,
+        manifest=Manifest({key(stored): '"etag"'}),
+        negative_cache=NegativeCache({missing: datetime.datetime.now().timestamp()}),
+        done={landed},
+        last_published=(2000, 6),
+    )
+    assert plan.urls == urls[3:]
+    assert plan.skipped == {"unpublished": 17, "stored": 1, "landed": 1, "known missing": 1}
+    assert len(plan) + sum(plan.skipped.values()) == 3 * 12
+
+
+@pytest.mark.unit
+def test_plan_urls_keeps_stored_urls_when_refreshing():
+    urls = list(get_url(BASE_URL, 1999, range(1, 13), ["NSW"], last_published=(1999, 12)))
+    plan = plan_urls(
+        BASE_URL,
+        1999,
+        range(1, 13),
+        ["NSW"],
+        key=key,
+        manifest=Manifest({key(url): '"etag"' for url in urls}),
+        done=set(urls),
+        include_stored=True,
+        last_published=(1999, 12),
+    )
+    assert plan.urls == urls
+    assert plan.skipped["stored"] == plan.skipped["landed"] == 0
+
+
+@pytest.mark.unit
+def test_plan_describe():
+    plan = Plan(["a", "b"], {"stored": 3})
+    assert plan.describe() == "2 URLs to fetch; skipped 3 stored."
+    assert Plan().describe() == "0 URLs to fetch; skipped none."
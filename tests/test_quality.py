@@ -0,0 +1,143 @@
+"""Data Quality Validation Tests."""
+
+import datetime
+import json
+
+import pytest
+
+from benchmarks.server import synthetic_csv
+from src.etl.planner import MARKET_TIMEZONE
+from src.etl.quality import (
+    QualityReport,
+    check_file,
+    interval_seconds,
+    quarantine_folder,
+    save_reports,
+)
+
+FILENAME = "PRICE_AND_DEMAND_202001_NSW1.csv"
+LATER = datetime.datetime(2025, 1, 1, tzinfo=MARKET_TIMEZONE)
+
+
+def rows_of(body):
+    header, *rows = body.decode().splitlines()
+    return header, rows
+
+
+def join(header, rows):
+    return ("\n".join([header, *rows]) + "\n").encode()
+
+
+@pytest.mark.unit
+def test_interval_seconds_switch_to_five_minutes_in_october_2021():
+    assert interval_seconds(2021, 9) == 1800
+    assert interval_seconds(2021, 10) == 300
+
+
+@pytest.mark.unit
+def test_a_complete_month_passes():
+    report = check_file(FILENAME, synthetic_csv(FILENAME), LATER)
+    assert report.passed, report.describe()
+    assert report.rows == 31 * 48
+    assert report.seconds > 0
+
+
+@pytest.mark.unit
+def test_a_five_minute_month_passes():
+    filename = "PRICE_AND_DEMAND_202201_VIC1.csv"
+    report = check_file(filename, synthetic_csv(filename, interval_minutes=5), LATER)
+    assert report.passed, report.describe()
+
+
+@pytest.mark.unit
+def test_missing_duplicate_and_misaligned_intervals_are_counted():
+    header, rows = rows_of(synthetic_csv(FILENAME))
+    rows = rows[:10] + [rows[9]] + rows[12:]
+    rows.append(rows[0].replace("00:30:00", "00:31:00"))
+    report = check_file(FILENAME, join(header, rows), LATER)
+    assert report.issues == {
+        "duplicate_intervals": 1,
+        "misaligned_intervals": 1,
+        "missing_intervals": 2,
+    }
+
+
+@pytest.mark.unit
+def test_the_current_month_is_not_missing_its_future_intervals():
+    header, rows = rows_of(synthetic_csv(FILENAME))
+    now = datetime.datetime(2020, 1, 2, 1, 0, tzinfo=MARKET_TIMEZONE)
+    assert check_file(FILENAME, join(header, rows[:50]), now).passed
+    assert check_file(FILENAME, join(header, rows[:50]), LATER).issues == {
+        "missing_intervals": 31 * 48 - 50
+    }
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    ("filename", "day"),
+    [("PRICE_AND_DEMAND_199812_NSW1.csv", 7), ("PRICE_AND_DEMAND_200505_TAS1.csv", 29)],
+)
+def test_the_first_published_month_starts_at_its_earliest_interval(filename, day):
+    header, rows = rows_of(synthetic_csv(filename))
+    rows = rows[(day - 1) * 48 :]
+    assert check_file(filename, join(header, rows), LATER).passed
+    del rows[10]
+    assert check_file(filename, join(header, rows), LATER).issues == {"missing_intervals": 1}
+
+
+@pytest.mark.unit
+def test_a_later_month_starting_late_is_missing_its_first_intervals():
+    filename = "PRICE_AND_DEMAND_200506_TAS1.csv"
+    header, rows = rows_of(synthetic_csv(filename))
+    assert check_file(filename, join(header, rows[48:]), LATER).issues == {"missing_intervals": 48}
+
+
+@pytest.mark.unit
+def test_bad_values_and_rows_of_another_region_are_counted():
+    header, rows = rows_of(synthetic_csv(FILENAME))
+    region, settled, _, _, period = rows[0].split(",")
+    rows[0] = f"{region},{settled},-5,30000,{period}"
+    rows[1] = rows[1].replace("NSW1", "VIC1")
+    rows[2] = rows[2].replace(rows[2].split(",")[3], "n/a")
+    report = check_file(FILENAME, join(header, rows), LATER)
+    assert report.issues == {
+        "wrong_region": 1,
+        "demand_out_of_range": 1,
+        "price_out_of_range": 1,
+        "non_numeric_price": 1,
+    }
+
+
+@pytest.mark.unit
+def test_a_file_with_other_columns_fails():
+    report = check_file(FILENAME, b"REGION,PRICE\nNSW1,1\n", LATER)
+    assert report.issues == {"wrong_columns": 1}
+    assert report.seconds > 0
+
+
+@pytest.mark.unit
+def test_an_unreadable_file_fails_and_is_timed():
+    report = check_file(FILENAME, b"", LATER)
+    assert report.issues == {"unreadable": 1}
+    assert report.seconds > 0
+
+
+@pytest.mark.unit
+def test_reports_are_written_as_json_lines(tmp_path):
+    path = tmp_path / "reports.jsonl"
+    report = QualityReport(FILENAME, 10, {"missing_intervals": 2, "duplicate_intervals": 0})
+    save_reports(str(path), [report.to_dict()])
+    assert [json.loads(line) for line in path.read_text().splitlines()] == [
+        {
+            "filename": FILENAME,
+            "rows": 10,
+            "passed": False,
+            "issues": {"missing_intervals": 2},
+            "seconds": 0.0,
+        }
+    ]
+
+
+@pytest.mark.unit
+def test_quarantine_folder_sits_next_to_the_landing_folder():
+    assert quarantine_folder("Energy_Price_Demand/") == "Energy_Price_Demand_quarantine/"
@@ -0,0 +1,172 @@
+"""Warehouse Loader Tests."""
+
+import json
+import os
+
+import pytest
+
+from benchmarks.server import synthetic_csv
+from src.utils.redshift import (
+    COPY_FROM_MANIFEST,
+    SELECT_LOADED,
+    PostgresLoader,
+    RedshiftLoader,
+    connect,
+)
+
+BUCKET_NAME = "test-bucket"
+FOLDER = "Energy_Price_Demand/"
+
+
+class RecordingConnection:
+    class Error(Exception):
+        pass
+
+    def __init__(self, loaded=None):
+        """
+        Stands in for a psycopg2 connection, recording every statement it is sent.
+
+        :param loaded: Rows the SELECT of the loaded files answers with (default is None)
+        """
+        self.loaded = list(loaded or [])
+        self.statements = []
+        self.closed = False
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class RecordingCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 0
+
+    def execute(self, statement, parameters=None):
+        self.connection.statements.append((statement, parameters))
+
+    def fetchall(self):
+        return self.connection.loaded
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+@pytest.fixture
+def postgres():
+    """
+    Connects to the PostgreSQL database named by POSTGRES_DSN, with its tables kept in a
+    schema that is dropped afterwards. Skips the test without a DSN or psycopg2.
+    """
+    dsn = os.getenv("POSTGRES_DSN")
+    if not dsn:
+        pytest.skip("POSTGRES_DSN is not set.")
+    pytest.importorskip("psycopg2")
+    connection = connect(dsn)
+    with connection, connection.cursor() as cursor:
+        cursor.execute("DROP SCHEMA IF EXISTS etl_test CASCADE")
+        cursor.execute("CREATE SCHEMA etl_test")
+        cursor.execute("SET search_path TO etl_test")
+    yield connection
+    with connection, connection.cursor() as cursor:
+        cursor.execute("DROP SCHEMA etl_test CASCADE")
+    connection.close()
+
+
+def land(fake_s3, name, body=None):
+    fake_s3.put_object(Bucket=BUCKET_NAME, Key=f"{FOLDER}{name}", Body=body or synthetic_csv(name))
+
+
+def settlements(*bodies):
+    return {tuple(line.split(b",")[:2]) for body in bodies for line in body.splitlines()[1:]}
+
+
+def stored(connection):
+    with connection, connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT (region, settlement_date)) FROM price_demand"
+        )
+        return cursor.fetchone()
+
+
+@pytest.mark.unit
+def test_delta_picks_new_and_changed_csv_files(s3_conn):
+    connection = RecordingConnection([(f"{FOLDER}a.csv", "1"), (f"{FOLDER}b.csv", "2")])
+    loader = RedshiftLoader(connection, s3_conn, BUCKET_NAME)
+    objects = {
+        f"{FOLDER}a.csv": "1",
+        f"{FOLDER}b.csv": "3",
+        f"{FOLDER}c.csv": "4",
+        f"{FOLDER}c.parquet": "5",
+    }
+    assert loader.delta(objects) == [f"{FOLDER}b.csv", f"{FOLDER}c.csv"]
+    assert connection.statements == [(SELECT_LOADED, None)]
+
+
+@pytest.mark.unit
+def test_write_manifest_lists_every_file_of_the_batch(s3_conn, fake_s3):
+    loader = RedshiftLoader(RecordingConnection(), s3_conn, BUCKET_NAME)
+    url = loader.write_manifest([f"{FOLDER}a.csv", f"{FOLDER}b.csv"], index=3)
+    key = url.removeprefix(f"s3://{BUCKET_NAME}/")
+    assert key.startswith("copy_manifests/") and key.endswith("-0003.manifest")
+    assert json.loads(fake_s3.objects[(BUCKET_NAME, key)]) == {
+        "entries": [
+            {"url": f"s3://{BUCKET_NAME}/{FOLDER}a.csv", "mandatory": True},
+            {"url": f"s3://{BUCKET_NAME}/{FOLDER}b.csv", "mandatory": True},
+        ]
+    }
+
+
+@pytest.mark.unit
+def test_copy_reads_the_manifest_with_the_iam_role(s3_conn):
+    connection = RecordingConnection()
+    loader = RedshiftLoader(connection, s3_conn, BUCKET_NAME, iam_role="arn:aws:iam::1:role/r")
+    loader._copy(connection.cursor(), [f"{FOLDER}a.csv"], 0)
+    statement, (manifest, role) = connection.statements[0]
+    assert statement == COPY_FROM_MANIFEST
+    assert manifest.startswith(f"s3://{BUCKET_NAME}/copy_manifests/")
+    assert role == "arn:aws:iam::1:role/r"
+
+
+@pytest.mark.unit
+def test_load_without_changes_runs_no_batch(s3_conn, fake_s3):
+    fake_s3.put_object(Bucket=BUCKET_NAME, Key=f"{FOLDER}a.csv", Body=b"a")
+    etag = s3_conn.list_objects(BUCKET_NAME, FOLDER)[f"{FOLDER}a.csv"]
+    connection = RecordingConnection([(f"{FOLDER}a.csv", etag)])
+    with RedshiftLoader(connection, s3_conn, BUCKET_NAME) as loader:
+        assert loader.load(FOLDER) == 0
+    assert connection.statements == [(SELECT_LOADED, None)]
+    assert connection.closed
+
+
+@pytest.mark.integration
+def test_postgres_loads_every_row_once(postgres, s3_conn, fake_s3):
+    january, february = (f"PRICE_AND_DEMAND_2020{month:02}_NSW1.csv" for month in (1, 2))
+    # The last interval of January published again in February's file.
+    overlap = synthetic_csv(january).splitlines(keepends=True)[-1]
+    land(fake_s3, january)
+    land(fake_s3, february, synthetic_csv(february) + overlap)
+    rows = len(settlements(synthetic_csv(january), synthetic_csv(february)))
+    loader = PostgresLoader(postgres, s3_conn, BUCKET_NAME)
+    loader.create_tables()
+    assert loader.load(FOLDER) == 2
+    assert stored(postgres) == (rows, rows)
+    assert loader.load(FOLDER) == 0
+    # A republished month replaces its rows rather than adding to them.
+    land(fake_s3, february, synthetic_csv(february).replace(b",TRADE", b",REVISED"))
+    assert loader.load(FOLDER) == 1
+    assert stored(postgres) == (rows, rows)
+    with postgres, postgres.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM price_demand WHERE period_type = 'REVISED'")
+        assert cursor.fetchone()[0] == len(settlements(synthetic_csv(february)))
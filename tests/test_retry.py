@@ -0,0 +1,82 @@
+"""Retry and Adaptive Rate Limiting Tests."""
+
+import asyncio
+from datetime import UTC, datetime, timedelta
+from email.utils import format_datetime
+
+import pytest
+
+from src.etl.retry import AdaptiveLimiter, RetryPolicy, parse_retry_after
+
+
+@pytest.mark.unit
+def test_parse_retry_after_reads_seconds():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after("-3") == 0.0
+
+
+@pytest.mark.unit
+def test_parse_retry_after_reads_http_dates():
+    retry_at = datetime.now(UTC) + timedelta(seconds=30)
+    assert 25 <= parse_retry_after(format_datetime(retry_at, usegmt=True)) <= 30
+    assert parse_retry_after("Mon, 01 Jan 2001 00:00:00 GMT") == 0.0
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("value", [None, "", "soon"])
+def test_parse_retry_after_ignores_missing_or_invalid_headers(value):
+    assert parse_retry_after(value) is None
+
+
+@pytest.mark.unit
+def test_retry_delay_stays_under_the_exponential_ceiling():
+    policy = RetryPolicy(base_delay=0.5, max_delay=4.0)
+    for attempt in range(8):
+        ceiling = min(4.0, 0.5 * 2**attempt)
+        assert all(0 <= policy.delay(attempt) <= ceiling for _ in range(50))
+
+
+@pytest.mark.unit
+def test_retry_delay_honours_retry_after_up_to_the_maximum():
+    policy = RetryPolicy(base_delay=0.01, max_delay=10.0)
+    assert policy.delay(0, retry_after=3.0) >= 3.0
+    assert policy.delay(0, retry_after=120.0) == 10.0
+
+
+@pytest.mark.unit
+def test_limiter_backs_off_once_per_cooldown_and_recovers():
+    limiter = AdaptiveLimiter(max_limit=16, cooldown=60.0)
+    assert limiter.limit == 8
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.limit == 4
+    for _ in range(1000):
+        limiter.on_success()
+    assert limiter.limit == 16
+
+
+@pytest.mark.unit
+def test_limiter_never_drops_below_the_minimum():
+    limiter = AdaptiveLimiter(max_limit=8, min_limit=2, cooldown=0.0)
+    for _ in range(10):
+        limiter.on_throttle()
+    assert limiter.limit == 2
+
+
+@pytest.mark.unit
+def test_limiter_bounds_requests_in_flight():
+    limiter = AdaptiveLimiter(max_limit=6)
+    peak = 0
+
+    async def request():
+        nonlocal peak
+        async with limiter:
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*(request() for _ in range(20)))
+
+    asyncio.run(main())
+    assert peak == 3
+    assert limiter.in_flight == 0
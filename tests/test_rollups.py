@@ -0,0 +1,78 @@
+"""Ingest Rollups Tests."""
+
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+from benchmarks.server import synthetic_csv
+from src.etl.rollups import RegionSeries, rollup, rollup_files, rollup_folder
+
+FILENAME = "PRICE_AND_DEMAND_202001_NSW1.csv"
+
+
+@pytest.mark.unit
+def test_daily_rollup_matches_a_pandas_groupby():
+    body = synthetic_csv(FILENAME)
+    daily = rollup(RegionSeries.from_csv(body), "D")
+    df = pd.read_csv(BytesIO(body))
+    settled = pd.to_datetime(df["SETTLEMENTDATE"], format="%Y/%m/%d %H:%M:%S")
+    # An interval belongs to the day it starts in.
+    df["period"] = (settled - pd.Timedelta(seconds=1)).dt.strftime("%Y-%m-%d")
+    expected = df.groupby("period").agg(
+        intervals=("RRP", "size"),
+        price_min=("RRP", "min"),
+        price_max=("RRP", "max"),
+        price_p50=("RRP", "median"),
+        demand_peak=("TOTALDEMAND", "max"),
+    )
+    assert list(daily["period"]) == list(expected.index)
+    assert list(daily["intervals"]) == [48] * 31
+    for column in expected.columns[1:]:
+        assert daily[column].to_numpy() == pytest.approx(expected[column].to_numpy(), abs=0.01)
+
+
+@pytest.mark.unit
+def test_monthly_rollup_counts_negative_prices():
+    body = b"REGION,SETTLEMENTDATE,TOTALDEMAND,RRP,PERIODTYPE\n" + b"".join(
+        f"SA1,2020/01/01 {hour:02}:30:00,1000,{price},TRADE\n".encode()
+        for hour, price in enumerate([-10.0, 5.0, -1.0, 20.0])
+    )
+    monthly = rollup(RegionSeries.from_csv(body), "M")
+    assert monthly.to_dict("records")[0] == pytest.approx(
+        {
+            "region": "SA1",
+            "period": "2020-01",
+            "intervals": 4,
+            "price_min": -10.0,
+            "price_max": 20.0,
+            "price_mean": 3.5,
+            "price_p05": -8.65,
+            "price_p50": 2.0,
+            "price_p95": 17.75,
+            "demand_min": 1000.0,
+            "demand_mean": 1000.0,
+            "demand_peak": 1000.0,
+            "negative_price_intervals": 2,
+        }
+    )
+
+
+@pytest.mark.unit
+def test_rollup_files_names_one_file_per_period():
+    files = rollup_files(FILENAME, synthetic_csv(FILENAME))
+    assert set(files) == {f"daily/{FILENAME}", f"monthly/{FILENAME}"}
+    assert files[f"monthly/{FILENAME}"].startswith(b"region,period,intervals,")
+
+
+@pytest.mark.unit
+def test_rollup_files_rejects_several_regions():
+    body = b"REGION,SETTLEMENTDATE,TOTALDEMAND,RRP,PERIODTYPE\n"
+    body += b"NSW1,2020/01/01 00:30:00,1,1,TRADE\nVIC1,2020/01/01 00:30:00,1,1,TRADE\n"
+    with pytest.raises(ValueError, match="one region"):
+        rollup_files(FILENAME, body)
+
+
+@pytest.mark.unit
+def test_rollup_folder_sits_next_to_the_landing_folder():
+    assert rollup_folder("Energy_Price_Demand/") == "Energy_Price_Demand_rollups/"
@@ -0,0 +1,71 @@
+"""AWS S3 Connection Tests."""
+
+import asyncio
+
+import pytest
+from botocore.exceptions import EndpointConnectionError
+
+from benchmarks.fake_s3 import FakeS3Client
+from src.utils.s3 import S3Buckets, object_etag
+
+BUCKET_NAME = "test-bucket"
+
+
+class UnreachableS3Client(FakeS3Client):
+    def put_object(self, Bucket, Key, Body, **kwargs):  # noqa: N803
+        raise EndpointConnectionError(endpoint_url="https://s3.us-east-2.amazonaws.com")
+
+    def get_object(self, Bucket, Key, **kwargs):  # noqa: N803
+        raise EndpointConnectionError(endpoint_url="https://s3.us-east-2.amazonaws.com")
+
+
+@pytest.mark.unit
+def test_upload_file_writes_under_the_folder(s3_conn, fake_s3):
+    assert s3_conn.upload_file(BUCKET_NAME, "a.csv", b"body", folder="landing/")
+    assert fake_s3.objects[(BUCKET_NAME, "landing/a.csv")] == b"body"
+
+
+@pytest.mark.unit
+def test_upload_file_reports_transport_errors_as_a_failed_upload():
+    conn = S3Buckets(None, None, None)
+    conn.client = UnreachableS3Client()
+    assert conn.upload_file(BUCKET_NAME, "a.csv", b"body") is False
+
+
+@pytest.mark.unit
+def test_read_object_raises_connection_errors():
+    conn = S3Buckets(None, None, None)
+    conn.client = UnreachableS3Client()
+    with pytest.raises(S3Buckets.S3ConnectionError):
+        conn.read_object(BUCKET_NAME, "a.csv")
+
+
+@pytest.mark.unit
+def test_read_object_of_a_missing_key_raises(s3_conn):
+    with pytest.raises(S3Buckets.S3ConnectionError, match="NoSuchKey"):
+        s3_conn.read_object(BUCKET_NAME, "missing.csv")
+
+
+@pytest.mark.unit
+def test_delete_objects_removes_every_key(s3_conn, fake_s3):
+    for name in ("a", "b", "c"):
+        s3_conn.upload_file(BUCKET_NAME, f"{name}.csv", name.encode())
+    s3_conn.delete_objects(BUCKET_NAME, ["a.csv", "b.csv"])
+    assert s3_conn.list_objects(BUCKET_NAME) == {"c.csv": object_etag(b"c")}
+
+
+@pytest.mark.unit
+def test_iter_object_streams_an_object_in_chunks(async_s3, fake_s3):
+    fake_s3.put_object(Bucket=BUCKET_NAME, Key="a.csv", Body=b"0123456789")
+
+    async def read():
+        return [chunk async for chunk in async_s3.iter_object(BUCKET_NAME, "a.csv", chunk_size=4)]
+
+    assert asyncio.run(read()) == [b"0123", b"4567", b"89"]
+
+
+@pytest.mark.unit
+def test_object_etag_of_a_multipart_object():
+    body = b"x" * 10
+    assert object_etag(body) == object_etag(body, part_size=20)
+    assert object_etag(body, part_size=4).endswith("-3")
@@ -0,0 +1,29 @@
+"""AEMO Price and Demand File Schema Tests."""
+
+import pytest
+
+from benchmarks.server import synthetic_csv
+from src.etl.schema import COLUMNS, has_expected_columns, read_header
+
+
+@pytest.mark.unit
+def test_header_is_read_without_parsing_the_rows():
+    body = synthetic_csv("PRICE_AND_DEMAND_202001_NSW1.csv")
+    assert read_header(body) == list(COLUMNS)
+    assert read_header(b"REGION,RRP") == ["REGION", "RRP"]
+
+
+@pytest.mark.unit
+def test_header_quotes_whitespace_and_byte_order_mark_are_ignored():
+    header = b'\xef\xbb\xbf"REGION", "SETTLEMENTDATE",TOTALDEMAND,RRP,PERIODTYPE\r\n'
+    assert read_header(header) == list(COLUMNS)
+    assert has_expected_columns(header)
+
+
+@pytest.mark.unit
+def test_only_the_expected_set_of_columns_is_accepted():
+    reordered = ",".join(reversed(COLUMNS)).encode() + b"\n"
+    assert has_expected_columns(reordered)
+    assert not has_expected_columns(",".join(COLUMNS[:-1]).encode() + b"\n")
+    assert not has_expected_columns(",".join((*COLUMNS, "EXTRA")).encode() + b"\n")
+    assert not has_expected_columns(b"<html><body>Not found</body></html>")
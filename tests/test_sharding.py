@@ -0,0 +1,57 @@
+"""Extraction Sharding Tests."""
+
+import pytest
+
+from src.etl.planner import Plan, get_url
+from src.etl.sharding import batches, partition, shard_of, shard_plan
+
+BASE_URL = "https://example.com/PRICE_AND_DEMAND"
+
+
+def plan_of(provinces, current_year=2003):
+    return Plan(get_url(BASE_URL, current_year, range(1, 13), provinces, (current_year, 12)))
+
+
+@pytest.mark.unit
+def test_partition_reads_the_province_year_and_month():
+    assert partition(f"{BASE_URL}_202401_NSW1.csv") == ("NSW", "2024", "01")
+    with pytest.raises(ValueError, match="not a price and demand file"):
+        partition("https://example.com/readme.txt")
+
+
+@pytest.mark.unit
+def test_shard_of_ignores_the_base_url():
+    assert shard_of(f"{BASE_URL}_202401_NSW1.csv", 7) == shard_of(
+        "http://mirror.local/data/PRICE_AND_DEMAND_202401_NSW1.csv", 7
+    )
+
+
+@pytest.mark.unit
+def test_shards_cover_the_plan_without_overlap():
+    plan = plan_of(["NSW", "QLD", "VIC"])
+    shards = [shard_plan(plan, index, 4) for index in range(4)]
+    urls = [url for shard in shards for url in shard]
+    assert sorted(urls) == sorted(plan.urls)
+    assert len(urls) == len(set(urls))
+    assert all(shard.skipped["other shards"] == len(plan) - len(shard) for shard in shards)
+    assert all(len(shard) for shard in shards)
+
+
+@pytest.mark.unit
+def test_a_single_shard_keeps_the_plan():
+    plan = plan_of(["NSW"])
+    assert shard_plan(plan, 0, 1) is plan
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("shard_index", [-1, 3])
+def test_shard_index_must_be_within_the_shard_count(shard_index):
+    with pytest.raises(ValueError, match="outside a shard count"):
+        shard_plan(plan_of(["NSW"]), shard_index, 3)
+
+
+@pytest.mark.unit
+def test_batches_group_urls_by_province_and_year_in_plan_order():
+    grouped = batches(plan_of(["NSW", "QLD"], current_year=1999))
+    assert list(grouped) == ["NSW/1998", "NSW/1999", "QLD/1998", "QLD/1999"]
+    assert grouped["NSW/1999"] == [f"{BASE_URL}_1999{month:02}_NSW1.csv" for month in range(1, 13)]
@@ -0,0 +1,53 @@
+"""Streaming S3 Upload Tests."""
+
+import asyncio
+
+import pytest
+
+from src.etl.streaming import MIN_PART_SIZE, StreamingUpload, stream_to_s3
+from src.utils.s3 import object_etag
+
+BUCKET_NAME = "test-bucket"
+
+
+async def chunks_of(body, size=256 * 1024, fail_at=None):
+    for start in range(0, len(body), size):
+        if fail_at is not None and start >= fail_at:
+            raise ConnectionResetError("source went away")
+        yield body[start : start + size]
+
+
+@pytest.mark.unit
+def test_a_small_object_is_sent_with_a_single_put(async_s3, fake_s3):
+    size = asyncio.run(stream_to_s3(async_s3, chunks_of(b"row\n" * 100), BUCKET_NAME, "small.csv"))
+    assert size == 400
+    assert fake_s3.objects[(BUCKET_NAME, "small.csv")] == b"row\n" * 100
+    assert fake_s3.calls == {"put_object": 1}
+
+
+@pytest.mark.unit
+def test_a_large_object_is_sent_in_parts_with_a_predictable_etag(async_s3, fake_s3):
+    body = bytes(range(256)) * (3 * MIN_PART_SIZE // 256 + 7)
+    size = asyncio.run(
+        stream_to_s3(async_s3, chunks_of(body), BUCKET_NAME, "large.csv", MIN_PART_SIZE)
+    )
+    assert size == len(body)
+    assert fake_s3.objects[(BUCKET_NAME, "large.csv")] == body
+    assert fake_s3.calls["upload_part"] == 4
+    assert fake_s3.etags[(BUCKET_NAME, "large.csv")].strip('"') == object_etag(body, MIN_PART_SIZE)
+
+
+@pytest.mark.unit
+def test_the_part_size_is_raised_to_the_s3_minimum(async_s3):
+    assert StreamingUpload(async_s3, BUCKET_NAME, "key", part_size=1024).part_size == MIN_PART_SIZE
+
+
+@pytest.mark.unit
+def test_a_failing_stream_aborts_the_upload(async_s3, fake_s3):
+    body = b"x" * (3 * MIN_PART_SIZE)
+    chunks = chunks_of(body, fail_at=2 * MIN_PART_SIZE)
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(stream_to_s3(async_s3, chunks, BUCKET_NAME, "broken.csv", MIN_PART_SIZE))
+    assert (BUCKET_NAME, "broken.csv") not in fake_s3.objects
+    assert fake_s3.calls["abort_multipart_upload"] == 1
+    assert "complete_multipart_upload" not in fake_s3.calls
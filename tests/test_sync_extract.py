@@ -0,0 +1,86 @@
+"""Threaded Data Extraction Tests."""
+
+import collections
+
+import pytest
+
+from benchmarks import server as synthetic_server
+from benchmarks.server import synthetic_csv
+from src.etl import sync_extract
+from src.utils.metrics import metrics
+
+BUCKET_NAME = "test-bucket"
+FOLDER = "Energy_Price_Demand/"
+QUARANTINE = "Energy_Price_Demand_quarantine/"
+# December 1998 to December 2000, for NSW.
+FILES_PER_RUN = 25
+
+
+@pytest.fixture
+def run(aemo, s3_conn, monkeypatch, tmp_path):
+    monkeypatch.setattr(sync_extract, "s3_conn", s3_conn)
+    _, base_url = aemo
+
+    def extract(**kwargs):
+        sync_extract.run_data_extraction(
+            **{
+                "base_url": base_url,
+                "bucket_name": BUCKET_NAME,
+                "current_year": 2000,
+                "months": range(1, 13),
+                "provinces": ["NSW"],
+                "folder": FOLDER,
+                "workers": 4,
+                "negative_cache_path": str(tmp_path / "negative_cache.json"),
+                **kwargs,
+            }
+        )
+
+    return extract
+
+
+def landed(fake_s3):
+    return {key: body for (_, key), body in fake_s3.objects.items() if key.startswith(FOLDER)}
+
+
+@pytest.mark.integration
+def test_a_run_processes_every_url_exactly_once(run, aemo, fake_s3, monkeypatch):
+    server, _ = aemo
+    processed = collections.Counter()
+    process_url = sync_extract.process_url
+
+    def counted(url, *args):
+        processed[url] += 1
+        return process_url(url, *args)
+
+    monkeypatch.setattr(sync_extract, "process_url", counted)
+    run()
+    assert len(processed) == FILES_PER_RUN
+    assert set(processed.values()) == {1}
+    assert server.requests == FILES_PER_RUN
+    files = landed(fake_s3)
+    assert len(files) == FILES_PER_RUN
+    assert metrics.counters["files_uploaded"] == FILES_PER_RUN
+    processed.clear()
+    run()
+    assert not processed
+    assert server.requests == FILES_PER_RUN
+
+
+@pytest.mark.integration
+def test_a_failing_file_is_quarantined_as_it_was_received(run, fake_s3, monkeypatch):
+    name = "PRICE_AND_DEMAND_199903_NSW1.csv"
+    header, first, rest = synthetic_csv(name).split(b"\n", 2)
+    price = first.split(b",")[3]
+    served = b"\n".join([header, first.replace(price, b"99999.000"), rest])
+    monkeypatch.setattr(
+        synthetic_server,
+        "synthetic_csv",
+        lambda filename, *args: served if filename == name else synthetic_csv(filename, *args),
+    )
+    run(validate=True)
+    assert (BUCKET_NAME, f"{FOLDER}{name}") not in fake_s3.objects
+    assert fake_s3.objects[(BUCKET_NAME, f"{QUARANTINE}{name}")] == served
+    report = f"{QUARANTINE}PRICE_AND_DEMAND_199903_NSW1.quality.json"
+    assert (BUCKET_NAME, report) in fake_s3.objects
+    assert metrics.counters["quarantined"] == 1
@@ -0,0 +1,236 @@
+"""Current Month Tail Tests."""
+
+import asyncio
+import hashlib
+
+import pytest
+from aiohttp import web
+
+from src.etl import tail
+from src.etl.extract import ExtractionContext, create_session
+from src.etl.manifest import Manifest
+from src.etl.retry import AdaptiveLimiter, RetryPolicy
+from src.etl.tail import TailCache, compact, delta_folder, fold, follow, last_line, poll
+from src.utils.metrics import metrics
+
+BUCKET_NAME = "test-bucket"
+FOLDER = "Energy_Price_Demand/"
+FILENAME = "PRICE_AND_DEMAND_202410_QLD1.csv"
+HEADER = b"REGION,SETTLEMENTDATE,TOTALDEMAND,RRP,PERIODTYPE\n"
+KEY = (BUCKET_NAME, f"{FOLDER}{FILENAME}")
+# The last interval of October, which only appears in its file once November has begun.
+MONTH_END = b"QLD1,2024/11/01 00:00:00,1200.5,50.25,TRADE\n"
+
+
+def rows(start, stop, price=50.25):
+    return b"".join(
+        f"QLD1,2024/10/01 {i // 12:02}:{i % 12 * 5:02}:00,{1000 + i}.5,{price},TRADE\n".encode()
+        for i in range(start, stop)
+    )
+
+
+class GrowingFile:
+    def __init__(self, body):
+        """
+        Serves one file that grows between polls, answering range and conditional requests
+        like the AEMO file server.
+
+        :param body: The current content of the file
+        """
+        self.body = body
+        self.requests = []
+
+    async def handle(self, request):
+        self.requests.append(dict(request.headers))
+        etag = f'"{hashlib.md5(self.body).hexdigest()}"'  # noqa: S324
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        if "Range" not in request.headers:
+            return web.Response(body=self.body, headers={"ETag": etag})
+        start = int(request.headers["Range"].removeprefix("bytes=").rstrip("-"))
+        if start >= len(self.body):
+            return web.Response(status=416)
+        return web.Response(status=206, body=self.body[start:], headers={"ETag": etag})
+
+
+async def serve(source):
+    app = web.Application()
+    app.router.add_get(f"/{FILENAME}", source.handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}/{FILENAME}"
+
+
+def serving(async_s3, source, run):
+    """
+    Serves a file and awaits `run` with its URL and the context of an extraction run.
+    """
+
+    async def main():
+        runner, url = await serve(source)
+        try:
+            async with create_session(4, 4) as session:
+                ctx = ExtractionContext(
+                    session,
+                    RetryPolicy(),
+                    AdaptiveLimiter(4),
+                    async_s3,
+                    Manifest(),
+                    BUCKET_NAME,
+                    FOLDER,
+                )
+                return await run(url, ctx)
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(main())
+
+
+def follow_file(async_s3, source, steps):
+    """
+    Serves a file and polls it once before each step, which may change the file.
+    """
+
+    async def run(url, ctx):
+        tails = TailCache()
+        for step in steps:
+            await poll(url, ctx, tails)
+            await step(url, ctx, tails)
+        return tails
+
+    return serving(async_s3, source, run)
+
+
+def deltas_of(fake_s3):
+    prefix = f"{delta_folder(FOLDER)}PRICE_AND_DEMAND_202410_QLD1/"
+    return sorted(key for _, key in fake_s3.objects if key.startswith(prefix))
+
+
+@pytest.mark.unit
+def test_last_line():
+    assert last_line(b"a\nb\nc\n") == b"c\n"
+    assert last_line(b"a\n") == b"a\n"
+    assert last_line(b"") == b""
+
+
+@pytest.mark.unit
+def test_fold_appends_deltas_in_order_and_skips_folded_ones():
+    monthly = HEADER + rows(0, 10)
+    first = f"x/{len(monthly):012}-{len(monthly + rows(10, 20)):012}.csv"
+    second = f"x/{len(monthly + rows(10, 20)):012}-{len(monthly + rows(10, 30)):012}.csv"
+    deltas = {second: HEADER + rows(20, 30), first: HEADER + rows(10, 20)}
+    folded, keys = fold(monthly, deltas)
+    assert folded == HEADER + rows(0, 30)
+    assert keys == [first, second]
+    assert fold(folded, deltas) == (folded, keys)
+
+
+@pytest.mark.unit
+def test_fold_stops_at_a_gap():
+    monthly = HEADER + rows(0, 10)
+    start = len(monthly) + 5
+    gap = {f"x/{start:012}-{start + 10:012}.csv": HEADER + rows(10, 11)}
+    assert fold(monthly, gap) == (monthly, [])
+
+
+@pytest.mark.unit
+def test_tail_cache_only_accepts_ranges_that_continue_the_landed_bytes():
+    tails = TailCache()
+    body = HEADER + rows(0, 10)
+    assert tails.rebase("url", body + b"QLD1,2024/10") == body
+    start = len(body) - len(rows(9, 10))
+    assert tails.request_headers("url") == {"Range": f"bytes={start}-"}
+    assert tails.appended("url", 206, rows(9, 12)) == rows(10, 12)
+    assert tails.appended("url", 206, rows(9, 10)) == b""
+    assert tails.appended("url", 206, rows(9, 10, price=99.0)) is None
+    assert tails.appended("url", 200, HEADER + rows(0, 12)) == rows(10, 12)
+    assert tails.appended("url", 200, HEADER + rows(0, 1, price=99.0) + rows(1, 12)) is None
+
+
+@pytest.mark.unit
+def test_a_month_is_complete_once_midnight_on_the_first_is_landed():
+    tails = TailCache()
+    url = f"http://example.com/{FILENAME}"
+    tails.rebase(url, HEADER + rows(0, 10))
+    assert not tails.complete(url)
+    tails.advance(url, MONTH_END)
+    assert tails.complete(url)
+    assert not tails.complete("http://example.com/other.csv")
+
+
+@pytest.mark.integration
+def test_poll_lands_only_the_appended_intervals(async_s3, fake_s3):
+    source = GrowingFile(HEADER + rows(0, 100) + b"QLD1,2024/10/01 08:")
+
+    async def first(url, ctx, tails):
+        assert fake_s3.objects[KEY] == HEADER + rows(0, 100)
+        source.body = HEADER + rows(0, 130)
+
+    async def appended(url, ctx, tails):
+        assert source.requests[-1]["Range"] == f"bytes={len(HEADER + rows(0, 99))}-"
+        assert [fake_s3.objects[(BUCKET_NAME, k)] for k in deltas_of(fake_s3)] == [
+            HEADER + rows(100, 130)
+        ]
+
+    async def unchanged(url, ctx, tails):
+        assert "If-None-Match" in source.requests[-1]
+        await compact(url, ctx)
+
+    follow_file(async_s3, source, [first, appended, unchanged])
+    assert fake_s3.objects[KEY] == HEADER + rows(0, 130)
+    assert deltas_of(fake_s3) == []
+
+
+@pytest.mark.integration
+def test_revalidation_lands_a_month_whose_earlier_rows_were_corrected(async_s3, fake_s3):
+    source = GrowingFile(HEADER + rows(0, 100))
+    corrected = HEADER + rows(0, 10) + rows(10, 11, price=75.25) + rows(11, 120)
+
+    async def unchanged(url, ctx, tails):
+        await poll(url, ctx, tails, revalidate=True)
+        assert source.requests[-1]["If-None-Match"] == tails.entries[url]["verified"]
+        assert "Range" not in source.requests[-1]
+        assert metrics.counters["skipped_unchanged"] == 1
+        source.body = corrected
+
+    async def appended(url, ctx, tails):
+        # A range request only sees the appended rows.
+        assert len(deltas_of(fake_s3)) == 1
+        await poll(url, ctx, tails, revalidate=True)
+        assert metrics.counters["files_rewritten"] == 1
+        assert deltas_of(fake_s3) == []
+
+    follow_file(async_s3, source, [unchanged, appended])
+    assert fake_s3.objects[KEY] == corrected
+
+
+@pytest.mark.integration
+def test_the_previous_month_is_followed_until_its_last_interval(
+    async_s3, fake_s3, monkeypatch, tmp_path
+):
+    source = GrowingFile(HEADER + rows(0, 100))
+    state_path = str(tmp_path / "tail_state.json")
+    current = []
+    monkeypatch.setattr(tail, "current_urls", lambda *args: list(current))
+
+    async def run(url, ctx):
+        async def follow_once():
+            await follow(ctx, "", ["QLD"], state_path, poll_seconds=0, polls=1)
+            return TailCache.load(state_path)
+
+        current.append(url)
+        await follow_once()
+        # November has begun, but October's file is not finished yet.
+        current.clear()
+        source.body = HEADER + rows(0, 288)
+        assert url in await follow_once()
+        source.body += MONTH_END
+        assert url not in await follow_once()
+        assert len(source.requests) == 3
+
+    serving(async_s3, source, run)
+    assert fake_s3.objects[KEY] == HEADER + rows(0, 288) + MONTH_END
+    assert deltas_of(fake_s3) == []